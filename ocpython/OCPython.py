@@ -9,6 +9,7 @@ author: Chunhui Luo, 2022
 """
 
 import logging, sys, os, copy
+import itertools
 import datetime
 import json
 import numpy as np
@@ -21,6 +22,10 @@ try:
 	from ocpython.OCPython_utility import OCPython_utility
 except:
 	from OCPython_utility import OCPython_utility
+try:
+	from ocpython.OCPython_tdb import getPrunedTDB
+except:
+	from OCPython_tdb import getPrunedTDB
 
 from enum import IntEnum
 from typing import List
@@ -90,19 +95,134 @@ class MassUnit(IntEnum):
 	MoleFraction = 1
 	MassFraction = 2
 
+class PhaseTable(object):
+	"""
+	class: phase tuple table of an equilibrium record (names, tuple indices and number of sublattices)
+	"""
+	def __init__(self,eq):
+		"""
+		build the table from the phase tuples of the equilibrium record
+
+		Parameters
+		----------
+		param1
+			eq
+		"""
+		tmpiNSublattices=np.empty(SingleEquilibriumCalculation._maxNSublattice, dtype=np.int32)
+		tmpNSublattices=np.empty(SingleEquilibriumCalculation._maxNSublattice)
+		tmpiNConstituents=np.empty(SingleEquilibriumCalculation._maxNSublattice*SingleEquilibriumCalculation._maxNConstituent, dtype=np.int32)
+		tmpNConstituents=np.empty(SingleEquilibriumCalculation._maxNSublattice*SingleEquilibriumCalculation._maxNConstituent)
+		tmp5=np.empty(5)
+
+		self.nPhases = oc.f90wrap_pytqgnp(eq)
+		self.names = []
+		self.phaseIndices = []
+		self.compositionSets = []
+		self.nSublattices = []
+		for i in range(self.nPhases):
+			phaseName=oc.f90wrap_pytqgpn(i+1,eq).decode().strip()
+			iph, ics = oc.f90wrap_pytqgpi2(phaseName,eq)
+			nbSublattices = oc.f90wrap_pytqgphc1(i+1, tmpiNSublattices, tmpiNConstituents, tmpNConstituents, tmpNSublattices, tmp5, eq)
+			self.names.append(phaseName)
+			self.phaseIndices.append(iph)
+			self.compositionSets.append(ics)
+			self.nSublattices.append(nbSublattices)
+
 class GetResults(object):
 	"""
 	class: get results
 	"""
 	def __init__(self,self_):
 
-		self.eq = self_.eq
+		self.calc = self_
 		self.logger = self_.logger
-		self.comp = self_.components
-		try:
-			self.constituentsDescription = self_.constituentsDescription
-		except:
-			pass
+
+		# scratch buffers reused by the wildcard (-1) calls of pytqgetv
+		self.phaseValues = np.empty(SingleEquilibriumCalculation._maxNPhase)
+		self.componentValues = np.empty(SingleEquilibriumCalculation._maxNElement)
+
+		# scratch buffers reused by pytqgphc1 and pytqgpcs
+		self.iElements = np.empty(SingleEquilibriumCalculation._maxNElement, dtype=np.int32)
+		self.elementValues = np.empty(SingleEquilibriumCalculation._maxNElement)
+		self.iSublattices = np.empty(SingleEquilibriumCalculation._maxNSublattice, dtype=np.int32)
+		self.sites = np.empty(SingleEquilibriumCalculation._maxNSublattice)
+		self.iConstituents = np.empty(SingleEquilibriumCalculation._maxNSublattice*SingleEquilibriumCalculation._maxNConstituent, dtype=np.int32)
+		self.constituentValues = np.empty(SingleEquilibriumCalculation._maxNSublattice*SingleEquilibriumCalculation._maxNConstituent)
+		self.extra = np.empty(5)
+
+		# phase tables, one per equilibrium record
+		self.phaseTables = {}
+
+	@property
+	def eq(self):
+		"""
+		current equilibrium record of the calculation
+		"""
+		return self.calc.eq
+
+	@property
+	def comp(self):
+		"""
+		component names of the calculation
+		"""
+		return self.calc.components
+
+	@property
+	def constituentsDescription(self):
+		"""
+		constituents description of the calculation
+		"""
+		return self.calc.constituentsDescription
+
+	def getPhaseTable(self):
+		"""
+		get phase table of the current equilibrium record
+
+		The table is only rebuilt when the number of phase tuples changes (e.g. a new composition set is created).
+
+		Returns
+		-------
+		PhaseTable
+			phase table
+		"""
+		nPhases = oc.f90wrap_pytqgnp(self.eq)
+		phaseTable = self.phaseTables.get(self.calc.eqName)
+		if phaseTable is None or phaseTable.nPhases != nPhases:
+			phaseTable = PhaseTable(self.eq)
+			self.phaseTables[self.calc.eqName] = phaseTable
+			self.logger.debug('phase table (%d) names: %s', phaseTable.nPhases, phaseTable.names)
+		return phaseTable
+
+	def resetPhaseTables(self):
+		"""
+		reset phase tables (e.g. after reading a new database)
+		"""
+		self.phaseTables = {}
+
+	def getPhasesStatus(self, nPhase):
+		"""
+		get phase status and driving forces
+
+		Parameters
+		----------
+		param1
+			nPhase
+
+		Returns
+		-------
+		list
+			phase names
+		numpy array
+			phase status
+		numpy array
+			driving forces
+		"""
+		status = np.zeros((nPhase,), dtype=int)
+		amdgm = np.zeros(nPhase)
+		oc.f90wrap_pytqgpsm(nPhase,status,amdgm,self.eq)
+		phase_list = self.getPhaseTable().names[0:nPhase]
+
+		return phase_list,status,amdgm
 
 	def getScalarResult(self,symbol:str):
 		"""
@@ -137,16 +257,27 @@ class GetResults(object):
 		dict
 			calculated property
 		"""
-		values={}
-		value=np.empty(1)
-
-		for i in range(len(self.comp)):
-			oc.f90wrap_pytqgetv(symbol,i+1,0,1,value,self.eq)
-			#values[self.__componentNames[i]] = value[0]
-			values[self.comp[i]] = value[0]
+		values = dict(zip(self.comp, self.getComponentValues(symbol).tolist()))
 		#self.logger.debug('retrieve: %s:\n%s',symbol,json.dumps(values, indent=4))
 		return values	
 
+	def getComponentValues(self, symbol:str):
+		"""
+		get component associated result for all components with one call (wildcard -1)
+
+		Parameters
+		----------
+		param1
+			symbol
+
+		Returns
+		-------
+		numpy array
+			calculated property, ordered as the components
+		"""
+		nComponents=oc.f90wrap_pytqgetv(symbol,-1,0,SingleEquilibriumCalculation._maxNElement,self.componentValues,self.eq)
+		return self.componentValues[0:nComponents].copy()
+
 	def getPhaseAssociatedResult(self, symbol:str):
 		"""
 		get phase associated result
@@ -161,18 +292,29 @@ class GetResults(object):
 		dict
 			calculated property
 		"""
-		values={}
-		value=np.empty(1)
-		tmpNPhases=np.empty(SingleEquilibriumCalculation._maxNPhase)
-		nPhases=oc.f90wrap_pytqgetv('NP',-1,0,SingleEquilibriumCalculation._maxNPhase,tmpNPhases,self.eq)
-
-		for i in range(nPhases):
-			oc.f90wrap_pytqgetv(symbol,i+1,0,1,value,self.eq)
-			phaseName=oc.f90wrap_pytqgpn(i+1,self.eq).decode().strip()
-			values[phaseName] = value[0]
+		phaseNames = self.getPhaseTable().names
+		phaseValues = self.getPhaseValues(symbol)
+		values = dict(zip(phaseNames, phaseValues))
 		self.logger.debug('retrieve: %s:\n%s',symbol,json.dumps(values, indent=4))
 		return values
 
+	def getPhaseValues(self, symbol:str):
+		"""
+		get phase associated result for all phase tuples with one call (wildcard -1)
+
+		Parameters
+		----------
+		param1
+			symbol
+
+		Returns
+		-------
+		numpy array
+			calculated property, ordered as the phase tuples
+		"""
+		nPhases=oc.f90wrap_pytqgetv(symbol,-1,0,SingleEquilibriumCalculation._maxNPhase,self.phaseValues,self.eq)
+		return self.phaseValues[0:nPhases].copy()
+
 	def getPhaseElementComposition(self):
 		"""
 		get phase element composition
@@ -182,18 +324,17 @@ class GetResults(object):
 		dict
 			phase element composition
 		"""
-		tmpNPhases=np.empty(SingleEquilibriumCalculation._maxNPhase)
-		tmpNElements=np.empty(SingleEquilibriumCalculation._maxNElement)
-		nPhases=oc.f90wrap_pytqgetv('NP',-1,0,SingleEquilibriumCalculation._maxNPhase,tmpNPhases,self.eq)
+		phaseNames = self.getPhaseTable().names
+		tmpNPhases = self.getPhaseValues('NP')
 	
 		phaseElementComposition={}
-		for i in range(nPhases):
+		for i in range(len(tmpNPhases)):
 			if (tmpNPhases[i]>0.0):
-				phaseName=oc.f90wrap_pytqgpn(i+1,self.eq).decode().strip()
+				phaseName=phaseNames[i]
 				phaseElementComposition[phaseName] = {}
-				nElements=oc.f90wrap_pytqgetv('X',i+1,-1,SingleEquilibriumCalculation._maxNElement,tmpNElements,self.eq)
+				nElements=oc.f90wrap_pytqgetv('X',i+1,-1,SingleEquilibriumCalculation._maxNElement,self.elementValues,self.eq)
 				for j in range(nElements):
-					phaseElementComposition[phaseName][self.comp[j]]=tmpNElements[j]
+					phaseElementComposition[phaseName][self.comp[j]]=self.elementValues[j]
 		self.logger.debug('Phase element composition:\n'+json.dumps(phaseElementComposition, indent=4))
 		return phaseElementComposition
 
@@ -206,21 +347,15 @@ class GetResults(object):
 		dict
 			phase sites
 		"""
-		tmpNPhases=np.empty(SingleEquilibriumCalculation._maxNPhase)
-		tmpiNSublattices=np.empty(SingleEquilibriumCalculation._maxNSublattice, dtype=np.int32)
-		tmpNSublattices=np.empty(SingleEquilibriumCalculation._maxNSublattice)
-		tmpiNConstituents=np.empty(SingleEquilibriumCalculation._maxNSublattice*SingleEquilibriumCalculation._maxNConstituent, dtype=np.int32)
-		tmpNConstituents=np.empty(SingleEquilibriumCalculation._maxNSublattice*SingleEquilibriumCalculation._maxNConstituent)
-		tmp5=np.empty(5)
+		phaseNames = self.getPhaseTable().names
+		tmpNPhases = self.getPhaseValues('NP')
 	
-		nbPhases=oc.f90wrap_pytqgetv('NP',-1,0,SingleEquilibriumCalculation._maxNPhase,tmpNPhases,self.eq)
 		phaseSites={}
-		for i in range(nbPhases):
+		for i in range(len(tmpNPhases)):
 			if (tmpNPhases[i]>0.0):
-				phaseName=oc.f90wrap_pytqgpn(i+1,self.eq).decode().strip()
-				phaseName=oc.f90wrap_pytqgpn(i+1,self.eq).decode().strip()
-				nbSublattices = oc.f90wrap_pytqgphc1(i+1, tmpiNSublattices, tmpiNConstituents, tmpNConstituents, tmpNSublattices, tmp5, self.eq)
-				phaseSites[phaseName] = tmpNSublattices[0:nbSublattices].tolist()
+				phaseName=phaseNames[i]
+				nbSublattices = oc.f90wrap_pytqgphc1(i+1, self.iSublattices, self.iConstituents, self.constituentValues, self.sites, self.extra, self.eq)
+				phaseSites[phaseName] = self.sites[0:nbSublattices].tolist()
 		self.logger.debug('Phase sites:\n'+json.dumps(phaseSites, indent=4))
 		return phaseSites
 
@@ -233,39 +368,31 @@ class GetResults(object):
 		dict
 			phase constituent composition
 		"""
-		tmpNPhases = np.empty(SingleEquilibriumCalculation._maxNPhase)
-		tmpNElements = np.empty(SingleEquilibriumCalculation._maxNElement)
-		tmpiNElements = np.empty(SingleEquilibriumCalculation._maxNElement, dtype=np.int32)
-		tmpiNSublattices = np.empty(SingleEquilibriumCalculation._maxNSublattice, dtype=np.int32)
-		tmpNSublattices = np.empty(SingleEquilibriumCalculation._maxNSublattice)
-		tmpiNConstituents = np.empty(SingleEquilibriumCalculation._maxNSublattice*SingleEquilibriumCalculation._maxNConstituent, dtype=np.int32)
-		tmpNConstituents = np.empty(SingleEquilibriumCalculation._maxNSublattice*SingleEquilibriumCalculation._maxNConstituent)
-		tmp5=np.empty(5)
+		phaseTable = self.getPhaseTable()
+		tmpNPhases = self.getPhaseValues('NP')
 	
-		nbPhases=oc.f90wrap_pytqgetv('NP',-1,0,SingleEquilibriumCalculation._maxNPhase,tmpNPhases,self.eq)
 		phaseConstituentComposition={}
-		for i in range(nbPhases):
+		for i in range(len(tmpNPhases)):
 			if (tmpNPhases[i]>0.0):
 	
-				phaseName=oc.f90wrap_pytqgpn(i+1,self.eq).decode().strip()
-				iph, ics = oc.f90wrap_pytqgpi2(phaseName,self.eq)
+				phaseName=phaseTable.names[i]
+				iph=phaseTable.phaseIndices[i]
 	
 				phaseConstituentComposition[phaseName]={}
-				phaseName=oc.f90wrap_pytqgpn(i+1,self.eq).decode().strip()
-				nbSublattices = oc.f90wrap_pytqgphc1(i+1, tmpiNSublattices, tmpiNConstituents, tmpNConstituents, tmpNSublattices, tmp5, self.eq)
+				nbSublattices = oc.f90wrap_pytqgphc1(i+1, self.iSublattices, self.iConstituents, self.constituentValues, self.sites, self.extra, self.eq)
 				count = 0
 				for j in range(nbSublattices):
 					sublatticeConstituentComposition = {}
 					offset = count
-					for k in np.nditer(tmpiNConstituents[offset:offset+tmpiNSublattices[j]]):
+					for k in np.nditer(self.iConstituents[offset:offset+self.iSublattices[j]]):
 						constituentName = oc.f90wrap_pytqgpcn2(iph,count+1).decode().strip()
-						sublatticeConstituentComposition[constituentName] = tmpNConstituents[count]
+						sublatticeConstituentComposition[constituentName] = self.constituentValues[count]
 						if not constituentName in self.constituentsDescription:
-							nspel, smass, qsp = oc.f90wrap_pytqgpcs(k, tmpiNElements, tmpNElements)
+							nspel, smass, qsp = oc.f90wrap_pytqgpcs(k, self.iElements, self.elementValues)
 							self.constituentsDescription[constituentName] = {}
 							self.constituentsDescription[constituentName]['mass'] = smass
 							self.constituentsDescription[constituentName]['charge'] = qsp
-							self.constituentsDescription[constituentName]['elements'] = { self.comp[tmpiNElements[l]-1] : tmpNElements[l] for l in range(nspel) if (tmpiNElements[l]>0)}
+							self.constituentsDescription[constituentName]['elements'] = { self.comp[self.iElements[l]-1] : self.elementValues[l] for l in range(nspel) if (self.iElements[l]>0)}
 						count += 1
 					if (nbSublattices==1):
 						phaseConstituentComposition[phaseName] = sublatticeConstituentComposition
@@ -283,6 +410,8 @@ class SingleEquilibriumCalculation(object):
 	_maxNElement=50
 	_maxNSublattice=10
 	_maxNConstituent=50
+	# phase associated state variables, the other ones with (*) are component associated
+	_phaseStateVariables=('NP','BP','VP','DGM','Q')
 
 	def __init__(self,vs):
 		"""
@@ -291,6 +420,20 @@ class SingleEquilibriumCalculation(object):
 		self.equilibriumNamesInOC = {}
 		self.constituentsDescription = {}
 		self.logger = vs.logger
+		self._results = GetResults(self)
+
+		# conditions of each equilibrium record, used as key of the (optional) result cache
+		self.conditions = {}
+		self.cache = None
+		self._cacheEntry = None
+		self._pendingGridMinimizerStatus = None
+
+		# the database is reduced to the selected elements before it is read by liboctq
+		self.pruneDatabase = True
+		self.prunedDatabaseDirectory = None
+
+		# database and elements of the system loaded by the last compact call (see singleEquilibriumCalculation_Compact)
+		self._compactSession = None
 
 	def eq(self):
 		"""
@@ -311,12 +454,16 @@ class SingleEquilibriumCalculation(object):
 		"""
 		# set init
 		self.eq = oc.f90wrap_pytqini(1)
+		self._results.resetPhaseTables()
 
 		if self.logger.getEffectiveLevel() is not logging.DEBUG:
 			oc.f90wrap_pytqquiet(True)
 		self.eqName = SingleEquilibriumCalculation._defaultEquilibriumName
 		eqNameInOC='%s' % self.eqName.upper().replace(' ','_')
 		self.equilibriumNamesInOC[self.eqName]=eqNameInOC
+		self.conditions = {self.eqName: {'database': (os.path.abspath(tdbFilePath), None if elements is None else tuple(elements))}}
+		self._cacheEntry = None
+		self._compactSession = None
 		self.logger.debug('read database: %s', tdbFilePath)
 
 		# read tdb
@@ -324,7 +471,7 @@ class SingleEquilibriumCalculation(object):
 			oc.f90wrap_pytqrfil(tdbFilePath,self.eq)
 		else:
 			xstring = OCPython_utility.comp_new_order(elements)
-			oc.f90wrap_pytqrpfil(tdbFilePath,len(elements),xstring,self.eq)
+			oc.f90wrap_pytqrpfil(self._getDatabaseFile(tdbFilePath,elements),len(elements),xstring,self.eq)
 
 		# string array from Fortran -> component list in Python
 		try:
@@ -357,7 +504,7 @@ class SingleEquilibriumCalculation(object):
 			number of phases
 		"""
 
-		nPhase = oc.f90wrap_pytqgnp(self.eq)
+		nPhase = self.getPhaseTable().nPhases
 		self.logger.debug('number of phases: %d',nPhase)
 
 		return nPhase
@@ -377,11 +524,63 @@ class SingleEquilibriumCalculation(object):
 			phase name
 		"""
 
-		phaseName=oc.f90wrap_pytqgpn(index+1,self.eq).decode().strip()
+		phaseName=self.getPhaseTable().names[index]
 
 		return phaseName
 
-	def singleEquilibriumCalculation_Compact(self,tdbFilePath,elements,massunit,tpn,elementFractions,phaseNames=None,elementReferencePhase=None):
+	def getPhaseTable(self):
+		"""
+		get phase table (names, tuple indices and number of sublattices of all phase tuples) of the current equilibrium record,
+		from the cache if the equilibrium was found in it (the record may hold another equilibrium)
+
+		Returns
+		-------
+		PhaseTable
+			phase table
+		"""
+		return self._getResult('getPhaseTable')
+
+	def setDatabasePruning(self,pruneDatabase=True,prunedDatabaseDirectory=None):
+		"""
+		set if the database is reduced to the selected elements before it is read (readtdb with elements and compact mode)
+
+		Parameters
+		----------
+		param1
+			pruneDatabase
+		param2
+			prunedDatabaseDirectory: directory of the cached pruned databases, ocpython_tdb in the temporary directory if None
+		"""
+		self.pruneDatabase = pruneDatabase
+		self.prunedDatabaseDirectory = prunedDatabaseDirectory
+
+	def _getDatabaseFile(self,tdbFilePath,elements):
+		"""
+		get the database file read by liboctq: the pruned database if pruning is on, the original one otherwise
+
+		Parameters
+		----------
+		param1
+			tdbFilePath
+		param2
+			elements
+
+		Returns
+		-------
+		str
+			database file path
+		"""
+		if not self.pruneDatabase:
+			return tdbFilePath
+		try:
+			prunedFilePath = getPrunedTDB(tdbFilePath, elements, self.prunedDatabaseDirectory)
+		except (ValueError, KeyError, OSError) as e:
+			self.logger.warning('database %s is not pruned: %s', tdbFilePath, e)
+			return tdbFilePath
+		self.logger.debug('pruned database: %s', prunedFilePath)
+		return prunedFilePath
+
+	def singleEquilibriumCalculation_Compact(self,tdbFilePath,elements,massunit,tpn,elementFractions,phaseNames=None,elementReferencePhase=None,reuseSession=False):
 		"""
 		Single Equilibrium Calculation with compact mode
 
@@ -399,17 +598,14 @@ class SingleEquilibriumCalculation(object):
 		   phaseNames
 		param6
 		   elementReferencePhase
+		param7
+		   reuseSession: keep the system loaded by the previous compact call if the database and the elements are the same,
+		   only conditions, phase status and reference phases are reset (default: the database is read at every call)
 		"""
 		if len(elements) > len(elementFractions):
 			pass
 
-		self.eq = oc.f90wrap_pytqini(1)
-		if self.logger.getEffectiveLevel() is not logging.DEBUG:
-			oc.f90wrap_pytqquiet(True)
-		self.eqName = SingleEquilibriumCalculation._defaultEquilibriumName
-		eqNameInOC='%s' % self.eqName.upper().replace(' ','_')
-		self.equilibriumNamesInOC[self.eqName]=eqNameInOC
-		self.logger.debug('reading %s', tdbFilePath)
+		database = (os.path.abspath(tdbFilePath), tuple(elements))
 
 		# create xstring
 		sorted_elements = copy.deepcopy(elements)
@@ -444,8 +640,34 @@ class SingleEquilibriumCalculation(object):
 			elRef=';'.join([str(elem) for elem in elRef_list])
 			phRef=';'.join([str(phase) for phase in phRef_list])
 
-		# call fortran subroutine for single equilibrium calculation in compact mode
-		oc.f90wrap_pytqcecompact(tdbFilePath,len(elements),massunit,xstring,tpn_list,index_list,fraction_list,phaseList,elRef,phRef,self.eq)
+		if reuseSession and self._compactSession == database:
+			self.logger.debug('reuse compact session: %s', tdbFilePath)
+			self._resetCompactSession(sorted_elements,massunit,tpn,index_list,fraction_list,phaseNames,elementReferencePhase)
+		else:
+			self.eq = oc.f90wrap_pytqini(1)
+			self._results.resetPhaseTables()
+			if self.logger.getEffectiveLevel() is not logging.DEBUG:
+				oc.f90wrap_pytqquiet(True)
+			self.eqName = SingleEquilibriumCalculation._defaultEquilibriumName
+			eqNameInOC='%s' % self.eqName.upper().replace(' ','_')
+			self.equilibriumNamesInOC[self.eqName]=eqNameInOC
+			self.conditions = {self.eqName: {'database': database}}
+			self._cacheEntry = None
+			self.logger.debug('reading %s', tdbFilePath)
+
+			# call fortran subroutine for single equilibrium calculation in compact mode
+			oc.f90wrap_pytqcecompact(self._getDatabaseFile(tdbFilePath,elements),len(elements),massunit,xstring,tpn_list,index_list,fraction_list,phaseList,elRef,phRef,self.eq)
+			self._compactSession = database
+
+		conditions = self.conditions[self.eqName]
+		for name, value in tpn.items():
+			conditions[name.upper()] = float(value)
+		fractionName = 'W' if massunit == MassUnit.MassFraction else 'X'
+		for index, value in zip(index_list, fraction_list):
+			if value >= 0.0:
+				conditions['%s(%d)' % (fractionName, index-1)] = float(value)
+		conditions['phases'] = {phaseList: int(PhaseStatus.Entered)}
+		conditions['reference'] = (elRef, phRef)
 
 		try:
 			n,comp = oc.f90wrap_pytqgcom(self.eq)
@@ -459,7 +681,66 @@ class SingleEquilibriumCalculation(object):
 		except:
 			pass
 
-	def batchEquilibriaComp(self, n_xfrac,elementMoleFractions,xfrac_matrix,temp,stavar):
+	def _resetCompactSession(self,sorted_elements,massunit,tpn,index_list,fraction_list,phaseNames,elementReferencePhase):
+		"""
+		reset conditions, phase status and reference phases of the system loaded by a previous compact call and calculate equilibrium
+
+		Parameters
+		----------
+		param1
+			sorted_elements
+		param2
+			massunit
+		param3
+			tpn
+		param4
+			index_list: indices (starting at 1) of the elements in sorted_elements
+		param5
+			fraction_list: fractions of the elements, the elements with negative fraction are dependent
+		param6
+			phaseNames
+		param7
+			elementReferencePhase
+		"""
+		conditions = self.conditions[self.eqName]
+		pressure = float(tpn.get('P', conditions.get('P', 1E5)))
+
+		# conditions on T, P and N
+		for name, value in tpn.items():
+			oc.f90wrap_pytqsetc(name.upper(),0,0,value,self.eq)
+
+		# fractions: conditions of the previous call which are not set again are removed
+		fractionName = 'W' if massunit == MassUnit.MassFraction else 'X'
+		fractions = {'%s(%d)' % (fractionName, index-1): value for index, value in zip(index_list, fraction_list) if value >= 0.0}
+		for name in [name for name in conditions if name[0:2] in ('X(', 'W(') and not name in fractions]:
+			oc.f90wrap_pytqsetc(name[0],int(name[2:-1])+1,-1,0.0,self.eq)
+			del conditions[name]
+		for name, value in fractions.items():
+			oc.f90wrap_pytqsetc(fractionName,int(name[2:-1])+1,0,value,self.eq)
+
+		# phase status
+		if phaseNames is None:
+			oc.f90wrap_pytqphsts2('*',PhaseStatus.Entered,0.0,self.eq)
+		else:
+			oc.f90wrap_pytqphsts2('*',PhaseStatus.Suspended,0.0,self.eq)
+			oc.f90wrap_pytqphsts2(';'.join([str(elem) for elem in phaseNames]),PhaseStatus.Entered,0.0,self.eq)
+
+		# reference phases: elements without reference phase are set back to SER
+		previousReference = dict(zip(*[reference.split(';') for reference in conditions.get('reference', ('', ''))]))
+		reference = {} if elementReferencePhase is None else dict(elementReferencePhase)
+		tpref = np.array([-1.0, pressure])
+		for el, phase in previousReference.items():
+			if el and not el in reference:
+				oc.f90wrap_pytqcref(sorted_elements.index(el)+1,'SER',tpref,self.eq)
+		for el, phase in reference.items():
+			if not previousReference.get(el) == phase:
+				oc.f90wrap_pytqcref(sorted_elements.index(el)+1,phase,tpref,self.eq)
+
+		self._cacheEntry = None
+		self._pendingGridMinimizerStatus = None
+		oc.f90wrap_pytqce('',GridMinimizerStatus.On,0,0.0,self.eq)
+
+	def batchEquilibriaComp(self, n_xfrac,elementMoleFractions,xfrac_matrix,temp,stavar,store=None,out=None):
 		"""
 		Batch equilibrium calculations with composition loops
 
@@ -468,75 +749,603 @@ class SingleEquilibriumCalculation(object):
 		param1
 			n_xfrac: 
 		param2
-			elementMoleFractions
+			elementMoleFractions: dict of the elements, or int32 index array from getBatchIndices (no conversion)
 		param3
-			xfrac_matrix: 
+			xfrac_matrix: a Fortran-ordered float64 array (n_xfrac, number of elements) is passed without copy
 		param4
 			temp
 		param5
 		   stavar
+		param6
+		   store: persistent result store (OCPython_cache.EquilibriumStore) consulted before computing, as option
+		param7
+		   out: contiguous float64 array (e.g. numpy.memmap) receiving the results, as option
 
 		Returns
 		-------
 		list
 			calculated properties
 		"""
-		elements  = list(elementMoleFractions.keys())
-		elements.sort()
-		number_element = len(elements)
+		index_list = self.getBatchIndices(elementMoleFractions)
+		number_element = len(index_list)
 
 		# call fortran subroutine for single equilibrium calculation in compact mode
-		i = 0
-		index_list = []
-		xeq = xfrac_matrix
-		for el_name, value in elementMoleFractions.items():
-			i = i + 1
-			i=elements.index(el_name)
-			index_list.append(i+1)
+		xeq = SingleEquilibriumCalculation._batchCompositions(xfrac_matrix)
+		values = SingleEquilibriumCalculation._batchOutput(n_xfrac,out)
 
-		values=np.empty(n_xfrac)
+		if store is None:
+			oc.f90wrap_pytqcompbatch(number_element,n_xfrac,index_list,xeq,temp,stavar,values,self.eq)
+			return values
 
-		oc.f90wrap_pytqcompbatch(number_element,n_xfrac,index_list,xeq,temp,stavar,values,self.eq)
+		xeq = xeq.reshape(n_xfrac,-1,order='F')
+		temperature = float(np.ravel(temp)[0])
+		conditions = self._batchConditions()
+		elementKey = self._batchElementKey(elementMoleFractions)
+		keys = [store.makeKey(conditions,'batch',stavar,elementKey,temperature,tuple(x)) for x in xeq]
+
+		def calculateMissing(missing):
+			missingValues = np.empty(len(missing))
+			oc.f90wrap_pytqcompbatch(number_element,len(missing),index_list,np.asfortranarray(xeq[missing]),temp,stavar,missingValues,self.eq)
+			return missingValues
+
+		values[:] = self._batchFromStore(store,keys,calculateMissing)
 		return values
 
-	def batchEquilibriaTemp(self,elementMoleFractions,xfrac_matrix,temp_list,stavar):
+	def batchEquilibriaTemp(self,elementMoleFractions,xfrac_matrix,temp_list,stavar,store=None,out=None):
 		"""
 		Batch equilibrium calculations with temperature loops
 
 		Parameters
 		----------
 		param1
-			elementMoleFractions
+			elementMoleFractions: dict of the elements, or int32 index array from getBatchIndices (no conversion)
 		param2
 			xfrac_matrix: 
 		param3
-			temp_list
+			temp_list: a contiguous float64 array is passed without copy
 		param4
 		   stavar
+		param5
+		   store: persistent result store (OCPython_cache.EquilibriumStore) consulted before computing, as option
+		param6
+		   out: contiguous float64 array (e.g. numpy.memmap) receiving the results, as option
 
 		Returns
 		-------
 		list
 			calculated properties
 		"""
-		elements = list(elementMoleFractions.keys())
-		elements.sort()
-		n_element = len(elements)
+		index_list = self.getBatchIndices(elementMoleFractions)
+		n_element = len(index_list)
 
 		# call fortran subroutine for single equilibrium calculation in compact mode
-		i = 0
-		index_list = []
-		for el_name, value in elementMoleFractions.items():
-			i = i + 1
-			i=elements.index(el_name)
-			index_list.append(i+1)
-
+		xfrac_matrix = SingleEquilibriumCalculation._batchCompositions(xfrac_matrix)
+		temp_list = np.ascontiguousarray(temp_list, dtype=np.float64)
 		n_temp = len(temp_list)
-		values = np.empty(n_temp)
+		values = SingleEquilibriumCalculation._batchOutput(n_temp,out)
 	
-		oc.f90wrap_pytqtempbatch(n_element,n_temp,index_list,xfrac_matrix,temp_list,stavar,values,self.eq)
+		if store is None:
+			oc.f90wrap_pytqtempbatch(n_element,n_temp,index_list,xfrac_matrix,temp_list,stavar,values,self.eq)
+			return values
+
+		composition = tuple(np.ravel(xfrac_matrix, order='F'))
+		conditions = self._batchConditions()
+		elementKey = self._batchElementKey(elementMoleFractions)
+		keys = [store.makeKey(conditions,'batch',stavar,elementKey,temperature,composition) for temperature in temp_list]
+
+		def calculateMissing(missing):
+			missingValues = np.empty(len(missing))
+			oc.f90wrap_pytqtempbatch(n_element,len(missing),index_list,xfrac_matrix,temp_list[missing],stavar,missingValues,self.eq)
+			return missingValues
+
+		values[:] = self._batchFromStore(store,keys,calculateMissing)
+		return values
+
+	def getBatchIndices(self,elementMoleFractions):
+		"""
+		get the element indices of the batch calculations (int32 array), it can be passed to the batch calculations instead of
+		elementMoleFractions to avoid the conversion at every call
+
+		Parameters
+		----------
+		param1
+			elementMoleFractions: dict of the elements (or index array, returned as it is)
+
+		Returns
+		-------
+		numpy array
+			indices (starting at 1) of the elements in the sorted element list, ordered as elementMoleFractions
+		"""
+		if isinstance(elementMoleFractions, np.ndarray):
+			return elementMoleFractions
+		elements = list(elementMoleFractions.keys())
+		elements.sort()
+		return np.array([elements.index(el_name)+1 for el_name in elementMoleFractions], dtype=np.int32)
+
+	def _batchElementKey(self,elementMoleFractions):
+		"""
+		element part of the store key of the batch calculations: the element names, or the element indices if only these are known
+		"""
+		if isinstance(elementMoleFractions, np.ndarray):
+			return tuple(int(index) for index in elementMoleFractions)
+		return tuple(elementMoleFractions)
+
+	@staticmethod
+	def _batchCompositions(xfrac_matrix):
+		"""
+		compositions of the batch calculations as Fortran-ordered float64 array (grid point, element),
+		the memory layout expected by the batch subroutines. Arrays which are already in this layout are not copied.
+		"""
+		return np.asarray(xfrac_matrix, dtype=np.float64, order='F')
+
+	@staticmethod
+	def _batchOutput(n,out):
+		"""
+		result array of the batch calculations: out if given (checked), a new array otherwise
+		"""
+		if out is None:
+			return np.empty(n)
+		if not (isinstance(out, np.ndarray) and out.dtype == np.float64 and out.flags.c_contiguous and out.size == n):
+			raise ValueError('out must be a contiguous float64 array of size %d' % n)
+		return out.reshape(-1)
+
+	def batchEquilibriaProperties(self,elementMoleFractions,xfrac_matrix,temp,properties,gridMinimizerStatus=GridMinimizerStatus.On,store=None):
+		"""
+		Batch equilibrium calculations with several properties in a single pass (one equilibrium per grid point)
+
+		Parameters
+		----------
+		param1
+			elementMoleFractions: element order of the compositions
+		param2
+			xfrac_matrix: one composition (ordered as elementMoleFractions) per grid point, negative for the dependent element
+		param3
+			temp: temperature or one temperature per grid point
+		param4
+			properties: state variables, scalar (e.g. 'G', 'H', 'CP') or with (*) for all phases (e.g. 'NP(*)', 'DGM(*)')
+			or all components (e.g. 'MU(*)', 'X(*)')
+		param5
+			gridMinimizerStatus
+		param6
+			store: persistent result store (OCPython_cache.EquilibriumStore) consulted before computing, as option
+
+		Returns
+		-------
+		dict
+			calculated properties: 1-D numpy array per scalar property, 2-D numpy array (grid point, phase or component)
+			per property with (*), NaN where not calculated. 'phaseNames' and 'componentNames' are the column labels,
+			'error' the error code of each grid point.
+		"""
+		elements = list(elementMoleFractions.keys())
+		elements.sort()
+		index_list = [elements.index(el_name) for el_name in elementMoleFractions]
+
+		xfrac_matrix = np.asarray(xfrac_matrix, dtype=np.float64)
+		xfrac_matrix = xfrac_matrix.reshape(len(xfrac_matrix),-1)
+		nPoints = len(xfrac_matrix)
+		temp = np.broadcast_to(np.asarray(temp, dtype=np.float64), (nPoints,))
+
+		def calculatePoint(i):
+			self.setTemperature(temp[i])
+			for j, index in enumerate(index_list):
+				if xfrac_matrix[i,j] >= 0.0:
+					self.setSingleElementMolarFraction(index,xfrac_matrix[i,j])
+			return self._calculateRecord(properties,gridMinimizerStatus)
+
+		if store is None:
+			records = [calculatePoint(i) for i in range(nPoints)]
+		else:
+			conditions = self._batchConditions()
+			keys = [store.makeKey(conditions,'properties',tuple(properties),tuple(elementMoleFractions),temp[i],tuple(xfrac_matrix[i]),int(gridMinimizerStatus)) for i in range(nPoints)]
+			records = store.getMany(keys)
+			missing = [i for i, record in enumerate(records) if record is None]
+			self.logger.debug('batch equilibria: %d from store, %d to calculate', nPoints-len(missing), len(missing))
+			for i in missing:
+				records[i] = calculatePoint(i)
+			store.putMany([(keys[i], records[i]) for i in missing if records[i]['error'] == 0])
+
+		return self._recordColumns(records,properties)
+
+	def _calculateRecord(self,properties,gridMinimizerStatus=GridMinimizerStatus.On):
+		"""
+		calculate equilibrium with the current conditions and get several properties
+
+		Parameters
+		----------
+		param1
+			properties: state variables, scalar or with (*) for all phases or components
+		param2
+			gridMinimizerStatus
+
+		Returns
+		-------
+		dict
+			{'error': error code, state variable: value or numpy array}, only the error code if the calculation failed
+		"""
+		self.calculateEquilibrium(gridMinimizerStatus)
+		error = self.getErrorCode()
+		if not error == 0:
+			self.resetErrorCode()
+			return {'error': error}
+		record = {'error': 0}
+		for symbol in properties:
+			name = symbol.replace(' ','').upper()
+			if not name.endswith('(*)'):
+				record[symbol] = self.getScalarResult(symbol)
+			elif name[0:-3] in SingleEquilibriumCalculation._phaseStateVariables:
+				record[symbol] = self.getPhaseValues(name[0:-3])
+			else:
+				record[symbol] = self.getComponentValues(name[0:-3])
+		return record
+
+	def _recordColumns(self,records,properties):
+		"""
+		convert the records of several equilibria (see _calculateRecord) to arrays
+
+		Parameters
+		----------
+		param1
+			records
+		param2
+			properties
+
+		Returns
+		-------
+		dict
+			1-D numpy array per scalar property, 2-D numpy array per property with (*), NaN where not calculated,
+			'phaseNames' and 'componentNames' (column labels) and 'error'
+		"""
+		nPoints = len(records)
+		results = {'error': np.array([record['error'] for record in records], dtype=np.int32)}
+		for symbol in properties:
+			if not symbol.replace(' ','').endswith('(*)'):
+				results[symbol] = np.array([record.get(symbol, np.nan) for record in records], dtype=np.float64)
+				continue
+			# the number of phase tuples may grow from point to point (new composition sets)
+			nColumns = max([len(record[symbol]) for record in records if symbol in record] or [0])
+			values = np.full((nPoints, nColumns), np.nan)
+			for i, record in enumerate(records):
+				if symbol in record:
+					values[i,0:len(record[symbol])] = record[symbol]
+			results[symbol] = values
+		results['phaseNames'] = list(self.getPhaseTable().names)
+		results['componentNames'] = list(self.getComponentNames())
+		return results
+
+	def calculateGrid(self,axes,properties,gridMinimizerStatus=GridMinimizerStatus.On,useBatch=True):
+		"""
+		Equilibrium calculations on an N-dimensional grid of conditions
+
+		The axes are 1-D arrays (the grid is their outer product) or arrays broadcastable to the shape of the grid.
+		Conditions which are not an axis are kept. If only T and X(el) are axes, the composition is given by X conditions
+		with exactly one dependent element (no W condition) and a single scalar property is calculated, the grid is
+		calculated with the batch subroutines (one batch per temperature). Otherwise the grid is traversed point by point in serpentine order with the longest axis innermost,
+		so that consecutive grid points are neighbours (with GridMinimizerStatus.Off every point starts from the
+		previous one and the grid minimizer is only used when the calculation fails).
+
+		Parameters
+		----------
+		param1
+			axes: {condition: values}, condition is 'T', 'P', 'N', 'X(el)' or 'W(el)'
+		param2
+			properties: state variables, scalar (e.g. 'G') or with (*) for all phases or components (e.g. 'NP(*)')
+		param3
+			gridMinimizerStatus
+		param4
+			useBatch: use the batch subroutines when possible
+
+		Returns
+		-------
+		dict
+			calculated properties: numpy arrays with the shape of the grid (and a last dimension for the phases
+			or components of properties with (*)), 'error' (point by point only), 'phaseNames' and 'componentNames'
+		"""
+		if isinstance(properties, str):
+			properties = [properties]
+		names = [name.replace(' ','').upper() for name in axes]
+		values = [np.asarray(value, dtype=np.float64) for value in axes.values()]
+		if all(value.ndim == 1 for value in values):
+			values = np.meshgrid(*values, indexing='ij', sparse=True)
+		shape = np.broadcast(*values).shape if values else ()
+		conditions = [np.broadcast_to(value, shape).reshape(-1) for value in values]
+
+		# the batch subroutines calculate one property per equilibrium: several properties are taken from one equilibrium per point
+		isScalar = len(properties) == 1 and not properties[0].replace(' ','').endswith('(*)')
+		if useBatch and isScalar and self._isBatchGrid(names):
+			results = self._calculateGridBatch(names,conditions,properties)
+		else:
+			results = self._calculateGridPoints(names,conditions,shape,properties,gridMinimizerStatus)
+
+		for key, value in results.items():
+			if isinstance(value, np.ndarray):
+				results[key] = value.reshape(shape+value.shape[1:])
+		return results
+
+	def _isBatchGrid(self,names):
+		"""
+		check if a grid can be calculated with the batch subroutines, which set T and the molar fractions of all elements
+		but the dependent one: the axes are T or X(el), the temperature is known and the composition is given by X conditions
+		with exactly one dependent element
+
+		Parameters
+		----------
+		param1
+			names: conditions of the axes
+
+		Returns
+		-------
+		bool
+			True if the batch subroutines can be used
+		"""
+		if not all(name == 'T' or name[0:2] == 'X(' for name in names):
+			return False
+		current = self.conditions.get(self.eqName, {})
+		if not 'T' in names and current.get('T') is None:
+			return False
+		if any(name[0:2] == 'W(' for name in current):
+			return False
+		components = self.getComponentNames()
+		independent = {int(name[2:-1]) for name in current if name[0:2] == 'X('}
+		independent.update(components.index(name[2:-1]) for name in names if name[0:2] == 'X(')
+		return len(independent) == len(components)-1
+
+	def _calculateGridBatch(self,names,conditions,properties):
+		"""
+		grid calculation with the batch subroutines (composition loops), one batch per temperature,
+		see _isBatchGrid for the conditions
+
+		Parameters
+		----------
+		param1
+			names: 'T' or 'X(el)'
+		param2
+			conditions: values of each condition at every grid point
+		param3
+			properties: scalar state variables
+
+		Returns
+		-------
+		dict
+			calculated properties (1-D numpy arrays), 'phaseNames' and 'componentNames'
+		"""
+		components = self.getComponentNames()
+		current = self.conditions.get(self.eqName, {})
+		nPoints = len(conditions[0]) if conditions else 1
+
+		# compositions of all grid points, conditions of the elements which are not an axis are kept (-1: dependent)
+		xfrac_matrix = np.empty((nPoints, len(components)), order='F')
+		for i in range(len(components)):
+			xfrac_matrix[:,i] = current.get('X(%d)' % i, -1.0)
+		for name, value in zip(names, conditions):
+			if name[0:2] == 'X(':
+				xfrac_matrix[:,components.index(name[2:-1])] = value
+		if 'T' in names:
+			temperatures = conditions[names.index('T')]
+		else:
+			temperatures = np.full(nPoints, current['T'])
+		elementMoleFractions = {el: -1.0 for el in components}
+
+		results = {symbol: np.empty(nPoints) for symbol in properties}
+		temperatureValues, inverse = np.unique(temperatures, return_inverse=True)
+		order = np.argsort(inverse, kind='stable')
+		boundaries = np.searchsorted(inverse[order], np.arange(len(temperatureValues)+1))
+		for k, temperature in enumerate(temperatureValues):
+			points = order[boundaries[k]:boundaries[k+1]]
+			for symbol in properties:
+				results[symbol][points] = self.batchEquilibriaComp(len(points),elementMoleFractions,xfrac_matrix[points],temperature,symbol)
+		results['phaseNames'] = list(self.getPhaseTable().names)
+		results['componentNames'] = list(components)
+		return results
+
+	def _calculateGridPoints(self,names,conditions,shape,properties,gridMinimizerStatus):
+		"""
+		grid calculation point by point
+
+		Parameters
+		----------
+		param1
+			names: conditions
+		param2
+			conditions: values of each condition at every grid point
+		param3
+			shape: shape of the grid
+		param4
+			properties
+		param5
+			gridMinimizerStatus
+
+		Returns
+		-------
+		dict
+			calculated properties (1-D or 2-D numpy arrays), 'error', 'phaseNames' and 'componentNames'
+		"""
+		setters = [self.getConditionSetter(name) for name in names]
+		records = [None]*int(np.prod(shape))
+		previous = None
+		for i in SingleEquilibriumCalculation._serpentineOrder(shape):
+			# only the conditions which change from the previous grid point are set
+			for setter, value in zip(setters, conditions):
+				if previous is None or not value[i] == value[previous]:
+					setter(value[i])
+			previous = i
+			record = self._calculateRecord(properties,gridMinimizerStatus)
+			if not record['error'] == 0 and gridMinimizerStatus == GridMinimizerStatus.Off:
+				record = self._calculateRecord(properties,GridMinimizerStatus.On)
+			records[i] = record
+		return self._recordColumns(records,properties)
+
+	@staticmethod
+	def _serpentineOrder(shape):
+		"""
+		serpentine (boustrophedon) traversal of a grid with the longest axis innermost: consecutive points are neighbours
+
+		Parameters
+		----------
+		param1
+			shape: shape of the grid
+
+		Returns
+		-------
+		numpy array
+			flat (C order) indices of the grid points in traversal order
+		"""
+		if len(shape) == 0:
+			return np.zeros(1, dtype=np.intp)
+		permutation = np.argsort(shape, kind='stable')
+		indices = np.indices([shape[k] for k in permutation]).reshape(len(shape),-1)
+		parity = np.zeros(indices.shape[1], dtype=np.intp)
+		for k in range(len(shape)):
+			reverse = parity % 2 == 1
+			indices[k,reverse] = shape[permutation[k]]-1-indices[k,reverse]
+			parity += indices[k]
+		original = np.empty_like(indices)
+		original[permutation] = indices
+		return np.ravel_multi_index(original, shape)
+
+	def iterEquilibria(self,elementMoleFractions,conditions,properties,chunk_size=100,store=None):
+		"""
+		Streaming batch equilibrium calculations
+
+		The conditions are read lazily and the results are yielded chunk by chunk as soon as they are calculated,
+		so the memory stays bounded for very large sweeps.
+
+		Parameters
+		----------
+		param1
+			elementMoleFractions: element order of the compositions
+		param2
+			conditions: iterable of (temperature, composition) pairs, the composition ordered as elementMoleFractions
+		param3
+			properties: state variable or list of state variables
+		param4
+			chunk_size: number of grid points per chunk
+		param5
+			store: persistent result store (OCPython_cache.EquilibriumStore) consulted before computing, as option
+
+		Yields
+		------
+		int
+			index of the first grid point of the chunk
+		dict
+			calculated properties of the chunk {state variable: numpy array}
+
+		Notes
+		-----
+		A single property is calculated with the batch subroutines, several properties are taken from one equilibrium per grid point
+		(batchEquilibriaProperties, scalar properties only).
+		"""
+		if isinstance(properties, str):
+			properties = [properties]
+		conditions = iter(conditions)
+		index = 0
+		while True:
+			chunk = list(itertools.islice(conditions, chunk_size))
+			if not chunk:
+				return
+			temperatures = np.array([float(temperature) for temperature, composition in chunk])
+			xfrac_matrix = np.array([composition for temperature, composition in chunk], dtype=np.float64)
+
+			if len(properties) > 1:
+				values = self.batchEquilibriaProperties(elementMoleFractions,xfrac_matrix,temperatures,properties,store=store)
+				results = {stavar: values[stavar] for stavar in properties}
+			else:
+				stavar = properties[0]
+				results = {stavar: np.empty(len(chunk))}
+				# one batch per run of equal temperatures
+				start = 0
+				for temperature, group in itertools.groupby(temperatures):
+					end = start+len(list(group))
+					results[stavar][start:end] = self.batchEquilibriaComp(end-start,elementMoleFractions,xfrac_matrix[start:end],temperature,stavar,store=store)
+					start = end
+
+			yield index, results
+			index += len(chunk)
+
+	def _batchConditions(self):
+		"""
+		conditions of the current equilibrium record without temperature and composition (set by the batch calculations)
+
+		Returns
+		-------
+		dict
+			conditions
+		"""
+		conditions = self.conditions.get(self.eqName, {})
+		return {name: value for name, value in conditions.items() if not (name == 'T' or name[0:2] in ('X(','W('))}
+
+	def _batchFromStore(self,store,keys,calculateMissing):
+		"""
+		get batch results from the store, calculate and store the missing ones
+
+		Parameters
+		----------
+		param1
+			store
+		param2
+			keys: one key per grid point
+		param3
+			calculateMissing: function calculating the results for a list of grid point indices
+
+		Returns
+		-------
+		numpy array
+			calculated properties
+		"""
+		stored = store.getMany(keys)
+		missing = [i for i, value in enumerate(stored) if value is None]
+		values = np.array([np.nan if value is None else value for value in stored], dtype=np.float64)
+		self.logger.debug('batch equilibria: %d from store, %d to calculate', len(keys)-len(missing), len(missing))
+		if missing:
+			values[missing] = calculateMissing(missing)
+			store.putMany(zip([keys[i] for i in missing], values[missing].tolist()))
 		return values
 
+	def _setCondition(self,name,value):
+		"""
+		keep track of a condition of the current equilibrium record (key of the result cache)
+
+		Parameters
+		----------
+		param1
+			name
+		param2
+			value
+		"""
+		if isinstance(value, (int, float, np.number)):
+			value = float(value)
+		self.conditions.setdefault(self.eqName, {})[name] = value
+		# cached results are only valid until the conditions are changed
+		self._cacheEntry = None
+		self._pendingGridMinimizerStatus = None
+
+	def getConditionSetter(self,name):
+		"""
+		get function setting a condition
+
+		Parameters
+		----------
+		param1
+			name: 'T', 'P', 'N', 'X(el)' or 'W(el)'
+
+		Returns
+		-------
+		function
+			function with the value of the condition as argument
+		"""
+		name = name.replace(' ','').upper()
+		if name == 'T':
+			return self.setTemperature
+		if name == 'P':
+			return self.setPressure
+		if name == 'N':
+			return self.setTotalMolarAmount
+		if name[0:2] in ('X(', 'W(') and name[-1] == ')':
+			index = self.getComponentNames().index(name[2:-1])
+			if name[0] == 'X':
+				return lambda value: self.setSingleElementMolarFraction(index, value)
+			return lambda value: self.setSingleElementMassFraction(index, value)
+		raise ValueError('unknown condition: %s' % name)
+
 	def setElementMolarFraction(self,elementMoleFractions:dict):
 		"""
 		set element molar fraction
@@ -553,6 +1362,7 @@ class SingleEquilibriumCalculation(object):
 				i=self.components.index(el)
 				self.logger.debug('set molar fraction %5.4f for element %s (%d)',v,el,i)
 				oc.f90wrap_pytqsetc('X',i+1,0,v,self.eq)
+				self._setCondition('X(%d)' % i, v)
 
 	def setSingleElementMolarFraction(self,index,xfrac):
 		"""
@@ -566,6 +1376,7 @@ class SingleEquilibriumCalculation(object):
 			xfrac
 		"""
 		oc.f90wrap_pytqsetc('X',index+1,0,xfrac,self.eq)
+		self._setCondition('X(%d)' % index, xfrac)
 		self.logger.debug('set mass amount %5.4f for element index (%d)',xfrac,index)
 
 	def setElementMassFraction(self,elementMassFractions):
@@ -584,6 +1395,7 @@ class SingleEquilibriumCalculation(object):
 				i=self.components.index(el)
 				self.logger.debug('set molar amount %5.4f for element %s (%d)',n,el,i)
 				oc.f90wrap_pytqsetc('W',i+1,0,n,self.eq)
+				self._setCondition('W(%d)' % i, n)
 
 	def setSingleElementMassFraction(self,index,wfrac):
 		"""
@@ -597,6 +1409,7 @@ class SingleEquilibriumCalculation(object):
 			wfrac
 		"""
 		oc.f90wrap_pytqsetc('W',index+1,0,wfrac,self.eq)
+		self._setCondition('W(%d)' % index, wfrac)
 		self.logger.debug('set mass amount %5.4f for element index (%d)',wfrac,index)
 
 	def setPhasesStatus(self, phaseNames, phaseStatus, phaseAmount=0.0):
@@ -620,6 +1433,12 @@ class SingleEquilibriumCalculation(object):
 		self.logger.debug('change phases status: %s to %s', phaseList1, phaseStatus)
 		oc.f90wrap_pytqphsts2(phaseList,phaseStatus,phaseAmount,self.eq)
 
+		# one entry per phase, so the cache key does not depend on the order of the calls
+		phases = {} if '*' in phaseList else dict(self.conditions[self.eqName].get('phases', {}))
+		for phaseName in phaseList.split(';'):
+			phases[phaseName] = (int(phaseStatus), float(phaseAmount))
+		self._setCondition('phases', phases)
+
 	def getPhasesStatus(self, nPhase):
 		"""
 		set phase status
@@ -633,23 +1452,7 @@ class SingleEquilibriumCalculation(object):
 		param3
 			phaseAmount
 		"""
-		status = np.zeros((nPhase,), dtype=int)
-		amdgm = np.zeros(nPhase)
-		phasename_bytes = oc.f90wrap_pytqgpsm(nPhase,status,amdgm,self.eq)
-
-		a = np.char.decode(phasename_bytes)
-
-		nn = 20
-		phase_list = []
-		for i in range(nPhase):
-			el = a[nn*(i+1)-nn:nn*(i+1)]
-			el_ = ''.join(el)
-			if len(el_) > 0:
-				phase_list.append(el_.strip())
-			else:
-				break
-
-		return phase_list,status,amdgm
+		return self._getResult('getPhasesStatus',nPhase)
 
 	def setTemperature(self,temperature:float=None):
 		"""
@@ -665,6 +1468,7 @@ class SingleEquilibriumCalculation(object):
 			oc.f90wrap_pytqsetc('T',0,0,temperature,self.eq)
 		else:
 			oc.f90wrap_pytqsetc('T',0,-1,0,self.eq)
+		self._setCondition('T', temperature)
 
 	def setPressure(self,pressure:float):
 		"""
@@ -677,6 +1481,7 @@ class SingleEquilibriumCalculation(object):
 		"""
 		self.logger.debug('set pressure to %3.2e Pa', pressure)
 		oc.f90wrap_pytqsetc('P',0,0,pressure,self.eq)
+		self._setCondition('P', pressure)
 
 	def setTotalMolarAmount(self,n:float):
 		"""
@@ -688,8 +1493,36 @@ class SingleEquilibriumCalculation(object):
 			n
 		"""
 		oc.f90wrap_pytqsetc('N',0,0,n,self.eq)
+		self._setCondition('N', n)
 		self.logger.debug('set total molar amount %5.2f ',n)
 
+	def setConditions(self,conditions):
+		"""
+		set the conditions and the phase status tracked for another equilibrium record (e.g. of another process),
+		the database and the reference phases are not changed
+
+		Parameters
+		----------
+		param1
+			conditions: conditions as in self.conditions[eqName]: 'T', 'P', 'N', 'X(i)', 'W(i)' and 'phases'
+		"""
+		for phaseList, value in conditions.get('phases', {}).items():
+			if isinstance(value, tuple):
+				self.setPhasesStatus(phaseList.split(';'), value[0], value[1])
+			elif phaseList:
+				# compact calculation: the listed phases are entered, the other ones suspended
+				self.setPhasesStatus(('*',), PhaseStatus.Suspended)
+				self.setPhasesStatus(phaseList.split(';'), value)
+		# a removed condition (None) is not set
+		for name in ('T', 'P', 'N'):
+			if conditions.get(name) is not None:
+				self.getConditionSetter(name)(conditions[name])
+		for name, value in conditions.items():
+			if name[0:2] == 'X(':
+				self.setSingleElementMolarFraction(int(name[2:-1]),value)
+			elif name[0:2] == 'W(':
+				self.setSingleElementMassFraction(int(name[2:-1]),value)
+
 	def getScalarResult(self,symbol:str):
 		"""
 		get scalar result
@@ -704,9 +1537,7 @@ class SingleEquilibriumCalculation(object):
 		Value
 			calculated property
 		"""
-		x = GetResults(self)
-		y = x.getScalarResult(symbol)
-		return y
+		return self._getResult('getScalarResult', symbol)
 
 	def getGibbsEnergy(self):
 		"""
@@ -717,9 +1548,7 @@ class SingleEquilibriumCalculation(object):
 		value
 			Gibbs energy
 		"""
-		x = GetResults(self)
-		y = x.getScalarResult('G')
-		return y
+		return self._getResult('getScalarResult', 'G')
 
 	def getChemicalPotentials(self):
 		"""
@@ -730,9 +1559,7 @@ class SingleEquilibriumCalculation(object):
 		dict
 			chemical potential
 		"""
-		x = GetResults(self)
-		y = x.getComponentAssociatedResult('MU')
-		return y
+		return self._getResult('getComponentAssociatedResult', 'MU')
 
 	def getValueComponent(self,symbol:str):
 		"""
@@ -749,9 +1576,7 @@ class SingleEquilibriumCalculation(object):
 			calculated property
 		"""
 
-		x = GetResults(self)
-		y = x.getComponentAssociatedResult(symbol)
-		return y
+		return self._getResult('getComponentAssociatedResult', symbol)
 
 	def getValuePhase(self,symbol:str):
 		"""
@@ -767,9 +1592,72 @@ class SingleEquilibriumCalculation(object):
 		dict
 			calculated property
 		"""
-		x = GetResults(self)
-		y = x.getPhaseAssociatedResult(symbol)
-		return y
+		return self._getResult('getPhaseAssociatedResult', symbol)
+
+	def getPhaseValues(self,symbol:str):
+		"""
+		get phase associated result as array (one value per phase tuple, in the order of getPhaseName)
+
+		Parameters
+		----------
+		param1
+			symbol
+
+		Returns
+		-------
+		numpy array
+			calculated property
+		"""
+		return self._getResult('getPhaseValues', symbol)
+
+	def getDrivingForces(self):
+		"""
+		get the driving forces (DGM) of the entered phase tuples which are not stable in the current equilibrium,
+		dormant, suspended and fixed phases are not included
+
+		Returns
+		-------
+		dict
+			{phase name: driving force}
+		"""
+		amounts = self.getPhaseValues('NP')
+		drivingForces = self.getPhaseValues('DGM')
+		phaseNames, status, _ = self.getPhasesStatus(len(amounts))
+		return {phaseName: drivingForce for phaseName, amount, drivingForce, phaseStatus in zip(phaseNames, amounts, drivingForces, status)
+			if amount <= 0.0 and PhaseStatus.Dormant < phaseStatus < PhaseStatus.Fixed}
+
+	def isPhaseSetChanged(self,drivingForceTolerance:float=1E-6):
+		"""
+		check if the set of stable phases may have changed, i.e. if an entered phase which is not stable has a positive driving force
+		(dormant phases may have a positive driving force without becoming stable)
+
+		Parameters
+		----------
+		param1
+			drivingForceTolerance
+
+		Returns
+		-------
+		bool
+			True if the equilibrium should be calculated again with the grid minimizer
+		"""
+		return any(drivingForce > drivingForceTolerance for drivingForce in self.getDrivingForces().values())
+
+	def getComponentValues(self,symbol:str):
+		"""
+		get component associated result as array (one value per component, in the order of getComponentNames)
+
+		Parameters
+		----------
+		param1
+			symbol
+
+		Returns
+		-------
+		numpy array
+			calculated property
+		"""
+		return self._getResult('getComponentValues', symbol)
 
 	def getConstituentsDescription(self):
 		"""
@@ -792,6 +1680,18 @@ class SingleEquilibriumCalculation(object):
 		param1
 			gridMinimizerStatus
 		"""
+		self._cacheEntry = None
+		self._pendingGridMinimizerStatus = None
+		if self.cache is not None:
+			key = self.cache.makeKey(self.conditions.get(self.eqName, {}), gridMinimizerStatus)
+			entry = self.cache.get(key)
+			if entry is not None:
+				# the equilibrium is only calculated if a result is requested which is not in the cache
+				self.logger.debug('equilibrium found in cache')
+				self._cacheEntry = entry
+				self._pendingGridMinimizerStatus = gridMinimizerStatus
+				return
+
 		self.logger.debug('calculate equilibrium with grid minimizer: %s', gridMinimizerStatus)
 		if (self.logger.isEnabledFor(level=logging.DEBUG)):
 			oc.f90wrap_pytqlc(6,self.eq)
@@ -799,6 +1699,56 @@ class SingleEquilibriumCalculation(object):
 		if (self.logger.isEnabledFor(level=logging.DEBUG)):
 			oc.f90wrap_pytqlr(6,self.eq)
 
+		if self.cache is not None and oc.f90wrap_pygeterr() == 0:
+			self._cacheEntry = self.cache.put(key)
+			# the phase names and status are zipped with the cached values by the callers,
+			# so they must come from the same entry and not from the live record
+			self.getPhasesStatus(self.getNumberPhase())
+
+	def setCache(self,cache=None):
+		"""
+		set result cache (opt-in), e.g. OCPython_cache.EquilibriumCache
+
+		calculateEquilibrium is skipped for conditions found in the cache and the getters return the stored results.
+
+		Parameters
+		----------
+		param1
+			cache: None to switch off the cache
+		"""
+		self.cache = cache
+		self._cacheEntry = None
+		self._pendingGridMinimizerStatus = None
+
+	def _getResult(self,getter,*args):
+		"""
+		get result through GetResults or from the cache
+
+		Parameters
+		----------
+		param1
+			getter: name of the method of GetResults
+		param2
+			args: arguments of the getter
+
+		Returns
+		-------
+		value
+			result of the getter
+		"""
+		entry = self._cacheEntry
+		if entry is None:
+			return getattr(self._results, getter)(*args)
+
+		key = (getter,)+args
+		if not key in entry:
+			if self._pendingGridMinimizerStatus is not None:
+				self.logger.debug('calculate equilibrium with grid minimizer: %s (not in cache: %s)', self._pendingGridMinimizerStatus, key)
+				oc.f90wrap_pytqce('',self._pendingGridMinimizerStatus,0,0.0,self.eq)
+				self._pendingGridMinimizerStatus = None
+			entry[key] = getattr(self._results, getter)(*args)
+		return copy.deepcopy(entry[key])
+
 	def listConditions(self):
 		"""
 		show conditions for equilibrium calculation
@@ -826,9 +1776,7 @@ class SingleEquilibriumCalculation(object):
 		dict
 			phase element composition
 		"""
-		x = GetResults(self)
-		y = x.getPhaseElementComposition()
-		return y
+		return self._getResult('getPhaseElementComposition')
 
 	def getPhaseSites(self):
 		"""
@@ -839,9 +1787,7 @@ class SingleEquilibriumCalculation(object):
 		dict
 			phase sites
 		"""
-		x = GetResults(self)
-		y = x.getPhaseSites()
-		return y
+		return self._getResult('getPhaseSites')
 
 	def getPhaseConstituentComposition(self):
 		"""
@@ -852,9 +1798,7 @@ class SingleEquilibriumCalculation(object):
 		dict
 			phase constituent composition
 		"""
-		x = GetResults(self)
-		y = x.getPhaseConstituentComposition()
-		return y
+		return self._getResult('getPhaseConstituentComposition')
 
 	def changeEquilibriumRecord(self,eqName=None,copiedEqName=None):
 		"""
@@ -871,16 +1815,21 @@ class SingleEquilibriumCalculation(object):
 			eq=oc.f90wrap_pytqselceq(self.equilibriumNamesInOC[copiedEqName])
 			self.logger.debug('create and select new equilibrium record: \'%s\' (\'%s\')', eqName, eqNameInOC)
 			iCopiedEq,self.eq=oc.f90wrap_pytqcceq(eqNameInOC,eq)
+			self.conditions[eqName] = copy.deepcopy(self.conditions.get(copiedEqName, {}))
 		else:
 			self.logger.debug('select equilibrium record: \'%s\' (\'%s\')', eqName, eqNameInOC)
 			self.eq=oc.f90wrap_pytqselceq(eqNameInOC)
 		self.eqName = eqName
+		self._cacheEntry = None
+		self._pendingGridMinimizerStatus = None
 
 	def deleteEquilibrium(self,eqName=None):
 		"""
 		delete equilibrium with name
 		"""
-		oc.f90wrap_pytqdceq(eqName)
+		oc.f90wrap_pytqdceq(self.equilibriumNamesInOC.pop(eqName, eqName))
+		self._results.phaseTables.pop(eqName, None)
+		self.conditions.pop(eqName, None)
 
 	def getErrorCode(self):
 		"""
@@ -898,4 +1847,59 @@ class SingleEquilibriumCalculation(object):
 		"""
 		if argument TRUE spurious output should be suppressed
 		"""
-		oc.f90wrap_pytqquiet(True)
\ No newline at end of file
+		oc.f90wrap_pytqquiet(True)
+
+class EquilibriumRecordPool(object):
+	"""
+	Pool of equilibrium records, e.g. one per grid point of a simulation
+
+	Every record keeps its own conditions and solution, so a calculation in a record starts from the previous
+	solution of the same record (and not from the last calculated one).
+	"""
+
+	def __init__(self,calc,nRecords,prefix='GP'):
+		"""
+		create the equilibrium records as copies of the current record of calc
+
+		Parameters
+		----------
+		param1
+			calc: SingleEquilibriumCalculation with database read and conditions set
+		param2
+			nRecords: number of records
+		param3
+			prefix: names of the records are prefix_0001, prefix_0002, ...
+		"""
+		self.calc = calc
+		self.baseEqName = calc.eqName
+		self.names = ['%s_%04d' % (prefix, i+1) for i in range(nRecords)]
+		for name in self.names:
+			calc.changeEquilibriumRecord(name,self.baseEqName)
+		calc.changeEquilibriumRecord(self.baseEqName)
+		self.current = None
+
+	def __len__(self):
+		return len(self.names)
+
+	def select(self,i):
+		"""
+		select the record i (the following conditions and calculations of calc use it)
+
+		Parameters
+		----------
+		param1
+			i: index of the record
+		"""
+		if not i == self.current or not self.calc.eqName == self.names[i]:
+			self.calc.changeEquilibriumRecord(self.names[i])
+			self.current = i
+
+	def release(self):
+		"""
+		delete the records and select the record the pool was created from
+		"""
+		self.calc.changeEquilibriumRecord(self.baseEqName)
+		for name in self.names:
+			self.calc.deleteEquilibrium(name)
+		self.names = []
+		self.current = None
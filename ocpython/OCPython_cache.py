@@ -0,0 +1,345 @@
+"""
+This is the result cache part of OC-Python (under development)
+
+Notes:
+1) The cache is opt-in: SingleEquilibriumCalculation.setCache(EquilibriumCache()).
+2) The key of an equilibrium is built from the database, the elements, the phase status, all conditions
+   (quantized to a number of significant digits) and the grid minimizer status.
+3) Only equilibria calculated without error are stored.
+4) EquilibriumStore is a persistent (SQLite) store across runs, keyed by the content hash of the database file
+   instead of its path. Batch and step calculations consult it before computing.
+
+author: Chunhui Luo, 2022
+"""
+
+import collections
+import hashlib, os, pickle, sqlite3, time
+
+class EquilibriumCache(object):
+	"""
+	In-memory LRU cache of equilibrium results keyed on quantized conditions
+	"""
+
+	def __init__(self, maxSize=1024, significantDigits=10):
+		"""
+		initiate the cache
+
+		Parameters
+		----------
+		param1
+			maxSize: maximal number of stored equilibria, the least recently used ones are removed
+		param2
+			significantDigits: floats in the conditions are rounded to this number of significant digits
+		"""
+		self.maxSize = maxSize
+		self.significantDigits = significantDigits
+		self.entries = collections.OrderedDict()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def __len__(self):
+		return len(self.entries)
+
+	def quantize(self, value):
+		"""
+		quantize a condition value
+
+		Parameters
+		----------
+		param1
+			value
+
+		Returns
+		-------
+		immutable value
+			floats rounded to significantDigits, tuples and dicts (sorted by key) converted recursively
+		"""
+		if isinstance(value, float):
+			return float('%.*g' % (self.significantDigits, value))
+		if isinstance(value, dict):
+			return tuple((k, self.quantize(v)) for k, v in sorted(value.items(), key=lambda item: str(item[0])))
+		if isinstance(value, (tuple, list)):
+			return tuple(self.quantize(v) for v in value)
+		return value
+
+	def makeKey(self, conditions, gridMinimizerStatus):
+		"""
+		make the (immutable) key of an equilibrium
+
+		Parameters
+		----------
+		param1
+			conditions: conditions of the equilibrium record, as tracked by SingleEquilibriumCalculation
+		param2
+			gridMinimizerStatus
+
+		Returns
+		-------
+		tuple
+			key
+		"""
+		return (self.quantize(sorted(conditions.items())), int(gridMinimizerStatus))
+
+	def get(self, key):
+		"""
+		get the stored results of an equilibrium
+
+		Parameters
+		----------
+		param1
+			key
+
+		Returns
+		-------
+		dict
+			stored results {(getter, arguments): value}, None if the equilibrium is not stored
+		"""
+		entry = self.entries.get(key)
+		if entry is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self.entries.move_to_end(key)
+		return entry
+
+	def put(self, key, entry=None):
+		"""
+		store an equilibrium
+
+		Parameters
+		----------
+		param1
+			key
+		param2
+			entry: results {(getter, arguments): value}, an empty dict if None
+
+		Returns
+		-------
+		dict
+			stored results, getters add their values to it
+		"""
+		if entry is None:
+			entry = {}
+		self.entries[key] = entry
+		self.entries.move_to_end(key)
+		while len(self.entries) > self.maxSize:
+			self.entries.popitem(last=False)
+			self.evictions += 1
+		return entry
+
+	def clear(self):
+		"""
+		remove all stored equilibria and reset the statistics
+		"""
+		self.entries.clear()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def getStatistics(self):
+		"""
+		get hit/miss statistics
+
+		Returns
+		-------
+		dict
+			size, hits, misses, evictions and hit rate
+		"""
+		nLookups = self.hits+self.misses
+		return {
+			'size': len(self.entries),
+			'maxSize': self.maxSize,
+			'hits': self.hits,
+			'misses': self.misses,
+			'evictions': self.evictions,
+			'hitRate': self.hits/nLookups if nLookups > 0 else 0.0,
+			}
+
+class EquilibriumStore(object):
+	"""
+	Persistent content-addressed store of equilibrium results (SQLite)
+	"""
+	_chunkSize = 500
+
+	def __init__(self, filePath, significantDigits=10, maxEntries=None, maxAge=None):
+		"""
+		open (or create) the store
+
+		Parameters
+		----------
+		param1
+			filePath: SQLite file
+		param2
+			significantDigits: floats in the conditions are rounded to this number of significant digits
+		param3
+			maxEntries: maximal number of stored results, the least recently used ones are removed (None: no limit)
+		param4
+			maxAge: results not used for maxAge seconds are removed (None: no limit)
+		"""
+		self.filePath = filePath
+		self.maxEntries = maxEntries
+		self.maxAge = maxAge
+		self.quantizer = EquilibriumCache(significantDigits=significantDigits)
+		self.databaseHashes = {}
+		self.hits = 0
+		self.misses = 0
+
+		self.connection = sqlite3.connect(filePath)
+		self.connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB, created REAL, accessed REAL)')
+		self.connection.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+		self.connection.commit()
+		self.evict()
+
+	def __len__(self):
+		return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+	def close(self):
+		"""
+		close the store
+		"""
+		self.connection.close()
+
+	def getDatabaseHash(self, tdbFilePath):
+		"""
+		get the content hash of a database file (cached as long as the file is not modified)
+
+		Parameters
+		----------
+		param1
+			tdbFilePath
+
+		Returns
+		-------
+		str
+			sha256 hash of the file content
+		"""
+		stat = os.stat(tdbFilePath)
+		fileId = (os.path.abspath(tdbFilePath), stat.st_mtime, stat.st_size)
+		databaseHash = self.databaseHashes.get(fileId)
+		if databaseHash is None:
+			with open(tdbFilePath, 'rb') as f:
+				databaseHash = hashlib.sha256(f.read()).hexdigest()
+			self.databaseHashes[fileId] = databaseHash
+		return databaseHash
+
+	def makeKey(self, conditions, *args):
+		"""
+		make the key of a result
+
+		Parameters
+		----------
+		param1
+			conditions: conditions of the equilibrium record, as tracked by SingleEquilibriumCalculation
+		param2
+			args: further identification of the result (e.g. grid minimizer status, state variables)
+
+		Returns
+		-------
+		str
+			key (sha256 hash of the quantized conditions)
+		"""
+		conditions = dict(conditions)
+		database = conditions.get('database')
+		if database is not None:
+			conditions['database'] = (self.getDatabaseHash(database[0]),)+tuple(database[1:])
+		key = (self.quantizer.quantize(sorted(conditions.items())), self.quantizer.quantize(args))
+		return hashlib.sha256(repr(key).encode()).hexdigest()
+
+	def getMany(self, keys):
+		"""
+		get stored results
+
+		Parameters
+		----------
+		param1
+			keys
+
+		Returns
+		-------
+		list
+			results, None for keys which are not stored
+		"""
+		found = {}
+		for i in range(0, len(keys), EquilibriumStore._chunkSize):
+			chunk = keys[i:i+EquilibriumStore._chunkSize]
+			rows = self.connection.execute('SELECT key, value FROM results WHERE key IN (%s)' % ','.join('?'*len(chunk)), chunk)
+			found.update((key, pickle.loads(value)) for key, value in rows)
+		if found:
+			now = time.time()
+			self.connection.executemany('UPDATE results SET accessed=? WHERE key=?', [(now, key) for key in found])
+			self.connection.commit()
+		self.hits += len(found)
+		self.misses += len(keys)-len(found)
+		return [found.get(key) for key in keys]
+
+	def get(self, key):
+		"""
+		get a stored result
+
+		Parameters
+		----------
+		param1
+			key
+
+		Returns
+		-------
+		value
+			result, None if the key is not stored
+		"""
+		return self.getMany([key])[0]
+
+	def putMany(self, items):
+		"""
+		store results
+
+		Parameters
+		----------
+		param1
+			items: (key, value) pairs
+		"""
+		now = time.time()
+		self.connection.executemany('INSERT OR REPLACE INTO results (key, value, created, accessed) VALUES (?,?,?,?)',
+			[(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now, now) for key, value in items])
+		self.connection.commit()
+		self.evict()
+
+	def put(self, key, value):
+		"""
+		store a result
+
+		Parameters
+		----------
+		param1
+			key
+		param2
+			value
+		"""
+		self.putMany([(key, value)])
+
+	def evict(self):
+		"""
+		remove results older than maxAge and the least recently used results above maxEntries
+		"""
+		if self.maxAge is not None:
+			self.connection.execute('DELETE FROM results WHERE accessed < ?', (time.time()-self.maxAge,))
+		if self.maxEntries is not None:
+			self.connection.execute('DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed DESC LIMIT -1 OFFSET ?)', (self.maxEntries,))
+		self.connection.commit()
+
+	def getStatistics(self):
+		"""
+		get hit/miss statistics
+
+		Returns
+		-------
+		dict
+			size, hits, misses and hit rate
+		"""
+		nLookups = self.hits+self.misses
+		return {
+			'size': len(self),
+			'hits': self.hits,
+			'misses': self.misses,
+			'hitRate': self.hits/nLookups if nLookups > 0 else 0.0,
+			}
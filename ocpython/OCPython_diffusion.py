@@ -0,0 +1,762 @@
+"""
+This is the diffusion part of OC-Python (under development)
+
+Notes:
+1) It is the same model as the fortran example (https://github.com/sundmanbo/opencalphad/tree/master/examples/TQ4lib/F90/parallel-alnipt):
+   explicit 1D diffusion driven by the differences of the chemical potentials between neighbouring grid points.
+2) Compositions and chemical potentials are numpy arrays (grid point, component), the fluxes and the renormalization
+   are calculated for all grid points at once.
+3) The simulation runs without graphics, the profiles are kept as snapshots every snapshotInterval steps.
+4) By default every grid point has its own equilibrium record (as gpp(gp)%eqp in the fortran example), so each
+   equilibrium starts from the previous solution of the same grid point.
+5) The time step (in units of the fixed step of the fortran example) can be adapted: it grows while the fractions
+   change slowly and shrinks when the change of the fractions is large or the fractions approach 0 or 1.
+6) With lazy equilibration, grid points which barely changed since their last equilibrium are not calculated.
+7) ParallelDiffusionSimulation solves the same model on 2D and 3D meshes. The mesh is split into slabs along its first axis,
+   each slab is calculated by a worker process with its own liboctq instance. Compositions and potentials are kept in
+   shared memory, so the halo (the neighbouring layers of the adjacent slabs) is read directly at every step.
+   A script using it must protect its main part with: if __name__ == '__main__':
+
+author: Chunhui Luo, 2022
+"""
+
+import multiprocessing, os
+import numpy as np
+
+try:
+	from ocpython.OCPython import GridMinimizerStatus
+except:
+	from OCPython import GridMinimizerStatus
+try:
+	from ocpython.OCPython import EquilibriumRecordPool
+except:
+	from OCPython import EquilibriumRecordPool
+try:
+	from ocpython.OCPython_parallel import createWorkerCalculation
+except:
+	from OCPython_parallel import createWorkerCalculation
+
+class DiffusionSimulation(object):
+	"""
+	1D diffusion simulation with one equilibrium per grid point
+	"""
+	_gasConstant = 8.31451
+	_minFraction = 1.0E-8
+	_fluxTolerance = 1.0E-12
+	_potentialTolerance = 1.0E-14
+	_sumTolerance = 1.0E-7
+	# fraction of the distance to the bounds of the fractions a grid point may move in one adaptive step
+	_boundSafety = 0.5
+	# largest mobility*dmu/dx*time step of an adaptive step (the explicit scheme is stable below 0.5)
+	_stabilityLimit = 0.4
+
+	def __init__(self, calc, compositions, mobilities, snapshotInterval=100, gridMinimizerStatus=GridMinimizerStatus.Off, recordPerPoint=True):
+		"""
+		initiate the diffusion simulation
+
+		Parameters
+		----------
+		param1
+			calc: SingleEquilibriumCalculation with database read, phase status, temperature, pressure and amount set
+		param2
+			compositions: molar fractions (grid point, component), components ordered as calc.getComponentNames(),
+			the last component is dependent
+		param3
+			mobilities: mobility of each component
+		param4
+			snapshotInterval: number of steps between two snapshots of the profiles
+		param5
+			gridMinimizerStatus: used for the equilibria of the steps (the initial equilibria use the grid minimizer)
+		param6
+			recordPerPoint: one equilibrium record per grid point (EquilibriumRecordPool), one record for all grid points otherwise
+		"""
+		self.calc = calc
+		self.components = list(calc.getComponentNames())
+		self.x = np.array(compositions, dtype=np.float64)
+		self.nPoints, self.nComponents = self.x.shape
+		if not self.nComponents == len(self.components):
+			raise ValueError('compositions must have one column per component %s' % self.components)
+		self.mobilities = np.asarray(mobilities, dtype=np.float64)
+		self.snapshotInterval = snapshotInterval
+		self.gridMinimizerStatus = gridMinimizerStatus
+
+		self.temperature = calc.conditions.get(calc.eqName, {}).get('T')
+		if self.temperature is None:
+			raise ValueError('the temperature must be set before the diffusion simulation')
+		self.RT = DiffusionSimulation._gasConstant*self.temperature
+		self.mu = np.empty_like(self.x)
+		self.nSteps = 0
+		self.time = 0.0
+		self.timeStep = 1.0
+		self.adaptiveTimeStep = None
+		self.dxmax = np.inf
+		self.nEquilibria = 0
+		self.nSkipped = 0
+		self.snapshots = []
+
+		# lazy equilibration: compositions and potentials of the last equilibrium of every grid point and dmu/dx (secant)
+		self.lazyEquilibration = None
+		self.xSolved = self.x.copy()
+		self.muSolved = np.empty_like(self.x)
+		self.jacobian = np.zeros((self.nPoints, self.nComponents, self.nComponents-1))
+		self.hasJacobian = np.zeros(self.nPoints, dtype=bool)
+		self.records = EquilibriumRecordPool(calc, self.nPoints) if recordPerPoint else None
+
+		self.calculatePotentials(GridMinimizerStatus.On, force=True)
+		self.takeSnapshot()
+
+	def calculatePotential(self, i, gridMinimizerStatus):
+		"""
+		calculate equilibrium at a grid point and get the chemical potentials (/RT)
+
+		Parameters
+		----------
+		param1
+			i: grid point
+		param2
+			gridMinimizerStatus
+		"""
+		if self.records is not None:
+			self.records.select(i)
+		for j in range(self.nComponents-1):
+			self.calc.setSingleElementMolarFraction(j, self.x[i,j])
+		self.calc.calculateEquilibrium(gridMinimizerStatus)
+		error = self.calc.getErrorCode()
+		if not error == 0:
+			self.calc.resetErrorCode()
+			raise ValueError('equilibrium calculation failed at grid point %d (error %d)' % (i, error))
+		self.mu[i] = self.calc.getComponentValues('MU')[0:self.nComponents]/self.RT
+		self.nEquilibria += 1
+
+	def calculatePotentials(self, gridMinimizerStatus=None, force=False):
+		"""
+		calculate the chemical potentials (/RT) of all grid points
+
+		With lazy equilibration grid points whose composition moved less than the tolerance since their last equilibrium
+		are not calculated: they keep the potentials of their last equilibrium (updated with dmu/dx if it is used).
+
+		Parameters
+		----------
+		param1
+			gridMinimizerStatus: self.gridMinimizerStatus if None
+		param2
+			force: calculate all grid points (also with lazy equilibration)
+
+		Returns
+		-------
+		int
+			number of grid points which are not calculated
+		"""
+		if gridMinimizerStatus is None:
+			gridMinimizerStatus = self.gridMinimizerStatus
+		delta = self.x[:,:-1]-self.xSolved[:,:-1]
+		if self.lazyEquilibration is None or force:
+			points = np.arange(self.nPoints)
+		else:
+			tolerance, useJacobian = self.lazyEquilibration
+			moved = np.abs(delta).max(axis=1) > tolerance
+			points = np.nonzero(moved)[0]
+			skipped = ~moved
+			self.mu[skipped] = self.muSolved[skipped]
+			if useJacobian:
+				update = skipped & self.hasJacobian
+				self.mu[update] += np.einsum('ijk,ik->ij', self.jacobian[update], delta[update])
+
+		for i in points:
+			self.calculatePotential(i, gridMinimizerStatus)
+		if self.lazyEquilibration is not None and self.lazyEquilibration[1] and not force:
+			self.updateJacobian(points, delta[points])
+		self.xSolved[points] = self.x[points]
+		self.muSolved[points] = self.mu[points]
+
+		nSkipped = self.nPoints-len(points)
+		self.nSkipped += nSkipped
+		return nSkipped
+
+	def updateJacobian(self, points, delta):
+		"""
+		secant (Broyden) update of dmu/dx of grid points with their new equilibrium
+
+		Parameters
+		----------
+		param1
+			points: grid points
+		param2
+			delta: change of the independent fractions since the previous equilibrium of the grid points
+		"""
+		norm = (delta*delta).sum(axis=1)
+		valid = norm > 0.0
+		points, delta, norm = points[valid], delta[valid], norm[valid]
+		dmu = self.mu[points]-self.muSolved[points]
+		residual = dmu-np.einsum('ijk,ik->ij', self.jacobian[points], delta)
+		self.jacobian[points] += residual[:,:,np.newaxis]*delta[:,np.newaxis,:]/norm[:,np.newaxis,np.newaxis]
+		self.hasJacobian[points] = True
+
+	def setLazyEquilibration(self, tolerance=1.0E-6, useJacobian=False):
+		"""
+		switch on the lazy equilibration: grid points whose composition moved less than tolerance since their last
+		equilibrium are not calculated
+
+		Parameters
+		----------
+		param1
+			tolerance: on the largest change of an independent fraction
+		param2
+			useJacobian: update the potentials of the grid points which are not calculated with dmu/dx
+			(secant estimate from the previous equilibria of the grid point)
+		"""
+		self.lazyEquilibration = (tolerance, useJacobian)
+
+	def getStatistics(self):
+		"""
+		get the numbers of steps, calculated equilibria and skipped equilibria (lazy equilibration)
+
+		Returns
+		-------
+		dict
+			statistics
+		"""
+		nPointSteps = self.nEquilibria+self.nSkipped
+		return {
+			'steps': self.nSteps,
+			'equilibria': self.nEquilibria,
+			'skipped': self.nSkipped,
+			'skipRate': self.nSkipped/nPointSteps if nPointSteps > 0 else 0.0,
+			}
+
+	def calculateFluxes(self):
+		"""
+		calculate the fluxes between neighbouring grid points, scaled so that the sum of the fractions is kept
+
+		Returns
+		-------
+		numpy array
+			fluxes (interface, component) for a unit time step, positive from the right to the left grid point
+		float
+			largest flux for a unit time step without scaling (dxmax, used to check convergence)
+		"""
+		return DiffusionSimulation.scaleFluxes(np.diff(self.mu, axis=0), self.mobilities)
+
+	@staticmethod
+	def scaleFluxes(dmu, mobilities):
+		"""
+		calculate the fluxes from the differences of the potentials across interfaces, scaled so that the sum of the fractions is kept
+
+		Parameters
+		----------
+		param1
+			dmu: differences of the potentials (/RT) across the interfaces (..., component)
+		param2
+			mobilities
+
+		Returns
+		-------
+		numpy array
+			fluxes (..., component) for a unit time step
+		float
+			largest flux for a unit time step without scaling
+		"""
+		dmu = np.where(np.abs(dmu) < DiffusionSimulation._potentialTolerance, 0.0, dmu)
+		dx = mobilities*dmu
+
+		positive = dx > 0.0
+		sumpos = np.where(positive, dx, 0.0).sum(axis=-1)
+		sumneg = -np.where(positive, 0.0, dx).sum(axis=-1)
+		# scale the larger of the positive and negative flows to the smaller one, no diffusion if one of them is zero
+		noFlux = (sumpos <= DiffusionSimulation._fluxTolerance) | (sumneg <= DiffusionSimulation._fluxTolerance)
+		with np.errstate(divide='ignore', invalid='ignore'):
+			sdxp = np.where(sumpos > sumneg, sumneg/sumpos, 1.0)
+			sdxn = np.where(sumpos > sumneg, 1.0, sumpos/sumneg)
+		sdxp[noFlux] = 0.0
+		sdxn[noFlux] = 0.0
+
+		fluxes = np.where(dx >= 0.0, dx*sdxp[...,np.newaxis], dx*sdxn[...,np.newaxis])
+		dxmax = float(np.abs(dx).max()) if dx.size else 0.0
+		return fluxes, dxmax
+
+	def setAdaptiveTimeStep(self, maxFractionChange=5.0E-3, growthFactor=1.2, minTimeStep=1.0E-3, maxTimeStep=1.0E3):
+		"""
+		switch on the adaptive time step
+
+		Parameters
+		----------
+		param1
+			maxFractionChange: largest change of a fraction in one step
+		param2
+			growthFactor: largest growth of the time step from one step to the next
+		param3
+			minTimeStep
+		param4
+			maxTimeStep
+		"""
+		self.adaptiveTimeStep = (maxFractionChange, growthFactor, minTimeStep, maxTimeStep)
+
+	def setTimeStep(self, timeStep=1.0):
+		"""
+		set a fixed time step (switches off the adaptive time step)
+
+		Parameters
+		----------
+		param1
+			timeStep: in units of the fixed step of the fortran example
+		"""
+		self.timeStep = timeStep
+		self.adaptiveTimeStep = None
+
+	def adaptTimeStep(self, fluxes):
+		"""
+		adapt the time step to the fluxes: grow it by growthFactor at most, limited by the largest change of a fraction,
+		by the distance of the fractions to their bounds and by the stability of the explicit scheme
+		(estimated with dmu/dx between neighbouring grid points)
+
+		Parameters
+		----------
+		param1
+			fluxes: see calculateFluxes
+
+		Returns
+		-------
+		float
+			time step
+		"""
+		maxFractionChange, growthFactor, minTimeStep, maxTimeStep = self.adaptiveTimeStep
+		change = np.zeros_like(self.x)
+		change[:-1] += fluxes
+		change[1:] -= fluxes
+
+		timeStep = min(self.timeStep*growthFactor, maxTimeStep)
+		maxChange = np.abs(change).max() if change.size else 0.0
+		if maxChange > 0.0:
+			timeStep = min(timeStep, maxFractionChange/maxChange)
+		with np.errstate(divide='ignore', invalid='ignore'):
+			room = np.where(change < 0.0, self.x-DiffusionSimulation._minFraction, 1.0-DiffusionSimulation._minFraction-self.x)/np.abs(change)
+		room = room[change != 0.0]
+		if room.size:
+			timeStep = min(timeStep, DiffusionSimulation._boundSafety*room.min())
+
+		dx = np.abs(np.diff(self.x, axis=0))
+		valid = dx > DiffusionSimulation._fluxTolerance
+		if np.any(valid):
+			diffusivity = (self.mobilities*np.abs(np.diff(self.mu, axis=0)))[valid]/dx[valid]
+			if diffusivity.max() > 0.0:
+				timeStep = min(timeStep, DiffusionSimulation._stabilityLimit/diffusivity.max())
+		return max(timeStep, minTimeStep)
+
+	def updateCompositions(self, fluxes):
+		"""
+		move the atoms between neighbouring grid points and keep the fractions in range
+
+		Parameters
+		----------
+		param1
+			fluxes: see calculateFluxes
+		"""
+		self.x[:-1] += fluxes
+		self.x[1:] -= fluxes
+		np.clip(self.x, DiffusionSimulation._minFraction, 1.0-DiffusionSimulation._minFraction, out=self.x)
+		sums = self.x.sum(axis=1)
+		wrong = np.nonzero(np.abs(sums-1.0) > DiffusionSimulation._sumTolerance)[0]
+		if len(wrong) > 0:
+			raise ValueError('sum of fractions not unity at grid point %d: %f' % (wrong[0], sums[wrong[0]]))
+
+	def step(self):
+		"""
+		one time step: fluxes, new compositions and new equilibria
+
+		Returns
+		-------
+		float
+			dxmax
+		"""
+		fluxes, self.dxmax = self.calculateFluxes()
+		if self.adaptiveTimeStep is not None:
+			self.timeStep = self.adaptTimeStep(fluxes)
+		self.updateCompositions(self.timeStep*fluxes)
+		self.calculatePotentials()
+		self.nSteps += 1
+		self.time += self.timeStep
+		if self.snapshotInterval > 0 and self.nSteps % self.snapshotInterval == 0:
+			self.takeSnapshot()
+		return self.dxmax
+
+	def run(self, maxSteps=50000, tolerance=1.0E-5, callback=None):
+		"""
+		run the simulation until the largest flux is below tolerance or maxSteps steps are done
+
+		Parameters
+		----------
+		param1
+			maxSteps
+		param2
+			tolerance: on dxmax (for a unit time step, independent of the time step)
+		param3
+			callback: function called with the simulation after every snapshot, as option (e.g. for plotting)
+
+		Returns
+		-------
+		int
+			number of steps
+		"""
+		for _ in range(maxSteps):
+			nSnapshots = len(self.snapshots)
+			dxmax = self.step()
+			if callback is not None and len(self.snapshots) > nSnapshots:
+				callback(self)
+			if dxmax < tolerance:
+				break
+		if not self.snapshots[-1][0] == self.nSteps:
+			self.takeSnapshot()
+		return self.nSteps
+
+	def takeSnapshot(self):
+		"""
+		keep the current profiles
+		"""
+		self.snapshots.append((self.nSteps, self.time, self.x.copy(), self.mu.copy()))
+
+	def getSnapshots(self):
+		"""
+		get the snapshots of the profiles
+
+		Returns
+		-------
+		dict
+			'step' and 'time' (snapshot), 'x' and 'mu' (snapshot, grid point, component) as numpy arrays and 'components'
+		"""
+		return {
+			'step': np.array([snapshot[0] for snapshot in self.snapshots]),
+			'time': np.array([snapshot[1] for snapshot in self.snapshots]),
+			'x': np.array([snapshot[2] for snapshot in self.snapshots]),
+			'mu': np.array([snapshot[3] for snapshot in self.snapshots]),
+			'components': list(self.components),
+			}
+
+	def saveSnapshots(self, filePath):
+		"""
+		save the snapshots of the profiles (numpy .npz file)
+
+		Parameters
+		----------
+		param1
+			filePath
+		"""
+		np.savez(filePath, **self.getSnapshots())
+
+	def release(self):
+		"""
+		delete the equilibrium records of the grid points
+		"""
+		if self.records is not None:
+			self.records.release()
+			self.records = None
+
+def _fluxDivergence(mu, mobilities):
+	"""
+	change of the fractions of the cells of a mesh for a unit time step (fluxes along every axis of the mesh)
+
+	Parameters
+	----------
+	param1
+		mu: potentials (/RT) of the cells (mesh axes..., component)
+	param2
+		mobilities
+
+	Returns
+	-------
+	numpy array
+		change of the fractions (same shape as mu)
+	float
+		largest flux without scaling (dxmax)
+	"""
+	change = np.zeros_like(mu)
+	dxmax = 0.0
+	for axis in range(mu.ndim-1):
+		fluxes, dxmaxAxis = DiffusionSimulation.scaleFluxes(np.diff(mu, axis=axis), mobilities)
+		lower = [slice(None)]*mu.ndim
+		upper = [slice(None)]*mu.ndim
+		lower[axis] = slice(0, -1)
+		upper[axis] = slice(1, None)
+		change[tuple(lower)] += fluxes
+		change[tuple(upper)] -= fluxes
+		dxmax = max(dxmax, dxmaxAxis)
+	return change, dxmax
+
+def _diffusionWorker(rank, slab, shape, sharedX, sharedMu, sharedDxmax, sharedErrors, barrier, connection, calculationArgs, mobilities, temperature, timeStep, gridMinimizerStatus):
+	"""
+	worker process of ParallelDiffusionSimulation: calculates the potentials and the new compositions of one slab
+
+	Every step has two phases separated by barriers: (1) fluxes and new compositions of the slab from the potentials
+	of the slab and its halo, (2) new potentials of the slab. The workers stop together when the largest flux of
+	all slabs is below the tolerance or when a worker has an error.
+
+	Parameters
+	----------
+	param1
+		rank: index of the worker
+	param2
+		slab: (first, last+1) layers along the first axis of the mesh
+	param3
+		shape: shape of the mesh and number of components
+	param4
+		sharedX, sharedMu: compositions and potentials (/RT) of the mesh (shared memory)
+	param5
+		sharedDxmax, sharedErrors: largest flux and error code of every worker (shared memory)
+	param6
+		barrier
+	param7
+		connection: receives (number of steps, tolerance) or None to stop, sends (steps done, dxmax, equilibria, error)
+	param8
+		calculationArgs: arguments of createWorkerCalculation
+	param9
+		mobilities, temperature, timeStep, gridMinimizerStatus
+	"""
+	x = np.frombuffer(sharedX, dtype=np.float64).reshape(shape)
+	mu = np.frombuffer(sharedMu, dtype=np.float64).reshape(shape)
+	dxmaxes = np.frombuffer(sharedDxmax, dtype=np.float64)
+	errors = np.frombuffer(sharedErrors, dtype=np.int32)
+	first, last = slab
+	# the slab with one halo layer on each side
+	lower = max(first-1, 0)
+	upper = min(last+1, shape[0])
+	nComponents = shape[-1]
+	RT = DiffusionSimulation._gasConstant*temperature
+
+	try:
+		calc = createWorkerCalculation(*calculationArgs)
+		calc.setTemperature(temperature)
+		cells = [index for index in np.ndindex(*shape[:-1]) if first <= index[0] < last]
+		nEquilibria = 0
+
+		def calculatePotentials(gridMinimizerStatus):
+			for index in cells:
+				for j in range(nComponents-1):
+					calc.setSingleElementMolarFraction(j, x[index][j])
+				calc.calculateEquilibrium(gridMinimizerStatus)
+				error = calc.getErrorCode()
+				if not error == 0:
+					calc.resetErrorCode()
+					return error
+				mu[index] = calc.getComponentValues('MU')[0:nComponents]/RT
+			return 0
+
+		errors[rank] = calculatePotentials(GridMinimizerStatus.On)
+		nEquilibria += len(cells)
+		barrier.wait()
+		connection.send((0, 0.0, nEquilibria, int(errors.max())))
+
+		while True:
+			command = connection.recv()
+			if command is None:
+				break
+			nSteps, tolerance = command
+			nDone = 0
+			dxmax = np.inf
+			while nDone < nSteps and not errors.any():
+				change, dxmaxes[rank] = _fluxDivergence(mu[lower:upper], mobilities)
+				slabX = x[first:last]
+				slabX += timeStep*change[first-lower:first-lower+last-first]
+				np.clip(slabX, DiffusionSimulation._minFraction, 1.0-DiffusionSimulation._minFraction, out=slabX)
+				if np.any(np.abs(slabX.sum(axis=-1)-1.0) > DiffusionSimulation._sumTolerance):
+					errors[rank] = -1
+				barrier.wait()
+
+				dxmax = float(dxmaxes.max())
+				if not errors.any():
+					errors[rank] = calculatePotentials(gridMinimizerStatus)
+					nEquilibria += len(cells)
+				barrier.wait()
+				nDone += 1
+				if dxmax < tolerance:
+					break
+			connection.send((nDone, dxmax, nEquilibria, int(errors.min() if errors.min() < 0 else errors.max())))
+	except Exception as e:
+		# release the other workers waiting at the barrier
+		barrier.abort()
+		connection.send((0, np.inf, 0, repr(e)))
+
+class ParallelDiffusionSimulation(object):
+	"""
+	Diffusion simulation on 2D and 3D meshes, the mesh is split into slabs calculated by worker processes
+	"""
+
+	def __init__(self, tdbFilePath, elements, compositions, mobilities, temperature, phaseNames=None, nProcesses=None,
+		pressure=1E5, totalMolarAmount=1.0, timeStep=None, snapshotInterval=100, gridMinimizerStatus=GridMinimizerStatus.Off):
+		"""
+		initiate the diffusion simulation, start the worker processes and calculate the initial potentials
+
+		Parameters
+		----------
+		param1
+			tdbFilePath
+		param2
+			elements
+		param3
+			compositions: molar fractions (mesh axes..., component), components in alphabetical order, the last one is dependent
+		param4
+			mobilities: mobility of each component
+		param5
+			temperature
+		param6
+			phaseNames: entered phases (all others are suspended), all phases are entered if None
+		param7
+			nProcesses: number of worker processes (slabs), os.cpu_count() if None
+		param8
+			pressure
+		param9
+			totalMolarAmount
+		param10
+			timeStep: in units of the fixed step of the fortran example, 1/(number of mesh axes) if None (stability of the explicit scheme)
+		param11
+			snapshotInterval: number of steps between two snapshots of the profiles
+		param12
+			gridMinimizerStatus: used for the equilibria of the steps (the initial equilibria use the grid minimizer)
+		"""
+		compositions = np.asarray(compositions, dtype=np.float64)
+		self.shape = compositions.shape
+		nLayers = self.shape[0]
+		if nProcesses is None:
+			nProcesses = os.cpu_count() or 1
+		self.nProcesses = max(1, min(nProcesses, nLayers))
+		self.timeStep = 1.0/(len(self.shape)-1) if timeStep is None else timeStep
+		self.snapshotInterval = snapshotInterval
+		self.nSteps = 0
+		self.time = 0.0
+		self.dxmax = np.inf
+		self.nEquilibria = 0
+		self.snapshots = []
+
+		# spawn is used on every platform: a forked worker would inherit the liboctq state of the parent
+		context = multiprocessing.get_context('spawn')
+		self.sharedX = context.RawArray('d', compositions.size)
+		self.sharedMu = context.RawArray('d', compositions.size)
+		self.x = np.frombuffer(self.sharedX, dtype=np.float64).reshape(self.shape)
+		self.mu = np.frombuffer(self.sharedMu, dtype=np.float64).reshape(self.shape)
+		self.x[...] = compositions
+		sharedDxmax = context.RawArray('d', self.nProcesses)
+		sharedErrors = context.RawArray('i', self.nProcesses)
+		barrier = context.Barrier(self.nProcesses)
+
+		slabs = np.array_split(np.arange(nLayers), self.nProcesses)
+		calculationArgs = (os.path.abspath(tdbFilePath), sorted(elements), phaseNames, pressure, totalMolarAmount)
+		self.connections = []
+		self.processes = []
+		for rank, slab in enumerate(slabs):
+			connection, workerConnection = context.Pipe()
+			process = context.Process(target=_diffusionWorker, args=(rank, (int(slab[0]), int(slab[-1])+1), self.shape,
+				self.sharedX, self.sharedMu, sharedDxmax, sharedErrors, barrier, workerConnection, calculationArgs,
+				np.asarray(mobilities, dtype=np.float64), float(temperature), self.timeStep, gridMinimizerStatus))
+			process.start()
+			self.connections.append(connection)
+			self.processes.append(process)
+
+		self._collect()
+		self.takeSnapshot()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def close(self):
+		"""
+		stop the worker processes
+		"""
+		for connection, process in zip(self.connections, self.processes):
+			if process.is_alive():
+				connection.send(None)
+			process.join()
+		self.connections = []
+		self.processes = []
+
+	def _collect(self):
+		"""
+		collect the replies of the workers
+
+		Returns
+		-------
+		int
+			number of steps done
+		"""
+		replies = [connection.recv() for connection in self.connections]
+		self.nEquilibria = sum(reply[2] for reply in replies)
+		for reply in replies:
+			if not reply[3] == 0:
+				self.close()
+				if reply[3] == -1:
+					raise ValueError('sum of fractions not unity in the diffusion simulation')
+				raise ValueError('diffusion simulation failed: %s' % (reply[3],))
+		nDone = replies[0][0]
+		if nDone > 0:
+			self.dxmax = replies[0][1]
+		return nDone
+
+	def run(self, maxSteps=50000, tolerance=1.0E-5, callback=None):
+		"""
+		run the simulation until the largest flux is below tolerance or maxSteps steps are done
+
+		Parameters
+		----------
+		param1
+			maxSteps
+		param2
+			tolerance: on dxmax
+		param3
+			callback: function called with the simulation after every snapshot, as option
+
+		Returns
+		-------
+		int
+			number of steps
+		"""
+		nRemaining = maxSteps
+		while nRemaining > 0:
+			nSteps = nRemaining if self.snapshotInterval <= 0 else min(nRemaining, self.snapshotInterval-self.nSteps % self.snapshotInterval)
+			for connection in self.connections:
+				connection.send((nSteps, tolerance))
+			nDone = self._collect()
+			self.nSteps += nDone
+			self.time += nDone*self.timeStep
+			nRemaining -= nDone
+			if self.snapshotInterval > 0 and self.nSteps % self.snapshotInterval == 0:
+				self.takeSnapshot()
+				if callback is not None:
+					callback(self)
+			if nDone < nSteps:
+				break
+		if not self.snapshots[-1][0] == self.nSteps:
+			self.takeSnapshot()
+		return self.nSteps
+
+	def takeSnapshot(self):
+		"""
+		keep the current profiles
+		"""
+		self.snapshots.append((self.nSteps, self.time, self.x.copy(), self.mu.copy()))
+
+	def getSnapshots(self):
+		"""
+		get the snapshots of the profiles
+
+		Returns
+		-------
+		dict
+			'step' and 'time' (snapshot), 'x' and 'mu' (snapshot, mesh axes..., component) as numpy arrays
+		"""
+		return {
+			'step': np.array([snapshot[0] for snapshot in self.snapshots]),
+			'time': np.array([snapshot[1] for snapshot in self.snapshots]),
+			'x': np.array([snapshot[2] for snapshot in self.snapshots]),
+			'mu': np.array([snapshot[3] for snapshot in self.snapshots]),
+			}
+
+	def saveSnapshots(self, filePath):
+		"""
+		save the snapshots of the profiles (numpy .npz file)
+
+		Parameters
+		----------
+		param1
+			filePath
+		"""
+		np.savez(filePath, **self.getSnapshots())
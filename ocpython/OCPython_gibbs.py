@@ -0,0 +1,621 @@
+"""
+This is the Gibbs energy part of OC-Python (under development)
+
+Notes:
+1) FUNCTION and PARAMETER expressions of a database read by OCPython_tdb are compiled to numpy functions of T (and P).
+   G, H, S and Cp of endmembers and pure elements are evaluated over arrays of temperatures without liboctq.
+2) Every expression is compiled once. The first and second derivatives with respect to T are propagated exactly
+   (forward mode), so S = -dG/dT, H = G+T*S and Cp = -T*d2G/dT2 are calculated together with G.
+3) Functions referenced by several expressions (e.g. GHSERFE) are evaluated once per call and shared.
+4) Temperatures outside the ranges of an expression are evaluated with the first or last range.
+5) The Gibbs energy of an endmember includes the magnetic contribution (Inden, Hillert and Jarl) of its TC and BMAGN
+   parameters when a type code of the phase is a MAGNETIC type definition (antiferromagnetic factor and structure factor p).
+   Negative TC and BMAGN are divided by the antiferromagnetic factor, the contribution is zero where one of them is 0.
+
+author: Chunhui Luo, 2022
+"""
+
+import ast
+import numpy as np
+
+try:
+	from ocpython.OCPython_tdb import TDBDatabase
+except:
+	from OCPython_tdb import TDBDatabase
+
+class _EvaluationContext(object):
+	"""
+	temperatures, pressures and the values of the functions evaluated so far
+	"""
+	def __init__(self, T, P):
+		self.T = T
+		self.P = P
+		# {symbol: (value, dT, dT2)} for all temperatures
+		self.values = {}
+
+class PiecewiseExpression(object):
+	"""
+	compiled piecewise expression of T and P (a FUNCTION or a PARAMETER)
+	"""
+	def __init__(self, name, ranges, compiler):
+		"""
+		compile a piecewise expression
+
+		Parameters
+		----------
+		param1
+			name
+		param2
+			ranges: list of (lowest temperature, expression, highest temperature)
+		param3
+			compiler: GibbsEnergyCompiler, resolves referenced functions
+		"""
+		self.name = name
+		self.ranges = ranges
+		self.highTemperatures = np.array([highTemperature for _, _, highTemperature in ranges], dtype=np.float64)
+		self.expressions = [compiler.compileExpression(expression) for _, expression, _ in ranges]
+
+	def evaluate(self, context, index=None):
+		"""
+		evaluate the expression and its first and second derivatives with respect to T
+
+		Parameters
+		----------
+		param1
+			context: _EvaluationContext
+		param2
+			index: indices of the temperatures to evaluate (all if None)
+
+		Returns
+		-------
+		tuple
+			value, dT, dT2 (numpy arrays)
+		"""
+		T = context.T if index is None else context.T[index]
+		P = context.P if index is None else context.P[index]
+		if len(self.expressions) == 1:
+			return tuple(np.broadcast_to(v, T.shape) for v in self.expressions[0](T, P, context, index))
+
+		ranges = np.searchsorted(self.highTemperatures[:-1], T, side='left')
+		results = tuple(np.empty(T.shape) for _ in range(3))
+		for i, expression in enumerate(self.expressions):
+			subset = np.nonzero(ranges == i)[0]
+			if len(subset) == 0:
+				continue
+			subIndex = subset if index is None else index[subset]
+			for result, v in zip(results, expression(T[subset], P[subset], context, subIndex)):
+				result[subset] = v
+		return results
+
+class MagneticExpression(object):
+	"""
+	compiled magnetic contribution R*T*ln(beta+1)*g(T/Tc) of an endmember (Inden, Hillert and Jarl)
+	"""
+	def __init__(self, name, criticalTemperature, magneticMoment, antiferromagneticFactor, structureFactor):
+		"""
+		initiate the magnetic contribution
+
+		Parameters
+		----------
+		param1
+			name
+		param2
+			criticalTemperature: PiecewiseExpression of the TC parameter
+		param3
+			magneticMoment: PiecewiseExpression of the BMAGN parameter
+		param4
+			antiferromagneticFactor: -1 (BCC) or -3 (FCC, HCP), negative TC and BMAGN are divided by it
+		param5
+			structureFactor: p, 0.4 (BCC) or 0.28 (FCC, HCP)
+		"""
+		self.name = name
+		self.criticalTemperature = criticalTemperature
+		self.magneticMoment = magneticMoment
+		self.antiferromagneticFactor = antiferromagneticFactor
+		p = structureFactor
+		self.A = 518.0/1125.0+11692.0/15975.0*(1.0/p-1.0)
+		self.a = 79.0/(140.0*p)
+		self.c = 474.0/497.0*(1.0/p-1.0)
+
+	def _getFunction(self, tau):
+		"""
+		g(tau) and its first and second derivatives with respect to tau
+		"""
+		A, a, c = self.A, self.a, self.c
+		g, g1, g2 = np.empty(tau.shape), np.empty(tau.shape), np.empty(tau.shape)
+		low = tau <= 1.0
+		t = tau[low]
+		g[low] = 1.0-(a/t+c*(t**3/6.0+t**9/135.0+t**15/600.0))/A
+		g1[low] = -(-a/t**2+c*(t**2/2.0+t**8/15.0+t**14/40.0))/A
+		g2[low] = -(2.0*a/t**3+c*(t+8.0*t**7/15.0+7.0*t**13/20.0))/A
+		high = ~low
+		t = tau[high]
+		g[high] = -(t**-5/10.0+t**-15/315.0+t**-25/1500.0)/A
+		g1[high] = (t**-6/2.0+t**-16/21.0+t**-26/60.0)/A
+		g2[high] = -(3.0*t**-7+16.0*t**-17/21.0+13.0*t**-27/30.0)/A
+		return g, g1, g2
+
+	def evaluate(self, context, index=None):
+		"""
+		evaluate the magnetic contribution and its first and second derivatives with respect to T
+
+		Parameters
+		----------
+		param1
+			context: _EvaluationContext
+		param2
+			index: indices of the temperatures to evaluate (all if None)
+
+		Returns
+		-------
+		tuple
+			value, dT, dT2 (numpy arrays)
+		"""
+		T = context.T if index is None else context.T[index]
+		tc, tc1, tc2 = (np.array(np.broadcast_to(v, T.shape), dtype=np.float64) for v in self.criticalTemperature.evaluate(context, index))
+		b, b1, b2 = (np.array(np.broadcast_to(v, T.shape), dtype=np.float64) for v in self.magneticMoment.evaluate(context, index))
+		for values in ((tc, tc1, tc2), (b, b1, b2)):
+			negative = values[0] < 0.0
+			for v in values:
+				v[negative] /= self.antiferromagneticFactor
+
+		results = tuple(np.zeros(T.shape) for _ in range(3))
+		magnetic = (tc > 0.0) & (b > 0.0)
+		if not magnetic.any():
+			return results
+		T, tc, tc1, tc2, b, b1, b2 = (v[magnetic] for v in (T, tc, tc1, tc2, b, b1, b2))
+		# tau = T/Tc
+		tau = T/tc
+		tau1 = (1.0-tau*tc1)/tc
+		tau2 = -(2.0*tau1*tc1+tau*tc2)/tc
+		g, g1, g2 = self._getFunction(tau)
+		g, g1, g2 = g, g1*tau1, g2*tau1*tau1+g1*tau2
+		# f = T*ln(beta+1)
+		l = np.log(b+1.0)
+		l1 = b1/(b+1.0)
+		l2 = b2/(b+1.0)-l1*l1
+		f, f1, f2 = T*l, l+T*l1, 2.0*l1+T*l2
+		R = GibbsEnergyCompiler._gasConstant
+		results[0][magnetic] = R*f*g
+		results[1][magnetic] = R*(f1*g+f*g1)
+		results[2][magnetic] = R*(f2*g+2.0*f1*g1+f*g2)
+		return results
+
+class EndmemberExpression(object):
+	"""
+	compiled Gibbs energy of an endmember: G parameter and magnetic contribution
+	"""
+	def __init__(self, name, gibbsEnergy, magnetic=None):
+		"""
+		initiate the endmember
+
+		Parameters
+		----------
+		param1
+			name
+		param2
+			gibbsEnergy: PiecewiseExpression of the G parameter
+		param3
+			magnetic: MagneticExpression, None if the endmember is not magnetic
+		"""
+		self.name = name
+		self.gibbsEnergy = gibbsEnergy
+		self.magnetic = magnetic
+
+	def evaluate(self, context, index=None):
+		"""
+		evaluate the Gibbs energy and its first and second derivatives with respect to T
+
+		Parameters
+		----------
+		param1
+			context: _EvaluationContext
+		param2
+			index: indices of the temperatures to evaluate (all if None)
+
+		Returns
+		-------
+		tuple
+			value, dT, dT2 (numpy arrays)
+		"""
+		values = self.gibbsEnergy.evaluate(context, index)
+		if self.magnetic is None:
+			return values
+		return tuple(v+m for v, m in zip(values, self.magnetic.evaluate(context, index)))
+
+class GibbsEnergyCompiler(object):
+	"""
+	Compiler of the Gibbs energy expressions of a database to vectorized numpy functions
+	"""
+	_gasConstant = 8.31451
+
+	def __init__(self, database):
+		"""
+		initiate the compiler
+
+		Parameters
+		----------
+		param1
+			database: TDBDatabase or tdb file path
+		"""
+		if not isinstance(database, TDBDatabase):
+			database = TDBDatabase.read(database)
+		self.database = database
+		self.compiledFunctions = {}
+		self.compiledParameters = {}
+		self.compiledEndmembers = {}
+
+	def compileFunction(self, symbol):
+		"""
+		compile a FUNCTION of the database
+
+		Parameters
+		----------
+		param1
+			symbol
+
+		Returns
+		-------
+		PiecewiseExpression
+			compiled function
+		"""
+		symbol = symbol.upper()
+		compiled = self.compiledFunctions.get(symbol)
+		if compiled is None:
+			function = self.database.functions[symbol]
+			compiled = PiecewiseExpression(symbol, function.ranges, self)
+			self.compiledFunctions[symbol] = compiled
+		return compiled
+
+	def compileParameter(self, parameter):
+		"""
+		compile a PARAMETER of the database
+
+		Parameters
+		----------
+		param1
+			parameter: TDBParameter
+
+		Returns
+		-------
+		PiecewiseExpression
+			compiled parameter
+		"""
+		key = (parameter.parameterType, parameter.phaseName, parameter.constituents, parameter.order)
+		compiled = self.compiledParameters.get(key)
+		if compiled is None:
+			compiled = PiecewiseExpression(parameter.text.split(None, 2)[1], parameter.ranges, self)
+			self.compiledParameters[key] = compiled
+		return compiled
+
+	def compileExpression(self, expression):
+		"""
+		compile an expression of T and P, functions are referenced by their symbol (with or without #)
+
+		Parameters
+		----------
+		param1
+			expression
+
+		Returns
+		-------
+		function
+			function(T, P, context, index) returning value, dT and dT2
+		"""
+		expression = expression.replace('#', '').strip() or '0'
+		try:
+			tree = ast.parse(expression, mode='eval')
+		except SyntaxError:
+			raise ValueError('cannot compile expression: %s' % expression)
+		return self._compileNode(tree.body)
+
+	def _constant(self, node):
+		"""
+		get the value of a constant node, None if the node is not constant
+		"""
+		# ast.Num in python 3.7, ast.Constant afterwards
+		if type(node).__name__ in ('Constant', 'Num'):
+			return float(node.value if hasattr(node, 'value') else node.n)
+		if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+			value = self._constant(node.operand)
+			if value is not None:
+				return -value if isinstance(node.op, ast.USub) else value
+		return None
+
+	def _compileNode(self, node):
+		"""
+		compile a node of the syntax tree of an expression (forward mode with first and second derivatives)
+		"""
+		value = self._constant(node)
+		if value is not None:
+			return lambda T, P, context, index: (value, 0.0, 0.0)
+
+		if isinstance(node, ast.Name):
+			name = node.id.upper()
+			if name == 'T':
+				return lambda T, P, context, index: (T, 1.0, 0.0)
+			if name == 'P':
+				return lambda T, P, context, index: (P, 0.0, 0.0)
+			if name in self.database.functions:
+				function = self.compileFunction(name)
+				def reference(T, P, context, index):
+					values = context.values.get(name)
+					if values is None:
+						values = function.evaluate(context)
+						context.values[name] = values
+					if index is None:
+						return values
+					return tuple(v[index] for v in values)
+				return reference
+			if name == 'R':
+				return lambda T, P, context, index: (GibbsEnergyCompiler._gasConstant, 0.0, 0.0)
+			raise ValueError('unknown function: %s' % name)
+
+		if isinstance(node, ast.UnaryOp):
+			operand = self._compileNode(node.operand)
+			if isinstance(node.op, ast.USub):
+				def negative(T, P, context, index):
+					v, d1, d2 = operand(T, P, context, index)
+					return -v, -d1, -d2
+				return negative
+			if isinstance(node.op, ast.UAdd):
+				return operand
+
+		if isinstance(node, ast.BinOp):
+			left = self._compileNode(node.left)
+			if isinstance(node.op, ast.Pow):
+				exponent = self._constant(node.right)
+				if exponent is not None:
+					return self._compilePower(left, exponent)
+				# general power a**b = exp(b*ln(a))
+				right = self._compileNode(node.right)
+				return self._compileExp(self._compileProduct(right, self._compileLn(left)))
+			right = self._compileNode(node.right)
+			if isinstance(node.op, ast.Add):
+				def add(T, P, context, index):
+					a, b = left(T, P, context, index), right(T, P, context, index)
+					return a[0]+b[0], a[1]+b[1], a[2]+b[2]
+				return add
+			if isinstance(node.op, ast.Sub):
+				def subtract(T, P, context, index):
+					a, b = left(T, P, context, index), right(T, P, context, index)
+					return a[0]-b[0], a[1]-b[1], a[2]-b[2]
+				return subtract
+			if isinstance(node.op, ast.Mult):
+				return self._compileProduct(left, right)
+			if isinstance(node.op, ast.Div):
+				return self._compileProduct(left, self._compilePower(right, -1.0))
+
+		if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and len(node.args) == 1:
+			name = node.func.id.upper()
+			argument = self._compileNode(node.args[0])
+			if name in ('LN', 'LOG'):
+				return self._compileLn(argument)
+			if name == 'EXP':
+				return self._compileExp(argument)
+			if name == 'SQRT':
+				return self._compilePower(argument, 0.5)
+
+		raise ValueError('cannot compile expression: %s' % ast.dump(node))
+
+	def _compileProduct(self, left, right):
+		def product(T, P, context, index):
+			a, b = left(T, P, context, index), right(T, P, context, index)
+			return a[0]*b[0], a[1]*b[0]+a[0]*b[1], a[2]*b[0]+2.0*a[1]*b[1]+a[0]*b[2]
+		return product
+
+	def _compilePower(self, base, exponent):
+		def power(T, P, context, index):
+			v, d1, d2 = base(T, P, context, index)
+			p2 = v**(exponent-2.0)
+			p1 = p2*v
+			return p1*v, exponent*p1*d1, exponent*(exponent-1.0)*p2*d1*d1+exponent*p1*d2
+		return power
+
+	def _compileLn(self, argument):
+		def ln(T, P, context, index):
+			v, d1, d2 = argument(T, P, context, index)
+			return np.log(v), d1/v, d2/v-(d1/v)**2
+		return ln
+
+	def _compileExp(self, argument):
+		def exp(T, P, context, index):
+			v, d1, d2 = argument(T, P, context, index)
+			e = np.exp(v)
+			return e, e*d1, e*(d2+d1*d1)
+		return exp
+
+	def getEndmemberParameter(self, phaseName, constituents):
+		"""
+		get the Gibbs energy parameter of an endmember
+
+		Parameters
+		----------
+		param1
+			phaseName
+		param2
+			constituents: one constituent per sublattice, e.g. ('FE','VA')
+
+		Returns
+		-------
+		TDBParameter
+			parameter G(phase,constituents;0)
+		"""
+		constituents = tuple((constituent.upper(),) for constituent in constituents)
+		key = ('G', phaseName.upper(), constituents, 0)
+		if not key in self.database.parameters:
+			raise ValueError('no Gibbs energy parameter for endmember %s of %s' % (':'.join(c[0] for c in constituents), phaseName))
+		return self.database.parameters[key]
+
+	def getMagneticModel(self, phaseName):
+		"""
+		get the magnetic model of a phase from the MAGNETIC type definition of its type codes
+
+		Parameters
+		----------
+		param1
+			phaseName
+
+		Returns
+		-------
+		tuple
+			antiferromagnetic factor and structure factor p, None if the phase is not magnetic
+		"""
+		phase = self.database.phases.get(phaseName.upper())
+		if phase is None:
+			return None
+		for code in phase.typeCodes:
+			typeDefinition = self.database.typeDefinitions.get(code)
+			if typeDefinition is not None and typeDefinition.kind == 'MAGNETIC':
+				if not len(typeDefinition.arguments) >= 2:
+					raise ValueError('magnetic type definition %s of %s needs the antiferromagnetic factor and p' % (code, phaseName))
+				return float(typeDefinition.arguments[0]), float(typeDefinition.arguments[1])
+		return None
+
+	def compileEndmember(self, phaseName, constituents):
+		"""
+		compile the Gibbs energy of an endmember, with the magnetic contribution of its TC and BMAGN parameters if the phase is magnetic
+
+		Parameters
+		----------
+		param1
+			phaseName
+		param2
+			constituents: one constituent per sublattice, e.g. ('FE','VA')
+
+		Returns
+		-------
+		EndmemberExpression
+			compiled endmember
+		"""
+		phaseName = phaseName.upper()
+		constituents = tuple(constituent.upper() for constituent in constituents)
+		compiled = self.compiledEndmembers.get((phaseName, constituents))
+		if compiled is None:
+			parameter = self.getEndmemberParameter(phaseName, constituents)
+			magnetic = None
+			model = self.getMagneticModel(phaseName)
+			key = tuple((constituent,) for constituent in constituents)
+			criticalTemperature = self.database.parameters.get(('TC', phaseName, key, 0))
+			magneticMoment = self.database.parameters.get(('BMAGN', phaseName, key, 0))
+			if model is not None and criticalTemperature is not None and magneticMoment is not None:
+				name = 'GMAG(%s,%s)' % (phaseName, ':'.join(constituents))
+				magnetic = MagneticExpression(name, self.compileParameter(criticalTemperature), self.compileParameter(magneticMoment), *model)
+			compiled = EndmemberExpression(parameter.text.split(None, 2)[1], self.compileParameter(parameter), magnetic)
+			self.compiledEndmembers[(phaseName, constituents)] = compiled
+		return compiled
+
+	def getElementParameter(self, element):
+		"""
+		get the Gibbs energy parameter of a pure element in its reference state
+
+		Parameters
+		----------
+		param1
+			element
+
+		Returns
+		-------
+		TDBParameter
+			parameter G(reference phase,element or VA;0)
+		"""
+		element = element.upper()
+		phaseName = self.database.elements[element].referenceState
+		for parameter in self.database.getParameters(phaseName, 'G'):
+			if parameter.order == 0 and all(len(c) == 1 and c[0] in (element, 'VA') for c in parameter.constituents) \
+				and any(c[0] == element for c in parameter.constituents):
+				return parameter
+		raise ValueError('no Gibbs energy parameter for %s in its reference state %s' % (element, phaseName))
+
+	def evaluate(self, expressions, T, P=1E5):
+		"""
+		evaluate compiled expressions, shared functions are evaluated once
+
+		Parameters
+		----------
+		param1
+			expressions: list of PiecewiseExpression or EndmemberExpression
+		param2
+			T: temperatures
+		param3
+			P: pressure(s)
+
+		Returns
+		-------
+		list
+			{'G','H','S','CP'} per expression (numpy arrays)
+		"""
+		T = np.atleast_1d(np.asarray(T, dtype=np.float64))
+		P = np.broadcast_to(np.asarray(P, dtype=np.float64), T.shape)
+		context = _EvaluationContext(T, P)
+		results = []
+		for expression in expressions:
+			G, dGdT, d2GdT2 = expression.evaluate(context)
+			S = -dGdT
+			results.append({'G': np.array(G), 'H': G+T*S, 'S': np.array(S), 'CP': -T*d2GdT2})
+		return results
+
+	def calculateEndmembers(self, endmembers, T, P=1E5):
+		"""
+		calculate G, H, S and Cp of endmembers
+
+		Parameters
+		----------
+		param1
+			endmembers: list of (phaseName, constituents), e.g. [('FCC_A1',('FE','VA')), ('LIQUID',('CR',))]
+		param2
+			T: temperatures
+		param3
+			P: pressure(s)
+
+		Returns
+		-------
+		list
+			{'G','H','S','CP'} per endmember (numpy arrays, J/mol formula unit)
+		"""
+		expressions = [self.compileEndmember(phaseName, constituents) for phaseName, constituents in endmembers]
+		return self.evaluate(expressions, T, P)
+
+	def calculateEndmember(self, phaseName, constituents, T, P=1E5):
+		"""
+		calculate G, H, S and Cp of an endmember
+
+		Parameters
+		----------
+		param1
+			phaseName
+		param2
+			constituents: one constituent per sublattice
+		param3
+			T: temperatures
+		param4
+			P: pressure(s)
+
+		Returns
+		-------
+		dict
+			{'G','H','S','CP'} (numpy arrays)
+		"""
+		return self.calculateEndmembers([(phaseName, constituents)], T, P)[0]
+
+	def calculateElements(self, elements, T, P=1E5):
+		"""
+		calculate G, H, S and Cp of pure elements in their reference state
+
+		Parameters
+		----------
+		param1
+			elements
+		param2
+			T: temperatures
+		param3
+			P: pressure(s)
+
+		Returns
+		-------
+		dict
+			{element: {'G','H','S','CP'}} (numpy arrays)
+		"""
+		parameters = [self.getElementParameter(element) for element in elements]
+		expressions = [self.compileEndmember(parameter.phaseName, [c[0] for c in parameter.constituents]) for parameter in parameters]
+		return dict(zip(elements, self.evaluate(expressions, T, P)))
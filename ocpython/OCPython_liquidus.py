@@ -0,0 +1,221 @@
+"""
+This is the liquidus and solidus part of OC-Python (under development)
+
+Notes:
+1) As in OC_ex8_singleEq_liquidus_solidus_temperature.py, the liquidus (solidus) temperature is calculated with the
+   liquid phase fixed at amount 1 (0) and the temperature as unknown.
+2) The liquidus and the solidus have their own equilibrium record, so every alloy starts from the solution of the
+   previous one (grid minimizer off). Alloys with similar compositions should therefore be consecutive.
+3) When there is no previous solution or the calculation from it fails, the liquid fraction is calculated on a coarse
+   temperature scan (grid minimizer on) and the fixed phase calculation starts from the scan temperatures bracketing the liquidus and the solidus.
+4) OCPython_parallel.ParallelEquilibriumEngine.liquidusSolidus splits the alloys into chunks calculated by worker processes.
+
+author: Chunhui Luo, 2022
+"""
+
+import numpy as np
+
+try:
+	from ocpython.OCPython import GridMinimizerStatus
+except:
+	from OCPython import GridMinimizerStatus
+try:
+	from ocpython.OCPython import PhaseStatus
+except:
+	from OCPython import PhaseStatus
+try:
+	from ocpython.OCPython import EquilibriumRecordPool
+except:
+	from OCPython import EquilibriumRecordPool
+
+class LiquidusSolidusCalculator(object):
+	"""
+	Liquidus and solidus temperatures of many alloys with warm start from the previous alloy
+	"""
+	_fractionTolerance = 1E-6
+	_temperatureTolerance = 1E-3
+	# accepted distance (K) of a result outside the scanned temperatures
+	_temperatureMargin = 500.0
+
+	def __init__(self, calc, liquidPhase='LIQUID', scanTemperatures=None, useWarmStart=True):
+		"""
+		initiate the calculator, two equilibrium records (liquidus and solidus) are created as copies of the current one
+
+		Parameters
+		----------
+		param1
+			calc: SingleEquilibriumCalculation with database read, phase status and pressure set
+		param2
+			liquidPhase: name of the liquid phase
+		param3
+			scanTemperatures: temperatures of the scan bracketing the liquidus and the solidus, 500 K to 3000 K every 100 K if None
+		param4
+			useWarmStart: start from the solution of the previous alloy
+		"""
+		self.calc = calc
+		self.liquidPhase = liquidPhase.upper()
+		self.scanTemperatures = np.arange(500.0, 3001.0, 100.0) if scanTemperatures is None else np.sort(np.asarray(scanTemperatures, dtype=np.float64))
+		self.useWarmStart = useWarmStart
+		self.records = EquilibriumRecordPool(calc, 2, 'LIQSOL')
+		self.isWarm = [False, False]
+		self.nScans = 0
+		self.nWarmStarts = 0
+
+	def release(self):
+		"""
+		delete the equilibrium records of the calculator
+		"""
+		self.records.release()
+
+	def _setComposition(self, index_list, xfrac):
+		"""
+		set the composition of the current equilibrium record
+		"""
+		for j, index in enumerate(index_list):
+			if xfrac[j] >= 0.0:
+				self.calc.setSingleElementMolarFraction(index, xfrac[j])
+
+	def _getLiquidFraction(self):
+		"""
+		get the fraction of the liquid phase (all its composition sets) of the current equilibrium
+		"""
+		amounts = self.calc.getPhaseValues('NP')
+		phaseNames = self.calc.getPhaseTable().names
+		liquid = sum(amount for phaseName, amount in zip(phaseNames, amounts) if phaseName.partition('#')[0] == self.liquidPhase)
+		total = amounts.sum()
+		return liquid/total if total > 0.0 else np.nan
+
+	def scan(self, index_list, xfrac):
+		"""
+		calculate the liquid fraction on the scan temperatures (in the record the calculator was created from)
+
+		Parameters
+		----------
+		param1
+			index_list: indices of the elements of xfrac
+		param2
+			xfrac: composition, negative for the dependent element
+
+		Returns
+		-------
+		float
+			start temperature of the liquidus: lowest scan temperature where the alloy is liquid, None if not found
+		float
+			start temperature of the solidus: highest scan temperature where the alloy is solid, None if not found
+		"""
+		self.nScans += 1
+		self.calc.changeEquilibriumRecord(self.records.baseEqName)
+		self._setComposition(index_list, xfrac)
+		fractions = np.full(len(self.scanTemperatures), np.nan)
+		# the grid minimizer is used at every scan temperature, the liquid may not appear when starting from a solid
+		for k, temperature in enumerate(self.scanTemperatures):
+			self.calc.setTemperature(temperature)
+			self.calc.calculateEquilibrium(GridMinimizerStatus.On)
+			error = self.calc.getErrorCode()
+			if not error == 0:
+				self.calc.resetErrorCode()
+				continue
+			fractions[k] = self._getLiquidFraction()
+
+		isLiquid = fractions >= 1.0-self._fractionTolerance
+		isSolid = fractions <= self._fractionTolerance
+		liquidus = [k for k in range(1, len(fractions)) if isLiquid[k] and not isLiquid[k-1]]
+		solidus = [k for k in range(len(fractions)-1) if isSolid[k] and not isSolid[k+1]]
+		return (self.scanTemperatures[liquidus[-1]] if liquidus else None,
+			self.scanTemperatures[solidus[0]] if solidus else None)
+
+	def _calculateFixed(self, r, amount, index_list, xfrac, startTemperature):
+		"""
+		calculate the temperature with the liquid phase fixed
+
+		Parameters
+		----------
+		param1
+			r: equilibrium record, 0 for the liquidus and 1 for the solidus
+		param2
+			amount: amount of the fixed liquid phase
+		param3
+			index_list
+		param4
+			xfrac
+		param5
+			startTemperature: temperature of the start equilibrium, the previous solution of the record is used if None
+
+		Returns
+		-------
+		float
+			temperature, NaN if the calculation failed
+		"""
+		self.records.select(r)
+		self._setComposition(index_list, xfrac)
+		if startTemperature is not None:
+			self.calc.setPhasesStatus([self.liquidPhase], PhaseStatus.Entered)
+			self.calc.setTemperature(startTemperature)
+			self.calc.calculateEquilibrium(GridMinimizerStatus.On)
+			error = self.calc.getErrorCode()
+			if not error == 0:
+				self.calc.resetErrorCode()
+				return np.nan
+			self.calc.setTemperature(None)
+			self.calc.setPhasesStatus([self.liquidPhase], PhaseStatus.Fixed, amount)
+
+		self.calc.calculateEquilibrium(GridMinimizerStatus.Off)
+		error = self.calc.getErrorCode()
+		if not error == 0 and startTemperature is not None:
+			self.calc.resetErrorCode()
+			self.calc.calculateEquilibrium(GridMinimizerStatus.On)
+			error = self.calc.getErrorCode()
+		if not error == 0:
+			self.calc.resetErrorCode()
+			return np.nan
+		temperature = self.calc.getScalarResult('T')
+		if not (self.scanTemperatures[0]-self._temperatureMargin <= temperature <= self.scanTemperatures[-1]+self._temperatureMargin):
+			return np.nan
+		return temperature
+
+	def calculate(self, elementMoleFractions, xfrac_matrix):
+		"""
+		calculate the liquidus and solidus temperatures of alloys
+
+		Parameters
+		----------
+		param1
+			elementMoleFractions: element order of the compositions
+		param2
+			xfrac_matrix: one composition (ordered as elementMoleFractions) per alloy, negative for the dependent element
+
+		Returns
+		-------
+		dict
+			'liquidus' and 'solidus' temperatures (NaN if not found), 'converged' (True if both were found) and
+			'scanned' (True if the scan was needed) as numpy arrays, one value per alloy
+		"""
+		elements = list(elementMoleFractions.keys())
+		elements.sort()
+		index_list = [elements.index(el_name) for el_name in elementMoleFractions]
+
+		xfrac_matrix = np.asarray(xfrac_matrix, dtype=np.float64)
+		xfrac_matrix = xfrac_matrix.reshape(len(xfrac_matrix),-1)
+		nAlloys = len(xfrac_matrix)
+		temperatures = np.full((2, nAlloys), np.nan)
+		scanned = np.zeros(nAlloys, dtype=bool)
+
+		for i in range(nAlloys):
+			starts = None
+			for r, amount in ((0, 1.0), (1, 0.0)):
+				temperature = np.nan
+				if self.useWarmStart and self.isWarm[r]:
+					self.nWarmStarts += 1
+					temperature = self._calculateFixed(r, amount, index_list, xfrac_matrix[i], None)
+				if np.isnan(temperature):
+					if starts is None:
+						starts = self.scan(index_list, xfrac_matrix[i])
+						scanned[i] = True
+					if starts[r] is not None:
+						temperature = self._calculateFixed(r, amount, index_list, xfrac_matrix[i], starts[r])
+				self.isWarm[r] = not np.isnan(temperature)
+				temperatures[r,i] = temperature
+
+		converged = ~np.isnan(temperatures).any(axis=0)
+		converged[converged] = temperatures[0,converged] >= temperatures[1,converged]-self._temperatureTolerance
+		return {'liquidus': temperatures[0], 'solidus': temperatures[1], 'converged': converged, 'scanned': scanned}
@@ -0,0 +1,265 @@
+"""
+This is the mapping part of OC-Python (under development)
+
+Notes:
+1) Phase boundaries of binary and isopleth diagrams (T against X(el) or W(el), the other conditions are kept) are traced
+   as zero phase fraction lines: the phase is fixed at amount 0 (as in OC_ex8_singleEq_liquidus_solidus_temperature.py),
+   the temperature is unknown and the composition axis is stepped. Every point starts from the previous one.
+2) Start points are found by coarse adaptive step calculations (OCPython_step) along the composition axis at a few
+   temperatures and along T at a few compositions. Start points on a boundary which was already traced are skipped.
+3) The step of the composition axis is halved where the boundary is steep, a boundary ends at the limits of the diagram,
+   where the calculation fails or where the temperature jumps at the smallest step. Nearly vertical boundaries
+   (e.g. of stoichiometric phases) are therefore only traced down to the smallest step.
+4) A traced boundary is split into polylines where the set of the other stable phases changes (invariant temperatures).
+
+author: Chunhui Luo, 2022
+"""
+
+import numpy as np
+
+try:
+	from ocpython.OCPython import PhaseStatus
+except:
+	from OCPython import PhaseStatus
+try:
+	from ocpython.OCPython_step import StepCalculator
+except:
+	from OCPython_step import StepCalculator
+
+class PhaseBoundaryMapper(object):
+	"""
+	Phase boundaries of a T-X diagram traced by continuation with fixed phases (zero phase fraction lines)
+	"""
+
+	def __init__(self, calc, axis, axisRange, temperatureRange, nScanLines=5, scanSteps=20, tolerance=1E-4,
+		minStep=1E-5, maxStep=0.05, maxTemperatureStep=20.0, coverTolerance=0.01):
+		"""
+		initiate the mapper
+
+		Parameters
+		----------
+		param1
+			calc: SingleEquilibriumCalculation with database read and conditions set (the other conditions are kept)
+		param2
+			axis: composition axis, 'X(el)' or 'W(el)'
+		param3
+			axisRange: (lowest, highest) value of the composition axis
+		param4
+			temperatureRange: (lowest, highest) temperature
+		param5
+			nScanLines: number of scans along each axis for the start points
+		param6
+			scanSteps: number of steps of the scans (before bisection of the boundaries)
+		param7
+			tolerance: accuracy of the start points, relative to the ranges of the axes (the first step of a boundary is ten times larger)
+		param8
+			minStep: smallest step of the composition axis, relative to its range
+		param9
+			maxStep: largest step of the composition axis, relative to its range
+		param10
+			maxTemperatureStep: largest change of the temperature (K) between two points of a boundary
+		param11
+			coverTolerance: start points closer to a traced boundary of the same phase are skipped, relative to the ranges of the axes
+		"""
+		self.calc = calc
+		self.axis = axis
+		self.axisRange = (float(axisRange[0]), float(axisRange[1]))
+		self.temperatureRange = (float(temperatureRange[0]), float(temperatureRange[1]))
+		self.nScanLines = nScanLines
+		self.scanSteps = scanSteps
+		self.tolerance = tolerance
+		self.minStep = minStep
+		self.maxStep = maxStep
+		self.maxTemperatureStep = maxTemperatureStep
+		self.coverTolerance = coverTolerance
+		self.stepper = StepCalculator(calc, axis, scalarProperties=(), phaseProperties=())
+		self.nEquilibria = 0
+
+	def _scale(self, values, temperatures):
+		"""
+		coordinates of points relative to the ranges of the axes
+		"""
+		axisWidth = self.axisRange[1]-self.axisRange[0]
+		temperatureWidth = self.temperatureRange[1]-self.temperatureRange[0]
+		return np.column_stack(((np.asarray(values)-self.axisRange[0])/axisWidth, (np.asarray(temperatures)-self.temperatureRange[0])/temperatureWidth))
+
+	def findStartPoints(self):
+		"""
+		find points on the phase boundaries with adaptive step calculations along both axes
+
+		Returns
+		-------
+		list
+			(temperature, value of the composition axis, phase name) of the boundaries found
+		"""
+		starts = []
+		axisWidth = self.axisRange[1]-self.axisRange[0]
+		temperatureWidth = self.temperatureRange[1]-self.temperatureRange[0]
+
+		for temperature in np.linspace(self.temperatureRange[0], self.temperatureRange[1], self.nScanLines):
+			self.calc.setTemperature(temperature)
+			results, boundaries = self.stepper.calculateAdaptive(self.axisRange[0], self.axisRange[1], axisWidth/self.scanSteps, axisWidth*self.tolerance)
+			self.nEquilibria += len(results[self.axis])
+			for value, appearing, disappearing in boundaries:
+				starts.extend((temperature, value, phaseName) for phaseName in appearing+disappearing)
+
+		temperatureStepper = StepCalculator(self.calc, 'T', scalarProperties=(), phaseProperties=())
+		for value in np.linspace(self.axisRange[0], self.axisRange[1], self.nScanLines+2)[1:-1]:
+			self.stepper.setAxis(value)
+			results, boundaries = temperatureStepper.calculateAdaptive(self.temperatureRange[0], self.temperatureRange[1], temperatureWidth/self.scanSteps, temperatureWidth*self.tolerance)
+			self.nEquilibria += len(results['T'])
+			for temperature, appearing, disappearing in boundaries:
+				starts.extend((temperature, value, phaseName) for phaseName in appearing+disappearing)
+		return starts
+
+	def _startBoundary(self, temperature, value, phaseName):
+		"""
+		calculate the start point of a boundary: equilibrium at the start point, then the phase fixed at amount 0 and T unknown
+
+		Returns
+		-------
+		float
+			temperature of the boundary, NaN if the calculation failed
+		"""
+		self.calc.setPhasesStatus([phaseName], PhaseStatus.Entered)
+		self.calc.setTemperature(temperature)
+		self.nEquilibria += 1
+		_, error = self.stepper.calculateStep(value, True)
+		if not error == 0:
+			return np.nan
+		self.calc.setTemperature(None)
+		self.calc.setPhasesStatus([phaseName], PhaseStatus.Fixed, 0.0)
+		self.nEquilibria += 1
+		_, error = self.stepper.calculateStep(value)
+		return np.nan if not error == 0 else self.calc.getScalarResult('T')
+
+	def _traceDirection(self, value, temperature, direction):
+		"""
+		trace a boundary from its start point in one direction of the composition axis,
+		the phase is fixed at amount 0 and T is unknown, the current equilibrium is the start point
+
+		Returns
+		-------
+		list
+			points (value, temperature, other stable phases), starting with the start point
+		"""
+		points = [(value, temperature, self.stepper.getStablePhases())]
+		axisWidth = self.axisRange[1]-self.axisRange[0]
+		minStep = self.minStep*axisWidth
+		maxStep = self.maxStep*axisWidth
+		step = self.tolerance*axisWidth*10.0
+		stop = self.axisRange[1] if direction > 0 else self.axisRange[0]
+
+		while direction*(stop-value) > 0.0:
+			nextValue = value+direction*min(step, abs(stop-value))
+			self.nEquilibria += 1
+			_, error = self.stepper.calculateStep(nextValue)
+			nextTemperature = self.calc.getScalarResult('T') if error == 0 else np.nan
+			if np.isnan(nextTemperature) or abs(nextTemperature-temperature) > self.maxTemperatureStep:
+				if step <= minStep:
+					break
+				step = max(0.5*step, minStep)
+				continue
+			if not self.temperatureRange[0] <= nextTemperature <= self.temperatureRange[1]:
+				break
+			points.append((nextValue, nextTemperature, self.stepper.getStablePhases()))
+			if abs(nextTemperature-temperature) < 0.25*self.maxTemperatureStep:
+				step = min(1.5*step, maxStep)
+			value, temperature = nextValue, nextTemperature
+		return points
+
+	def traceBoundary(self, temperature, value, phaseName):
+		"""
+		trace the zero phase fraction line of a phase through a start point
+
+		Parameters
+		----------
+		param1
+			temperature
+		param2
+			value: value of the composition axis
+		param3
+			phaseName
+
+		Returns
+		-------
+		list
+			polylines {'phase': phase name, 'phases': other stable phases, axis: numpy array, 'T': numpy array}, sorted along the composition axis
+		"""
+		# status set by the user (e.g. dormant), restored after tracing
+		phaseStatus = self.calc.conditions[self.calc.eqName].get('phases', {}).get(phaseName)
+		if not isinstance(phaseStatus, tuple):
+			phaseStatus = (PhaseStatus.Entered, 0.0)
+
+		lower, upper = [], []
+		startTemperature = self._startBoundary(temperature, value, phaseName)
+		if not np.isnan(startTemperature):
+			lower = self._traceDirection(value, startTemperature, -1.0)
+			if len(lower) > 1:
+				# back to the start point, starting from the end of the lower part
+				self.nEquilibria += 1
+				_, error = self.stepper.calculateStep(value)
+				if not error == 0:
+					startTemperature = self._startBoundary(temperature, value, phaseName)
+			if not np.isnan(startTemperature):
+				upper = self._traceDirection(value, startTemperature, 1.0)
+		self.calc.setPhasesStatus([phaseName], *phaseStatus)
+		self.calc.setTemperature(temperature)
+		points = lower[::-1]+upper[1:] if lower else upper
+
+		polylines = []
+		for point in points:
+			phases = sorted(point[2]-{phaseName})
+			if not polylines or not polylines[-1]['phases'] == phases:
+				polylines.append({'phase': phaseName, 'phases': phases, self.axis: [], 'T': []})
+			polylines[-1][self.axis].append(point[0])
+			polylines[-1]['T'].append(point[1])
+		for polyline in polylines:
+			polyline[self.axis] = np.array(polyline[self.axis])
+			polyline['T'] = np.array(polyline['T'])
+		return polylines
+
+	def _isCovered(self, temperature, value, phaseName, polylines):
+		"""
+		check if a start point is on a traced boundary of the same phase
+		"""
+		point = self._scale([value], [temperature])[0]
+		for polyline in polylines:
+			if not polyline['phase'] == phaseName:
+				continue
+			vertices = self._scale(polyline[self.axis], polyline['T'])
+			if len(vertices) == 1:
+				distance = np.linalg.norm(vertices[0]-point)
+			else:
+				# distance to the segments of the polyline
+				a, b = vertices[:-1], vertices[1:]
+				ab = b-a
+				t = np.clip(np.einsum('ij,ij->i', point-a, ab)/np.maximum(np.einsum('ij,ij->i', ab, ab), 1E-30), 0.0, 1.0)
+				distance = np.linalg.norm(a+t[:,np.newaxis]*ab-point, axis=1).min()
+			if distance <= self.coverTolerance:
+				return True
+		return False
+
+	def map(self, starts=None):
+		"""
+		map the phase boundaries of the diagram
+
+		Parameters
+		----------
+		param1
+			starts: start points (temperature, value, phase name), found with findStartPoints if None
+
+		Returns
+		-------
+		list
+			polylines, see traceBoundary
+		"""
+		self.nEquilibria = 0
+		if starts is None:
+			starts = self.findStartPoints()
+		polylines = []
+		for temperature, value, phaseName in starts:
+			if self._isCovered(temperature, value, phaseName, polylines):
+				continue
+			polylines.extend(self.traceBoundary(temperature, value, phaseName))
+		return polylines
@@ -0,0 +1,317 @@
+"""
+This is the parallel part of OC-Python (under development)
+
+Notes:
+1) liboctq keeps its data in global (module) variables, so it cannot be used from several threads.
+   Parallel calculations are therefore done with worker processes, each of them having its own liboctq instance.
+2) Every worker reads the database, sets the phase status and the conditions and calculates a first equilibrium
+   (grid minimizer on) once, afterwards it only receives chunks of the grid. ParallelEquilibriumEngine.fromCalculation
+   starts workers with the database, phase status and conditions of an equilibrium calculation of the parent process.
+3) Worker processes are spawned, so a script using this module must protect its main part with: if __name__ == '__main__':
+
+author: Chunhui Luo, 2022
+"""
+
+import logging, os, types
+import multiprocessing
+import numpy as np
+
+try:
+	from ocpython.OCPython import SingleEquilibriumCalculation
+except:
+	from OCPython import SingleEquilibriumCalculation
+try:
+	from ocpython.OCPython import PhaseStatus
+except:
+	from OCPython import PhaseStatus
+try:
+	from ocpython.OCPython import GridMinimizerStatus
+except:
+	from OCPython import GridMinimizerStatus
+try:
+	from ocpython.OCPython_liquidus import LiquidusSolidusCalculator
+except:
+	from OCPython_liquidus import LiquidusSolidusCalculator
+
+# equilibrium calculation of the current worker process
+_workerCalculation = None
+
+def createWorkerCalculation(tdbFilePath, elements, phaseNames=None, pressure=1E5, totalMolarAmount=1.0, conditions=None):
+	"""
+	create the equilibrium calculation of a worker process: read database, set phase status and conditions and calculate
+	a first equilibrium with the grid minimizer (if the conditions are complete)
+
+	Parameters
+	----------
+	param1
+		tdbFilePath
+	param2
+		elements
+	param3
+		phaseNames: entered phases (all others are suspended), all phases are entered if None
+	param4
+		pressure
+	param5
+		totalMolarAmount
+	param6
+		conditions: conditions of the parent calculation (calc.conditions[calc.eqName]), replayed after phaseNames,
+		pressure and totalMolarAmount, as option
+
+	Returns
+	-------
+	SingleEquilibriumCalculation
+		equilibrium calculation
+	"""
+	vs = types.SimpleNamespace(logger=logging.getLogger('ParallelEquilibriumEngine-%d' % os.getpid()))
+	calc = SingleEquilibriumCalculation(vs)
+	calc.readtdb(tdbFilePath, elements)
+
+	if phaseNames:
+		calc.setPhasesStatus(('* ',), PhaseStatus.Suspended)
+		calc.setPhasesStatus(phaseNames, PhaseStatus.Entered)
+
+	calc.setPressure(pressure)
+	calc.setTotalMolarAmount(totalMolarAmount)
+	if conditions:
+		calc.setConditions(conditions)
+		# the first batch starts from this solution instead of an uninitialized record
+		if conditions.get('T') is not None:
+			calc.calculateEquilibrium(GridMinimizerStatus.On)
+			if not calc.getErrorCode() == 0:
+				calc.logger.warning('first equilibrium of the worker failed (error %d)', calc.getErrorCode())
+				calc.resetErrorCode()
+	return calc
+
+def _initWorker(tdbFilePath, elements, phaseNames, pressure, totalMolarAmount, conditions):
+	"""
+	initiate worker process: read database, set phase status and conditions
+
+	Parameters
+	----------
+	param1
+		tdbFilePath
+	param2
+		elements
+	param3
+		phaseNames
+	param4
+		pressure
+	param5
+		totalMolarAmount
+	param6
+		conditions
+	"""
+	global _workerCalculation
+
+	_workerCalculation = createWorkerCalculation(tdbFilePath, elements, phaseNames, pressure, totalMolarAmount, conditions)
+
+def _batchEquilibriaCompChunk(args):
+	"""
+	batch equilibrium calculations with composition loop for one chunk (in worker process)
+	"""
+	elementMoleFractions, xfrac_matrix, temp, stavar = args
+	return _workerCalculation.batchEquilibriaComp(len(xfrac_matrix), elementMoleFractions, xfrac_matrix, temp, stavar)
+
+def _batchEquilibriaTempChunk(args):
+	"""
+	batch equilibrium calculations with temperature loop for one chunk (in worker process)
+	"""
+	elementMoleFractions, xfrac_matrix, temp_list, stavar = args
+	return _workerCalculation.batchEquilibriaTemp(elementMoleFractions, xfrac_matrix, temp_list, stavar)
+
+def _liquidusSolidusChunk(args):
+	"""
+	liquidus and solidus temperatures of one chunk of alloys (in worker process), with warm start inside the chunk
+	"""
+	elementMoleFractions, xfrac_matrix, liquidPhase, scanTemperatures = args
+	calculator = LiquidusSolidusCalculator(_workerCalculation, liquidPhase, scanTemperatures)
+	try:
+		return calculator.calculate(elementMoleFractions, xfrac_matrix)
+	finally:
+		calculator.release()
+
+class ParallelEquilibriumEngine(object):
+	"""
+	Parallel equilibrium engine
+
+	Starts a pool of worker processes (each with its own liboctq instance), splits a composition or
+	temperature grid into chunks and returns the results in the original order of the grid.
+	"""
+	_chunksPerProcess = 4
+
+	def __init__(self, tdbFilePath, elements, phaseNames=None, nProcesses=None, pressure=1E5, totalMolarAmount=1.0, chunkSize=None, conditions=None):
+		"""
+		initiate the parallel equilibrium engine and start the worker processes
+
+		Parameters
+		----------
+		param1
+			tdbFilePath
+		param2
+			elements
+		param3
+			phaseNames: entered phases (all others are suspended), all phases are entered if None
+		param4
+			nProcesses: number of worker processes, os.cpu_count() if None
+		param5
+			pressure
+		param6
+			totalMolarAmount
+		param7
+			chunkSize: number of grid points sent to a worker at once, automatic if None
+		param8
+			conditions: conditions and phase status set in every worker (see createWorkerCalculation), as option
+		"""
+		if nProcesses is None:
+			nProcesses = os.cpu_count() or 1
+		self.nProcesses = nProcesses
+		self.chunkSize = chunkSize
+
+		# spawn is used on every platform: a forked worker would inherit the liboctq state of the parent
+		context = multiprocessing.get_context('spawn')
+		self.pool = context.Pool(processes=nProcesses,
+			initializer=_initWorker,
+			initargs=(os.path.abspath(tdbFilePath), list(elements), phaseNames, pressure, totalMolarAmount, conditions))
+
+	@classmethod
+	def fromCalculation(cls, calc, nProcesses=None, chunkSize=None):
+		"""
+		start an engine whose workers have the database, the phase status and the conditions of the current equilibrium record of calc
+
+		Parameters
+		----------
+		param1
+			calc: SingleEquilibriumCalculation with database read (readtdb with elements) and conditions set
+		param2
+			nProcesses: number of worker processes, os.cpu_count() if None
+		param3
+			chunkSize: number of grid points sent to a worker at once, automatic if None
+
+		Returns
+		-------
+		ParallelEquilibriumEngine
+			engine
+		"""
+		conditions = calc.conditions.get(calc.eqName, {})
+		database = conditions.get('database')
+		if database is None or database[1] is None:
+			raise ValueError('the database of the calculation must be read with its elements (readtdb)')
+		return cls(database[0], database[1], nProcesses=nProcesses, pressure=conditions.get('P') or 1E5,
+			totalMolarAmount=conditions.get('N') or 1.0, chunkSize=chunkSize, conditions=dict(conditions))
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def close(self):
+		"""
+		stop the worker processes
+		"""
+		if self.pool is not None:
+			self.pool.close()
+			self.pool.join()
+			self.pool = None
+
+	def _splitGrid(self, nPoints):
+		"""
+		split the grid indices into chunks
+
+		Parameters
+		----------
+		param1
+			nPoints
+
+		Returns
+		-------
+		list
+			arrays of grid indices
+		"""
+		if self.chunkSize is None:
+			nChunks = self.nProcesses*ParallelEquilibriumEngine._chunksPerProcess
+		else:
+			nChunks = -(-nPoints//self.chunkSize)
+		nChunks = max(1, min(nChunks, nPoints))
+		return np.array_split(np.arange(nPoints), nChunks)
+
+	def batchEquilibriaComp(self, elementMoleFractions, xfrac_matrix, temp, stavar):
+		"""
+		Parallel batch equilibrium calculations with composition loops
+
+		Parameters
+		----------
+		param1
+			elementMoleFractions
+		param2
+			xfrac_matrix: one composition (ordered as elementMoleFractions) per grid point
+		param3
+			temp
+		param4
+			stavar
+
+		Returns
+		-------
+		numpy array
+			calculated properties (same order as xfrac_matrix)
+		"""
+		xfrac_matrix = np.asarray(xfrac_matrix, dtype=np.float64)
+		chunks = self._splitGrid(len(xfrac_matrix))
+		tasks = [(elementMoleFractions, xfrac_matrix[chunk], temp, stavar) for chunk in chunks]
+		values = self.pool.map(_batchEquilibriaCompChunk, tasks, chunksize=1)
+		return np.concatenate(values)
+
+	def batchEquilibriaTemp(self, elementMoleFractions, xfrac_matrix, temp_list, stavar):
+		"""
+		Parallel batch equilibrium calculations with temperature loops
+
+		Parameters
+		----------
+		param1
+			elementMoleFractions
+		param2
+			xfrac_matrix: composition (ordered as elementMoleFractions)
+		param3
+			temp_list
+		param4
+			stavar
+
+		Returns
+		-------
+		numpy array
+			calculated properties (same order as temp_list)
+		"""
+		temp_list = np.asarray(temp_list, dtype=np.float64)
+		chunks = self._splitGrid(len(temp_list))
+		tasks = [(elementMoleFractions, xfrac_matrix, temp_list[chunk], stavar) for chunk in chunks]
+		values = self.pool.map(_batchEquilibriaTempChunk, tasks, chunksize=1)
+		return np.concatenate(values)
+
+	def liquidusSolidus(self, elementMoleFractions, xfrac_matrix, liquidPhase='LIQUID', scanTemperatures=None):
+		"""
+		Parallel liquidus and solidus temperatures of alloys (see OCPython_liquidus.LiquidusSolidusCalculator)
+
+		The alloys are split into contiguous chunks, inside a chunk every alloy starts from the solution of the previous one.
+
+		Parameters
+		----------
+		param1
+			elementMoleFractions
+		param2
+			xfrac_matrix: one composition (ordered as elementMoleFractions) per alloy, negative for the dependent element
+		param3
+			liquidPhase
+		param4
+			scanTemperatures: temperatures of the scan bracketing the liquidus and the solidus, default if None
+
+		Returns
+		-------
+		dict
+			'liquidus', 'solidus', 'converged' and 'scanned' numpy arrays (same order as xfrac_matrix)
+		"""
+		xfrac_matrix = np.asarray(xfrac_matrix, dtype=np.float64)
+		xfrac_matrix = xfrac_matrix.reshape(len(xfrac_matrix),-1)
+		chunks = self._splitGrid(len(xfrac_matrix))
+		tasks = [(elementMoleFractions, xfrac_matrix[chunk], liquidPhase, scanTemperatures) for chunk in chunks]
+		values = self.pool.map(_liquidusSolidusChunk, tasks, chunksize=1)
+		return {key: np.concatenate([value[key] for value in values]) for key in ('liquidus', 'solidus', 'converged', 'scanned')}
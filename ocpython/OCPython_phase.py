@@ -0,0 +1,373 @@
+"""
+This is the phase part of OC-Python (under development)
+
+Notes:
+1) The constitution of one phase tuple is set directly (pytqsphc1) and the Gibbs energy of the phase and its derivatives
+   with respect to the constituent fractions are calculated (pytqcph1), no equilibrium is calculated. The constitution,
+   T and P of the equilibrium record are restored afterwards.
+2) PhaseEvaluator calculates G, dG/dy and d2G/dy2 of a phase tuple for arrays of constitutions, the outputs are
+   allocated once and the buffers of liboctq are reused for every constitution.
+3) The Darken matrix (chemical potential gradients) is calculated from the second derivatives of the Gibbs energy.
+   tqgdmat of the fortran API is not part of liboctq_f90wrap, DarkenMatrixCalculator does the same for phases with
+   one substitutional sublattice (the other sublattices, if any, only contain VA).
+4) Mobilities are calculated from the MQ parameters of the database (MQ(PHASE&EL,...)): RT*ln(RT*M) = sum of the
+   endmember values and of the binary Redlich-Kister terms of the substitutional sublattice.
+
+author: Chunhui Luo, 2022
+"""
+
+import numpy as np
+
+try:
+	from ocpython import liboctq_f90wrap as oc
+except:
+	import liboctq_f90wrap as oc
+try:
+	from ocpython.OCPython import SingleEquilibriumCalculation
+except:
+	from OCPython import SingleEquilibriumCalculation
+try:
+	from ocpython.OCPython_gibbs import GibbsEnergyCompiler
+except:
+	from OCPython_gibbs import GibbsEnergyCompiler
+
+class PhaseEvaluator(object):
+	"""
+	Gibbs energy of one phase tuple and its derivatives with respect to the constituent fractions for many constitutions
+	"""
+	_gasConstant = 8.31451
+
+	def __init__(self, calc, phaseName):
+		"""
+		initiate the evaluator for one phase tuple
+
+		Parameters
+		----------
+		param1
+			calc: SingleEquilibriumCalculation with database read
+		param2
+			phaseName: name of the phase tuple, e.g. 'FCC_A1' or 'FCC_A1#2'
+		"""
+		self.calc = calc
+		self.phaseName = phaseName.upper()
+		phaseTable = calc.getPhaseTable()
+		if not self.phaseName in phaseTable.names:
+			raise ValueError('unknown phase tuple: %s' % phaseName)
+		self.phaseTuple = phaseTable.names.index(self.phaseName)+1
+		iph = phaseTable.phaseIndices[self.phaseTuple-1]
+
+		# constitution of the phase tuple
+		self._nConstituentsInSublattices = np.empty(SingleEquilibriumCalculation._maxNSublattice, dtype=np.int32)
+		self._speciesIndices = np.empty(SingleEquilibriumCalculation._maxNSublattice*SingleEquilibriumCalculation._maxNConstituent, dtype=np.int32)
+		self._siteFractions = np.empty(SingleEquilibriumCalculation._maxNSublattice*SingleEquilibriumCalculation._maxNConstituent)
+		self._sites = np.empty(SingleEquilibriumCalculation._maxNSublattice)
+		self._extra = np.empty(5)
+		self.nSublattices = oc.f90wrap_pytqgphc1(self.phaseTuple, self._nConstituentsInSublattices, self._speciesIndices, self._siteFractions, self._sites, self._extra, calc.eq)
+		self.nConstituentsInSublattices = self._nConstituentsInSublattices[0:self.nSublattices].tolist()
+		self.sites = self._sites[0:self.nSublattices].copy()
+		self.nConstituents = sum(self.nConstituentsInSublattices)
+		self.constituents = [oc.f90wrap_pytqgpcn2(iph, k+1).decode().strip().upper() for k in range(self.nConstituents)]
+
+		# constitution of the equilibrium record, restored after evaluate
+		self._savedSiteFractions = np.empty_like(self._siteFractions)
+		self._savedExtra = np.empty(5)
+
+		# buffers of pytqcph1
+		self._gtp = np.empty(6)
+		self._dgdy = np.empty(self.nConstituents)
+		self._d2gdydt = np.empty(self.nConstituents)
+		self._d2gdydp = np.empty(self.nConstituents)
+		self._d2gdy2 = np.empty(self.nConstituents*(self.nConstituents+1)//2)
+		# d2gdy2 is packed by columns of the upper triangle as in OC (ixsym): (1,1),(1,2),(2,2),(1,3),(2,3),(3,3)...
+		self._lower = np.tril_indices(self.nConstituents)
+		self._upper = (self._lower[1], self._lower[0])
+
+	def allocate(self, nPoints, order=2):
+		"""
+		allocate the outputs of evaluate
+
+		Parameters
+		----------
+		param1
+			nPoints
+		param2
+			order: 0 (G), 1 (also dG/dy) or 2 (also d2G/dy2)
+
+		Returns
+		-------
+		dict
+			numpy arrays, see evaluate
+		"""
+		results = {'G': np.empty(nPoints), 'atoms': np.empty(nPoints)}
+		if order >= 1:
+			results['dGdy'] = np.empty((nPoints, self.nConstituents))
+		if order >= 2:
+			results['d2Gdy2'] = np.empty((nPoints, self.nConstituents, self.nConstituents))
+		return results
+
+	def evaluate(self, siteFractions, temperature, pressure=None, order=2, out=None):
+		"""
+		calculate G and its derivatives with respect to the constituent fractions, T and P are set as conditions of the current equilibrium record,
+		the constitution of the phase tuple, T and P of the record are restored afterwards
+
+		Parameters
+		----------
+		param1
+			siteFractions: constituent fractions (point, constituent), ordered as self.constituents, normalized per sublattice by liboctq
+		param2
+			temperature
+		param3
+			pressure: the current condition is kept if None
+		param4
+			order: 0 (G), 1 (also dG/dy) or 2 (also d2G/dy2)
+		param5
+			out: outputs from allocate (at least as many points), reused, as option
+
+		Returns
+		-------
+		dict
+			'G' (point), 'dGdy' (point, constituent) and 'd2Gdy2' (point, constituent, constituent), J/mol formula unit,
+			'atoms' (point): moles of atoms per formula unit
+		"""
+		siteFractions = np.asarray(siteFractions, dtype=np.float64).reshape(-1, self.nConstituents)
+		nPoints = len(siteFractions)
+		results = self.allocate(nPoints, order) if out is None else {key: value[0:nPoints] for key, value in out.items()}
+		G = results['G']
+		atoms = results['atoms']
+		dGdy = results.get('dGdy')
+		d2Gdy2 = results.get('d2Gdy2')
+
+		conditions = self.calc.conditions.get(self.calc.eqName, {})
+		previousTemperature = conditions.get('T')
+		previousPressure = conditions.get('P')
+		oc.f90wrap_pytqgphc1(self.phaseTuple, self._nConstituentsInSublattices, self._speciesIndices, self._savedSiteFractions, self._sites, self._savedExtra, self.calc.eq)
+
+		self.calc.setTemperature(temperature)
+		if pressure is not None:
+			self.calc.setPressure(pressure)
+		try:
+			for i in range(nPoints):
+				self._siteFractions[0:self.nConstituents] = siteFractions[i]
+				oc.f90wrap_pytqsphc1(self.phaseTuple, self._siteFractions, self._extra, self.calc.eq)
+				oc.f90wrap_pytqcph1(self.phaseTuple, order, self.nConstituents, self._gtp, self._dgdy, self._d2gdydt, self._d2gdydp, self._d2gdy2, self.calc.eq)
+				error = self.calc.getErrorCode()
+				if not error == 0:
+					self.calc.resetErrorCode()
+					raise ValueError('calculation of phase %s failed at point %d (error %d)' % (self.phaseName, i, error))
+				G[i] = self._gtp[0]
+				atoms[i] = self._extra[0]
+				if order >= 1:
+					dGdy[i] = self._dgdy
+				if order >= 2:
+					d2Gdy2[i][self._upper] = self._d2gdy2
+					d2Gdy2[i][self._lower] = self._d2gdy2
+		finally:
+			self._restore(previousTemperature, previousPressure, pressure is not None)
+
+		# liboctq returns the values divided by RT
+		RT = self._gasConstant*temperature
+		G *= RT
+		if order >= 1:
+			dGdy *= RT
+		if order >= 2:
+			d2Gdy2 *= RT
+		return results
+
+	def _restore(self, temperature, pressure, isPressureSet):
+		"""
+		restore the constitution of the phase tuple and the conditions of the equilibrium record changed by evaluate
+		"""
+		if not temperature == self.calc.conditions.get(self.calc.eqName, {}).get('T'):
+			self.calc.setTemperature(temperature)
+		if isPressureSet and pressure is not None:
+			self.calc.setPressure(pressure)
+		oc.f90wrap_pytqsphc1(self.phaseTuple, self._savedSiteFractions, self._savedExtra, self.calc.eq)
+		# the Gibbs energy stored with the constitution is calculated again for a following equilibrium calculation
+		if temperature is not None:
+			oc.f90wrap_pytqcph1(self.phaseTuple, 2, self.nConstituents, self._gtp, self._dgdy, self._d2gdydt, self._d2gdydp, self._d2gdy2, self.calc.eq)
+		if not self.calc.getErrorCode() == 0:
+			self.calc.resetErrorCode()
+
+class DarkenMatrixCalculator(object):
+	"""
+	Darken matrices, chemical potentials and mobilities of one phase tuple for many compositions, without equilibrium calculation
+	"""
+	_gasConstant = 8.31451
+	_minFraction = 1E-12
+
+	def __init__(self, calc, phaseName, mobilityDatabase=None):
+		"""
+		initiate the calculator for one phase tuple
+
+		Parameters
+		----------
+		param1
+			calc: SingleEquilibriumCalculation with database read
+		param2
+			phaseName: name of the phase tuple, e.g. 'FCC_A1' or 'FCC_A1#2'
+		param3
+			mobilityDatabase: tdb file path, TDBDatabase or GibbsEnergyCompiler with the MQ parameters, the database of calc if None
+		"""
+		self.evaluator = PhaseEvaluator(calc, phaseName)
+		self.phaseName = self.evaluator.phaseName
+
+		# one substitutional sublattice, the other ones only contain VA
+		self.sublattice = None
+		offset = 0
+		for j, nConstituents in enumerate(self.evaluator.nConstituentsInSublattices):
+			names = self.evaluator.constituents[offset:offset+nConstituents]
+			if not names == ['VA']:
+				if self.sublattice is not None or 'VA' in names:
+					raise ValueError('phase %s has more than one substitutional sublattice or vacancies on it' % self.phaseName)
+				self.sublattice = j
+				self.substitutional = slice(offset, offset+nConstituents)
+			offset += nConstituents
+		if self.sublattice is None:
+			raise ValueError('phase %s has no substitutional sublattice' % self.phaseName)
+		self.sites = self.evaluator.sites[self.sublattice]
+		self.elements = self.evaluator.constituents[self.substitutional]
+		self.nElements = len(self.elements)
+
+		if mobilityDatabase is None:
+			mobilityDatabase = calc.conditions[calc.eqName]['database'][0]
+		if not isinstance(mobilityDatabase, GibbsEnergyCompiler):
+			mobilityDatabase = GibbsEnergyCompiler(mobilityDatabase)
+		self.mobilityCompiler = mobilityDatabase
+		self.mobilityParameters = [self._getMobilityParameters(element) for element in self.elements]
+
+	def _getMobilityParameters(self, element):
+		"""
+		get the MQ parameters of an element in the phase on the substitutional sublattice
+
+		Parameters
+		----------
+		param1
+			element
+
+		Returns
+		-------
+		list
+			(compiled parameter, constituent indices, order) of the endmembers (one index) and binary interactions (two indices)
+		"""
+		phaseName = self.phaseName.partition('#')[0]
+		parameters = []
+		for parameter in self.mobilityCompiler.database.getParameters(phaseName, 'MQ'):
+			if not parameter.phaseName == '%s&%s' % (phaseName, element) or not len(parameter.constituents) > self.sublattice:
+				continue
+			substitutional = parameter.constituents[self.sublattice]
+			if not all(c in self.elements for c in substitutional) or not len(substitutional) in (1, 2):
+				continue
+			if len(substitutional) == 1 and not parameter.order == 0:
+				continue
+			parameters.append((self.mobilityCompiler.compileParameter(parameter), [self.elements.index(c) for c in substitutional], parameter.order))
+		return parameters
+
+	def calculateDarkenMatrices(self, compositions, temperature, pressure=None, out=None):
+		"""
+		calculate the chemical potentials and the Darken matrices of the phase
+
+		The Darken matrix is dMU(i)/dN(j) for one mole of atoms of the phase: sum(x(i)*dMU(i)/dN(j)) = 0 (Gibbs-Duhem).
+
+		Parameters
+		----------
+		param1
+			compositions: molar fractions of the elements of the substitutional sublattice (point, element), ordered as self.elements
+		param2
+			temperature
+		param3
+			pressure: the current condition is kept if None
+		param4
+			out: (mu, mugrad) preallocated arrays of shapes (point, element) and (point, element, element), as option
+
+		Returns
+		-------
+		numpy array
+			chemical potentials (point, element), J/mol
+		numpy array
+			Darken matrices dMU(i)/dN(j) (point, element, element), J/mol
+		"""
+		compositions = np.asarray(compositions, dtype=np.float64).reshape(-1, self.nElements)
+		nPoints = len(compositions)
+		if out is None:
+			mu = np.empty((nPoints, self.nElements))
+			mugrad = np.empty((nPoints, self.nElements, self.nElements))
+		else:
+			mu, mugrad = out
+
+		y = np.maximum(compositions, self._minFraction)
+		y = y/y.sum(axis=1, keepdims=True)
+		siteFractions = np.ones((nPoints, self.evaluator.nConstituents))
+		siteFractions[:,self.substitutional] = y
+		results = self.evaluator.evaluate(siteFractions, temperature, pressure, 2)
+
+		# per mole of atoms: MU(i) = G+dG/dy(i)-sum(y(k)*dG/dy(k)) and dMU(i)/dy(j) = d2G/dy(i)dy(j)-sum(y(k)*d2G/dy(k)dy(j)),
+		# dMU(i)/dN(j) = dMU(i)/dy(j)-sum(y(k)*dMU(i)/dy(k)) as dy(k)/dN(j) = delta(k,j)-y(k)
+		G = results['G']/self.sites
+		dGdy = results['dGdy'][:,self.substitutional]/self.sites
+		d2Gdy2 = results['d2Gdy2'][:,self.substitutional,self.substitutional]/self.sites
+		mu[...] = G[:,np.newaxis]+dGdy-np.einsum('pk,pk->p', y, dGdy)[:,np.newaxis]
+		dmudy = d2Gdy2-np.einsum('pk,pkj->pj', y, d2Gdy2)[:,np.newaxis,:]
+		mugrad[...] = dmudy-np.einsum('pik,pk->pi', dmudy, y)[:,:,np.newaxis]
+		return mu, mugrad
+
+	def calculateMobilities(self, compositions, temperature, pressure=1E5):
+		"""
+		calculate the mobilities of the elements of the substitutional sublattice from the MQ parameters
+
+		Parameters
+		----------
+		param1
+			compositions: molar fractions (point, element), ordered as self.elements
+		param2
+			temperature
+		param3
+			pressure
+
+		Returns
+		-------
+		numpy array
+			mobilities (point, element), m2/(J s), NaN for elements without MQ parameters
+		"""
+		y = np.asarray(compositions, dtype=np.float64).reshape(-1, self.nElements)
+		y = y/y.sum(axis=1, keepdims=True)
+		RT = self._gasConstant*temperature
+		mobilities = np.full(y.shape, np.nan)
+		expressions = [[compiled for compiled, _, _ in parameters] for parameters in self.mobilityParameters]
+		values = self.mobilityCompiler.evaluate(sum(expressions, []), temperature, pressure)
+		count = 0
+		for k, parameters in enumerate(self.mobilityParameters):
+			if not parameters:
+				continue
+			MQ = np.zeros(len(y))
+			for _, indices, order in parameters:
+				value = values[count]['G'][0]
+				count += 1
+				if len(indices) == 1:
+					MQ += y[:,indices[0]]*value
+				else:
+					a, b = indices
+					MQ += y[:,a]*y[:,b]*(y[:,a]-y[:,b])**order*value
+			mobilities[:,k] = np.exp(MQ/RT)/RT
+		return mobilities
+
+	def calculate(self, compositions, temperature, pressure=None):
+		"""
+		calculate chemical potentials, Darken matrices and mobilities of the phase (as tqgdmat)
+
+		Parameters
+		----------
+		param1
+			compositions: molar fractions (point, element), ordered as self.elements
+		param2
+			temperature
+		param3
+			pressure: the current condition is kept (and 1E5 Pa used for the mobilities) if None
+
+		Returns
+		-------
+		dict
+			'elements' (names), 'MU' (point, element), 'mugrad' (point, element, element) and 'mobility' (point, element) numpy arrays
+		"""
+		mu, mugrad = self.calculateDarkenMatrices(compositions, temperature, pressure)
+		mobilities = self.calculateMobilities(compositions, temperature, 1E5 if pressure is None else pressure)
+		return {'elements': list(self.elements), 'MU': mu, 'mugrad': mugrad, 'mobility': mobilities}
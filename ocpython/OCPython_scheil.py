@@ -0,0 +1,235 @@
+"""
+This is the Scheil-Gulliver part of OC-Python (under development)
+
+Notes:
+1) Scheil-Gulliver solidification: the solid formed at every temperature step is frozen (no diffusion in the solid),
+   the next step is calculated with the composition of the remaining liquid (complete mixing in the liquid).
+2) The simulation starts at the liquidus (calculated with the liquid fixed at amount 1 as in
+   OC_ex8_singleEq_liquidus_solidus_temperature.py) and all steps use the current equilibrium record: only T and the
+   composition are changed and every step starts from the previous solution (grid minimizer off). The grid minimizer is
+   used when the calculation fails or when an entered phase which is not stable gets a positive driving force.
+3) The temperature step is adaptive: it is halved when too much solid forms in one step and grows while little solid forms.
+4) The latent heat of a step is the enthalpy difference (HM) between the liquid and the solids formed in the step.
+
+author: Chunhui Luo, 2022
+"""
+
+import numpy as np
+
+try:
+	from ocpython.OCPython import GridMinimizerStatus
+except:
+	from OCPython import GridMinimizerStatus
+try:
+	from ocpython.OCPython import PhaseStatus
+except:
+	from OCPython import PhaseStatus
+
+class ScheilSimulation(object):
+	"""
+	Scheil-Gulliver solidification simulation
+	"""
+	_fractionTolerance = 1E-10
+	_drivingForceTolerance = 1E-6
+
+	def __init__(self, calc, liquidPhase='LIQUID', initialTemperatureStep=2.0, minTemperatureStep=0.01, maxTemperatureStep=25.0,
+		maxSolidFractionStep=0.02, growthFactor=1.5, stopLiquidFraction=0.01, maxSteps=5000):
+		"""
+		initiate the simulation
+
+		Parameters
+		----------
+		param1
+			calc: SingleEquilibriumCalculation with database read, phase status, pressure and total molar amount set
+		param2
+			liquidPhase: name of the liquid phase
+		param3
+			initialTemperatureStep
+		param4
+			minTemperatureStep
+		param5
+			maxTemperatureStep
+		param6
+			maxSolidFractionStep: largest fraction of solid (of the alloy) formed in one step, unless the step is minTemperatureStep
+		param7
+			growthFactor: growth of the temperature step while less than a quarter of maxSolidFractionStep forms in a step
+		param8
+			stopLiquidFraction: the simulation stops when the fraction of liquid is below
+		param9
+			maxSteps
+		"""
+		self.calc = calc
+		self.liquidPhase = liquidPhase.upper()
+		self.initialTemperatureStep = initialTemperatureStep
+		self.minTemperatureStep = minTemperatureStep
+		self.maxTemperatureStep = maxTemperatureStep
+		self.maxSolidFractionStep = maxSolidFractionStep
+		self.growthFactor = growthFactor
+		self.stopLiquidFraction = stopLiquidFraction
+		self.maxSteps = maxSteps
+		self.nEquilibria = 0
+		self.nGridMinimizer = 0
+
+	def _calculate(self, useGridMinimizer=False):
+		"""
+		calculate equilibrium, starting from the previous solution unless useGridMinimizer
+
+		Returns
+		-------
+		int
+			error code
+		"""
+		if not useGridMinimizer:
+			self.nEquilibria += 1
+			self.calc.calculateEquilibrium(GridMinimizerStatus.Off)
+			error = self.calc.getErrorCode()
+			if not error == 0:
+				self.calc.resetErrorCode()
+				useGridMinimizer = True
+			else:
+				useGridMinimizer = self.calc.isPhaseSetChanged(self._drivingForceTolerance)
+		error = 0
+		if useGridMinimizer:
+			self.nEquilibria += 1
+			self.nGridMinimizer += 1
+			self.calc.calculateEquilibrium(GridMinimizerStatus.On)
+			error = self.calc.getErrorCode()
+			if not error == 0:
+				self.calc.resetErrorCode()
+		return error
+
+	def _isLiquid(self, phaseName):
+		return phaseName.partition('#')[0] == self.liquidPhase
+
+	def calculateLiquidus(self):
+		"""
+		calculate the liquidus temperature of the current composition (liquid fixed at amount 1), the temperature is set to it
+
+		Returns
+		-------
+		float
+			liquidus temperature, NaN if the calculation failed
+		"""
+		self.calc.setTemperature(None)
+		self.calc.setPhasesStatus([self.liquidPhase], PhaseStatus.Fixed, 1.0)
+		self.nEquilibria += 1
+		self.nGridMinimizer += 1
+		self.calc.calculateEquilibrium(GridMinimizerStatus.On)
+		error = self.calc.getErrorCode()
+		temperature = np.nan
+		if error == 0:
+			temperature = self.calc.getScalarResult('T')
+		else:
+			self.calc.resetErrorCode()
+		self.calc.setPhasesStatus([self.liquidPhase], PhaseStatus.Entered)
+		if not np.isnan(temperature):
+			self.calc.setTemperature(temperature)
+		return temperature
+
+	def _setLiquidComposition(self, composition, dependentIndex):
+		"""
+		set the composition of the liquid as composition of the next step
+		"""
+		for index, component in enumerate(self.calc.getComponentNames()):
+			if not index == dependentIndex:
+				self.calc.setSingleElementMolarFraction(index, composition.get(component, 0.0))
+
+	def simulate(self, elementMoleFractions, startTemperature=None):
+		"""
+		Scheil-Gulliver simulation from the liquidus
+
+		Parameters
+		----------
+		param1
+			elementMoleFractions: composition of the alloy, the last element is the dependent one (as setElementMolarFraction)
+		param2
+			startTemperature: first temperature, the liquidus is calculated if None (and used if the calculation fails)
+
+		Returns
+		-------
+		dict
+			per step (numpy arrays): 'T', 'fractionSolid', 'latentHeat' (cumulated, J/mol of alloy), 'phaseAmounts' (step, solid phase)
+			(cumulated fractions of the solid phases, columns labelled by 'phaseNames') and 'liquidComposition' (step, component),
+			columns labelled by 'componentNames'; 'completed' is True if the liquid fraction reached stopLiquidFraction
+		"""
+		components = list(self.calc.getComponentNames())
+		dependentIndex = components.index(list(elementMoleFractions)[-1])
+		self.calc.setElementMolarFraction(elementMoleFractions)
+		self.nEquilibria = 0
+		self.nGridMinimizer = 0
+
+		temperature = self.calculateLiquidus() if startTemperature is None else np.nan
+		if np.isnan(temperature):
+			if startTemperature is None:
+				raise ValueError('liquidus temperature not found, a start temperature is needed')
+			temperature = float(startTemperature)
+			self.calc.setTemperature(temperature)
+		if not self._calculate(True) == 0:
+			raise ValueError('equilibrium calculation failed at the start temperature %.2f K' % temperature)
+
+		phaseNames = []
+		records = []
+		liquidFraction = 1.0
+		latentHeat = 0.0
+		solidAmounts = {}
+		liquidComposition = dict(zip(components, self.calc.getComponentValues('X')))
+		records.append((temperature, 0.0, latentHeat, dict(solidAmounts), liquidComposition))
+
+		temperatureStep = self.initialTemperatureStep
+		completed = False
+		while len(records) <= self.maxSteps:
+			nextTemperature = temperature-temperatureStep
+			self.calc.setTemperature(nextTemperature)
+			if not self._calculate() == 0:
+				if temperatureStep <= self.minTemperatureStep:
+					break
+				temperatureStep = max(0.5*temperatureStep, self.minTemperatureStep)
+				continue
+
+			names = self.calc.getPhaseTable().names
+			amounts = self.calc.getPhaseValues('NP')
+			fractions = amounts/amounts.sum()
+			liquidStep = sum(fraction for name, fraction in zip(names, fractions) if self._isLiquid(name))
+			solidStep = liquidFraction*(1.0-liquidStep)
+			if solidStep > self.maxSolidFractionStep and temperatureStep > self.minTemperatureStep:
+				temperatureStep = max(0.5*temperatureStep, self.minTemperatureStep)
+				continue
+
+			# freeze the solids formed in the step
+			enthalpies = self.calc.getPhaseValues('HM')
+			liquids = [i for i, name in enumerate(names) if self._isLiquid(name) and fractions[i] > self._fractionTolerance]
+			liquidEnthalpy = sum(fractions[i]*enthalpies[i] for i in liquids)/liquidStep if liquids else 0.0
+			for i, name in enumerate(names):
+				if not self._isLiquid(name) and fractions[i] > self._fractionTolerance:
+					if not name in solidAmounts:
+						phaseNames.append(name)
+						solidAmounts[name] = 0.0
+					solidAmounts[name] += liquidFraction*fractions[i]
+					if liquids:
+						latentHeat += liquidFraction*fractions[i]*(liquidEnthalpy-enthalpies[i])
+			liquidFraction *= liquidStep
+			temperature = nextTemperature
+
+			if liquids:
+				compositions = self.calc.getPhaseElementComposition()
+				liquidName = max(liquids, key=lambda i: fractions[i])
+				liquidComposition = compositions[names[liquidName]]
+			records.append((temperature, 1.0-liquidFraction, latentHeat, dict(solidAmounts), liquidComposition))
+			if liquidFraction <= self.stopLiquidFraction or not liquids:
+				completed = True
+				break
+			self._setLiquidComposition(liquidComposition, dependentIndex)
+
+			if solidStep < 0.25*self.maxSolidFractionStep:
+				temperatureStep = min(self.growthFactor*temperatureStep, self.maxTemperatureStep)
+
+		return {
+			'T': np.array([record[0] for record in records]),
+			'fractionSolid': np.array([record[1] for record in records]),
+			'latentHeat': np.array([record[2] for record in records]),
+			'phaseAmounts': np.array([[record[3].get(name, 0.0) for name in phaseNames] for record in records]).reshape(len(records), len(phaseNames)),
+			'phaseNames': phaseNames,
+			'liquidComposition': np.array([[record[4].get(component, 0.0) for component in components] for record in records]),
+			'componentNames': components,
+			'completed': completed,
+			}
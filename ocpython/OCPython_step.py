@@ -0,0 +1,357 @@
+"""
+This is the step calculation part of OC-Python (under development)
+
+Notes:
+1) Every step starts from the solution of the previous step (grid minimizer off).
+2) The grid minimizer is only used for the first step, when the calculation fails or when an entered phase
+   which is not stable gets a positive driving force (i.e. the set of stable phases may have changed).
+3) In adaptive mode large steps are taken while the set of stable phases is constant and phase boundaries are bisected.
+   A phase field narrower than the step is only found if the interval is bisected because an entered phase is nearly
+   stable (driving force close to zero) at one of its ends, see drivingForceWindow of calculateAdaptive.
+4) With a store (OCPython_cache.EquilibriumStore) steps calculated in earlier runs are taken from the store.
+
+author: Chunhui Luo, 2022
+"""
+
+import numpy as np
+
+try:
+	from ocpython.OCPython import GridMinimizerStatus
+except:
+	from OCPython import GridMinimizerStatus
+
+class StepCalculator(object):
+	"""
+	Step calculation with one axis (T, P, N, X(el) or W(el)) and warm start from the previous step
+	"""
+
+	def __init__(self, calc, axis, scalarProperties=('G',), phaseProperties=('NP',), drivingForceTolerance=1E-6, gridMinimizerInterval=0, store=None):
+		"""
+		initiate step calculation
+
+		Parameters
+		----------
+		param1
+			calc: SingleEquilibriumCalculation with database read and conditions set
+		param2
+			axis: stepped condition, 'T', 'P', 'N', 'X(el)' or 'W(el)'
+		param3
+			scalarProperties: state variables of the system, e.g. ('G','H')
+		param4
+			phaseProperties: state variables of the phases, e.g. ('NP',)
+		param5
+			drivingForceTolerance: the grid minimizer is used when an entered phase which is not stable has a larger driving force
+		param6
+			gridMinimizerInterval: the grid minimizer is used every gridMinimizerInterval steps as well (0: never)
+		param7
+			store: persistent result store consulted before calculating a step (None: not used)
+		"""
+		self.calc = calc
+		self.axis = axis
+		self.setAxis = self._axisSetter(axis)
+		self.scalarProperties = list(scalarProperties)
+		self.phaseProperties = list(phaseProperties)
+		self.drivingForceTolerance = drivingForceTolerance
+		self.gridMinimizerInterval = gridMinimizerInterval
+		self.store = store
+		self.nGridMinimizer = 0
+		self.nStored = 0
+		self._isStateValid = False
+
+	def _axisSetter(self, axis):
+		"""
+		get function setting the condition of the axis
+
+		Parameters
+		----------
+		param1
+			axis
+
+		Returns
+		-------
+		function
+			function with the value of the axis as argument
+		"""
+		return self.calc.getConditionSetter(axis)
+
+	def getDrivingForces(self):
+		"""
+		get the driving forces (DGM) of the entered phase tuples which are not stable in the current equilibrium,
+		dormant, suspended and fixed phases are not included
+
+		Returns
+		-------
+		dict
+			{phase name: driving force}
+		"""
+		return self.calc.getDrivingForces()
+
+	def isPhaseSetChanged(self):
+		"""
+		check if the set of stable phases may have changed, i.e. if an entered phase which is not stable has a positive driving force
+
+		Returns
+		-------
+		bool
+			True if the grid minimizer should be used
+		"""
+		return self.calc.isPhaseSetChanged(self.drivingForceTolerance)
+
+	def calculateStep(self, value, useGridMinimizer=False):
+		"""
+		calculate equilibrium for one value of the axis
+
+		Parameters
+		----------
+		param1
+			value
+		param2
+			useGridMinimizer: force the use of the grid minimizer
+
+		Returns
+		-------
+		bool
+			True if the grid minimizer was used
+		int
+			error code
+		"""
+		self.setAxis(value)
+		if not useGridMinimizer:
+			self.calc.calculateEquilibrium(GridMinimizerStatus.Off)
+			error = self.calc.getErrorCode()
+			if not error == 0:
+				self.calc.resetErrorCode()
+				useGridMinimizer = True
+			elif self.isPhaseSetChanged():
+				useGridMinimizer = True
+
+		error = 0
+		if useGridMinimizer:
+			self.nGridMinimizer += 1
+			self.calc.calculateEquilibrium(GridMinimizerStatus.On)
+			error = self.calc.getErrorCode()
+			if not error == 0:
+				self.calc.resetErrorCode()
+		return useGridMinimizer, error
+
+	def _record(self, value, gridMinimizer, error):
+		"""
+		get results of the current equilibrium
+
+		Parameters
+		----------
+		param1
+			value: value of the axis
+		param2
+			gridMinimizer
+		param3
+			error
+
+		Returns
+		-------
+		tuple
+			value, grid minimizer used, error code, scalar values, phase values {'NP(FCC_A1)': value}, stable phases and
+			driving forces of the entered phases which are not stable
+		"""
+		scalars = [self.calc.getScalarResult(symbol) for symbol in self.scalarProperties]
+		phases = {}
+		if self.phaseProperties:
+			phaseNames = self.calc.getPhaseTable().names
+			for symbol in self.phaseProperties:
+				phaseValues = self.calc.getPhaseValues(symbol)
+				for phaseName, phaseValue in zip(phaseNames, phaseValues):
+					phases['%s(%s)' % (symbol, phaseName)] = phaseValue
+		return value, gridMinimizer, error, scalars, phases, self.getStablePhases(), self.getDrivingForces()
+
+	def _calculateRecord(self, value, useGridMinimizer=False):
+		"""
+		calculate one step (or take it from the store) and get its results
+
+		Parameters
+		----------
+		param1
+			value: value of the axis
+		param2
+			useGridMinimizer: force the use of the grid minimizer
+
+		Returns
+		-------
+		tuple
+			results of the step, see _record
+		"""
+		if self.store is not None:
+			self.setAxis(value)
+			key = self.store.makeKey(self.calc.conditions.get(self.calc.eqName, {}), 'step', tuple(self.scalarProperties), tuple(self.phaseProperties))
+			record = self.store.get(key)
+			if record is not None:
+				self.nStored += 1
+				# the current equilibrium is not the solution of this step any more
+				self._isStateValid = False
+				return record
+
+		# the first calculated step does not start from a previous solution if the steps before came from the store
+		gridMinimizer, error = self.calculateStep(value, useGridMinimizer or not self._isStateValid)
+		self._isStateValid = True
+		record = self._record(value, gridMinimizer, error)
+		if self.store is not None and error == 0:
+			self.store.put(key, record)
+		return record
+
+	def _columns(self, records):
+		"""
+		convert the records of the steps to columnar results
+
+		Parameters
+		----------
+		param1
+			records
+
+		Returns
+		-------
+		dict
+			columnar results (numpy arrays)
+		"""
+		nSteps = len(records)
+		results = {self.axis: np.array([record[0] for record in records], dtype=np.float64)}
+		for j, symbol in enumerate(self.scalarProperties):
+			results[symbol] = np.array([record[3][j] for record in records], dtype=np.float64)
+		for i, record in enumerate(records):
+			for column, phaseValue in record[4].items():
+				if not column in results:
+					results[column] = np.full(nSteps, np.nan)
+				results[column][i] = phaseValue
+		results['gridMinimizer'] = np.array([record[1] for record in records], dtype=bool)
+		results['error'] = np.array([record[2] for record in records], dtype=np.int32)
+		return results
+
+	def calculate(self, values, startWithGridMinimizer=True):
+		"""
+		step calculation
+
+		Parameters
+		----------
+		param1
+			values: values of the axis
+		param2
+			startWithGridMinimizer: use the grid minimizer for the first step
+
+		Returns
+		-------
+		dict
+			columnar results (numpy arrays): the axis, the scalar properties, the phase properties as 'NP(FCC_A1)',
+			'gridMinimizer' (True if used) and 'error' (error code). Phase values are NaN for steps where the phase tuple did not exist.
+		"""
+		self.nGridMinimizer = 0
+		self.nStored = 0
+		self._isStateValid = not startWithGridMinimizer
+
+		records = []
+		for i, value in enumerate(np.asarray(values, dtype=np.float64)):
+			useGridMinimizer = self.gridMinimizerInterval > 0 and i % self.gridMinimizerInterval == 0
+			records.append(self._calculateRecord(value, useGridMinimizer))
+
+		return self._columns(records)
+
+	def getStablePhases(self):
+		"""
+		get the set of stable phases (phase tuples with positive amount) of the current equilibrium
+
+		Returns
+		-------
+		frozenset
+			names of stable phases
+		"""
+		amounts = self.calc.getPhaseValues('NP')
+		phaseNames = self.calc.getPhaseTable().names
+		return frozenset(phaseName for phaseName, amount in zip(phaseNames, amounts) if amount > 0.0)
+
+	def calculateAdaptive(self, start, stop, maxStep, tolerance, startWithGridMinimizer=True, drivingForceWindow=0.0):
+		"""
+		adaptive step calculation
+
+		Steps of size maxStep are taken as long as the set of stable phases is constant.
+		When it changes, the interval is bisected until the phase boundary is located within tolerance.
+		A phase field narrower than maxStep lies between two steps with the same stable phases and is missed, unless
+		maxStep is smaller than the narrowest phase field or drivingForceWindow is set: when an entered phase which is not stable
+		has a driving force (DGM) above -drivingForceWindow at one end, the interval is bisected toward the end with the larger
+		driving force, until tolerance or until the driving force in the middle is below the driving forces at both ends.
+
+		Parameters
+		----------
+		param1
+			start: first value of the axis
+		param2
+			stop: last value of the axis
+		param3
+			maxStep: step size where the set of stable phases is constant
+		param4
+			tolerance: accuracy of the phase boundaries
+		param5
+			startWithGridMinimizer: use the grid minimizer for the first step
+		param6
+			drivingForceWindow: driving force (DGM, dimensionless) below zero from which a phase is nearly stable (0: not used)
+
+		Returns
+		-------
+		dict
+			columnar results (numpy arrays) as in calculate(), sorted along the axis
+		list
+			phase boundaries: (value, appearing phases, disappearing phases), value is the middle of the final interval
+		"""
+		self.nGridMinimizer = 0
+		self.nStored = 0
+		self._isStateValid = not startWithGridMinimizer
+		direction = 1.0 if stop >= start else -1.0
+		maxStep = abs(maxStep)
+		tolerance = abs(tolerance)
+
+		records = []
+		boundaries = []
+
+		def calculatePoint(value):
+			record = self._calculateRecord(value)
+			records.append(record)
+			return record
+
+		def getMaxDrivingForce(record):
+			drivingForces = list(record[6].values())
+			return max(drivingForces) if drivingForces else -np.inf
+
+		def bisect(a, recordA, b, recordB):
+			phasesA, phasesB = recordA[5], recordB[5]
+			if phasesA == phasesB:
+				# a phase field narrower than the interval can only be next to an end where a phase is nearly stable
+				drivingForceA, drivingForceB = getMaxDrivingForce(recordA), getMaxDrivingForce(recordB)
+				if drivingForceWindow <= 0.0 or max(drivingForceA, drivingForceB) <= -drivingForceWindow or abs(b-a) <= tolerance:
+					return
+				middle = 0.5*(a+b)
+				recordMiddle = calculatePoint(middle)
+				if not recordMiddle[5] == phasesA:
+					bisect(a, recordA, middle, recordMiddle)
+					bisect(middle, recordMiddle, b, recordB)
+				elif getMaxDrivingForce(recordMiddle) < min(drivingForceA, drivingForceB):
+					# the driving force decreases from both ends to the middle: no phase field in between
+					return
+				elif drivingForceA >= drivingForceB:
+					bisect(a, recordA, middle, recordMiddle)
+				else:
+					bisect(middle, recordMiddle, b, recordB)
+				return
+			if abs(b-a) <= tolerance:
+				boundaries.append((0.5*(a+b), sorted(phasesB-phasesA), sorted(phasesA-phasesB)))
+				return
+			middle = 0.5*(a+b)
+			recordMiddle = calculatePoint(middle)
+			bisect(a, recordA, middle, recordMiddle)
+			bisect(middle, recordMiddle, b, recordB)
+
+		value = float(start)
+		record = calculatePoint(value)
+		while direction*(stop-value) > 0.0:
+			nextValue = value+direction*min(maxStep, abs(stop-value))
+			nextRecord = calculatePoint(nextValue)
+			bisect(value, record, nextValue, nextRecord)
+			value, record = nextValue, nextRecord
+
+		records.sort(key=lambda record: direction*record[0])
+		return self._columns(records), boundaries
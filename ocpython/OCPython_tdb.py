@@ -0,0 +1,602 @@
+"""
+This is the database (tdb) part of OC-Python (under development)
+
+Notes:
+1) The tdb file is read in pure Python (no liboctq), the result is an indexed in-memory model of the database:
+   elements, species, functions by symbol, phases by name and parameters by (type, phase, constituents, order).
+2) A binary snapshot of the model can be saved and reloaded much faster than the tdb file can be parsed.
+3) The original text of every command is kept, so a (reduced) tdb file can be written again.
+4) A database can be pruned to a set of elements: only the species, functions, phases and parameters reachable from
+   the elements are kept. Pruned tdb files are cached by (file hash, element set), see getPrunedTDB.
+
+author: Chunhui Luo, 2022
+"""
+
+import hashlib, os, pickle, re, tempfile
+
+class TDBElement(object):
+	"""
+	class: element (ELEMENT command)
+	"""
+	def __init__(self, name, referenceState, mass, h298, s298, text):
+		self.name = name
+		self.referenceState = referenceState
+		self.mass = mass
+		self.h298 = h298
+		self.s298 = s298
+		self.text = text
+
+class TDBSpecies(object):
+	"""
+	class: species (SPECIES command)
+	"""
+	def __init__(self, name, formula, text):
+		self.name = name
+		self.formula = formula
+		self.text = text
+		# {element: stoichiometry}, set by TDBDatabase once all elements are known
+		self.elements = {}
+
+class TDBFunction(object):
+	"""
+	class: function (FUNCTION command), a piecewise expression in T and P
+	"""
+	def __init__(self, symbol, ranges, reference, text):
+		self.symbol = symbol
+		# list of (lowest temperature, expression, highest temperature)
+		self.ranges = ranges
+		self.reference = reference
+		self.text = text
+
+class TDBPhase(object):
+	"""
+	class: phase (PHASE and CONSTITUENT commands)
+	"""
+	def __init__(self, name, stateDesignator, typeCodes, sites, text):
+		self.name = name
+		self.stateDesignator = stateDesignator
+		self.typeCodes = typeCodes
+		self.sites = sites
+		self.text = text
+		# list of constituent lists, one per sublattice
+		self.constituents = []
+		# sets of the major constituents (marked with %), one per sublattice
+		self.majorConstituents = []
+		self.constituentText = ''
+
+class TDBParameter(object):
+	"""
+	class: parameter (PARAMETER command)
+	"""
+	def __init__(self, parameterType, phaseName, constituents, order, ranges, reference, text):
+		self.parameterType = parameterType
+		self.phaseName = phaseName
+		# tuple of constituent tuples, one per sublattice
+		self.constituents = constituents
+		self.order = order
+		self.ranges = ranges
+		self.reference = reference
+		self.text = text
+
+class TDBTypeDefinition(object):
+	"""
+	class: type definition (TYPE_DEFINITION command)
+	"""
+	def __init__(self, code, phaseName, kind, arguments, text):
+		self.code = code
+		# phase amended by the type definition (e.g. MAGNETIC or DIS_PART), None otherwise
+		self.phaseName = phaseName
+		self.kind = kind
+		self.arguments = arguments
+		self.text = text
+
+class TDBDatabase(object):
+	"""
+	Indexed in-memory model of a tdb database
+	"""
+	_keywords = ('ELEMENT', 'SPECIES', 'FUNCTION', 'PHASE', 'CONSTITUENT', 'PARAMETER', 'TYPE_DEFINITION')
+	_defaultLowTemperature = 298.15
+	_defaultHighTemperature = 6000.0
+	_commandPattern = re.compile(r"'[^']*'|!|[^'!]+|'")
+	_parameterPattern = re.compile(r'^\s*([A-Z0-9_]+)\s*\(\s*([^,\s]+)\s*,([^;]*);\s*(\d+)\s*\)\s*(.*)$', re.S)
+	_symbolPattern = re.compile(r'[A-Z_][A-Z0-9_]*')
+
+	def __init__(self):
+		self.filePath = None
+		self.elements = {}
+		self.species = {}
+		self.functions = {}
+		self.phases = {}
+		self.parameters = {}
+		self.parametersByPhase = {}
+		self.typeDefinitions = {}
+		# commands which are not modelled (DATABASE_INFO, DEFINE_SYSTEM_DEFAULT, LIST_OF_REFERENCES, ...) in file order
+		self.otherCommands = []
+
+	@staticmethod
+	def read(filePath):
+		"""
+		read a tdb file
+
+		Parameters
+		----------
+		param1
+			filePath
+
+		Returns
+		-------
+		TDBDatabase
+			database
+		"""
+		with open(filePath, 'r', errors='replace') as f:
+			text = f.read()
+		database = TDBDatabase()
+		database.filePath = filePath
+		database.parse(text)
+		return database
+
+	@staticmethod
+	def load(snapshotPath):
+		"""
+		load a binary snapshot written by save()
+
+		Parameters
+		----------
+		param1
+			snapshotPath
+
+		Returns
+		-------
+		TDBDatabase
+			database
+		"""
+		with open(snapshotPath, 'rb') as f:
+			return pickle.load(f)
+
+	def save(self, snapshotPath):
+		"""
+		save a binary snapshot of the database
+
+		Parameters
+		----------
+		param1
+			snapshotPath
+		"""
+		with open(snapshotPath, 'wb') as f:
+			pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+	@staticmethod
+	def splitCommands(text):
+		"""
+		split the text of a tdb file into commands (terminated by !), comment lines starting with $ are removed
+
+		Parameters
+		----------
+		param1
+			text
+
+		Returns
+		-------
+		list
+			commands (without the terminating !)
+		"""
+		lines = [line for line in text.splitlines() if not line.lstrip().startswith('$')]
+		commands = []
+		command = []
+		for token in TDBDatabase._commandPattern.findall('\n'.join(lines)):
+			# quotes delimit strings (which may contain !) in the reference list only, elsewhere ' is a type code
+			if token[0] == "'" and not ''.join(command).lstrip().upper().startswith('LIST'):
+				for i, part in enumerate(token.split('!')):
+					if i > 0:
+						commands.append(''.join(command).strip())
+						command = []
+					command.append(part)
+			elif token == '!':
+				commands.append(''.join(command).strip())
+				command = []
+			else:
+				command.append(token)
+		if ''.join(command).strip():
+			commands.append(''.join(command).strip())
+		return [command for command in commands if command]
+
+	@staticmethod
+	def keyword(command):
+		"""
+		get the (possibly abbreviated) keyword of a command
+
+		Parameters
+		----------
+		param1
+			command
+
+		Returns
+		-------
+		str
+			full keyword, None if it is not modelled
+		"""
+		word = command.split(None, 1)[0].upper()
+		for keyword in TDBDatabase._keywords:
+			if keyword.startswith(word):
+				return keyword
+		return None
+
+	@staticmethod
+	def parseRanges(text):
+		"""
+		parse the temperature ranges of a function or parameter: Tlow expr; Thigh Y expr; ... Thigh N ref
+
+		Parameters
+		----------
+		param1
+			text
+
+		Returns
+		-------
+		list
+			(lowest temperature, expression, highest temperature)
+		str
+			reference
+		"""
+		lowTemperature, text = text.split(None, 1)
+		lowTemperature = TDBDatabase._temperature(lowTemperature, TDBDatabase._defaultLowTemperature)
+		parts = text.split(';')
+		ranges = []
+		reference = ''
+		expression = parts[0]
+		for part in parts[1:]:
+			tokens = part.split(None, 2)
+			highTemperature = TDBDatabase._temperature(tokens[0] if tokens else ',', TDBDatabase._defaultHighTemperature)
+			ranges.append((lowTemperature, ''.join(expression.split()).upper(), highTemperature))
+			lowTemperature = highTemperature
+			if len(tokens) > 1 and tokens[1].upper() == 'Y':
+				expression = tokens[2] if len(tokens) > 2 else ''
+			else:
+				if len(tokens) > 1 and tokens[1].upper() != 'N':
+					reference = ' '.join(tokens[1:])
+				elif len(tokens) > 2:
+					reference = tokens[2].strip()
+				break
+		return ranges, reference
+
+	@staticmethod
+	def _temperature(token, default):
+		try:
+			return float(token)
+		except ValueError:
+			return default
+
+	def parse(self, text):
+		"""
+		parse the text of a tdb file into the database
+
+		Parameters
+		----------
+		param1
+			text
+		"""
+		for command in TDBDatabase.splitCommands(text):
+			keyword = TDBDatabase.keyword(command)
+			try:
+				if keyword == 'ELEMENT':
+					self._parseElement(command)
+				elif keyword == 'SPECIES':
+					self._parseSpecies(command)
+				elif keyword == 'FUNCTION':
+					self._parseFunction(command)
+				elif keyword == 'PHASE':
+					self._parsePhase(command)
+				elif keyword == 'CONSTITUENT':
+					self._parseConstituent(command)
+				elif keyword == 'PARAMETER':
+					self._parseParameter(command)
+				elif keyword == 'TYPE_DEFINITION':
+					self._parseTypeDefinition(command)
+				else:
+					self.otherCommands.append(command)
+			except (ValueError, IndexError, KeyError) as e:
+				raise ValueError('cannot parse tdb command: %s (%s)' % (command[0:80], e))
+
+		for species in self.species.values():
+			species.elements = self.parseFormula(species.formula)
+
+	def _parseElement(self, command):
+		tokens = command.split()
+		name = tokens[1].upper()
+		values = [float(token) for token in tokens[3:6]]
+		self.elements[name] = TDBElement(name, tokens[2].upper(), *values, text=command)
+
+	def _parseSpecies(self, command):
+		tokens = command.split()
+		name = tokens[1].upper()
+		self.species[name] = TDBSpecies(name, tokens[2].upper(), command)
+
+	def _parseFunction(self, command):
+		tokens = command.split(None, 2)
+		symbol = tokens[1].upper()
+		ranges, reference = TDBDatabase.parseRanges(tokens[2])
+		self.functions[symbol] = TDBFunction(symbol, ranges, reference, command)
+
+	def _parsePhase(self, command):
+		tokens = command.split()
+		name, _, stateDesignator = tokens[1].upper().partition(':')
+		try:
+			float(tokens[2])
+			typeCodes = ''
+			tokens = tokens[2:]
+		except ValueError:
+			typeCodes = tokens[2]
+			tokens = tokens[3:]
+		nSublattices = int(tokens[0])
+		sites = [float(token) for token in tokens[1:1+nSublattices]]
+		self.phases[name] = TDBPhase(name, stateDesignator, typeCodes, sites, command)
+
+	def _parseConstituent(self, command):
+		tokens = command.split(None, 2)
+		name = tokens[1].upper().partition(':')[0]
+		rest = tokens[2] if len(tokens) > 2 else ''
+		# the constituent list starts and ends with :
+		sublattices = ''.join(rest.split()).upper().strip(':').split(':')
+		if not name in self.phases:
+			raise ValueError('unknown phase %s' % name)
+		phase = self.phases[name]
+		phase.constituents = [[constituent.rstrip('%') for constituent in sublattice.split(',') if constituent] for sublattice in sublattices]
+		phase.majorConstituents = [{constituent.rstrip('%') for constituent in sublattice.split(',') if constituent.endswith('%')} for sublattice in sublattices]
+		phase.constituentText = command
+
+	def _parseParameter(self, command):
+		body = command.split(None, 1)[1]
+		match = TDBDatabase._parameterPattern.match(body)
+		if match is None:
+			raise ValueError('unknown parameter format')
+		parameterType, phaseName, constituentText, order, rest = match.groups()
+		parameterType = parameterType.upper()
+		phaseName = phaseName.upper().partition(':')[0]
+		constituents = tuple(tuple(constituent.strip() for constituent in sublattice.split(',')) for sublattice in ''.join(constituentText.split()).upper().split(':'))
+		order = int(order)
+		ranges, reference = TDBDatabase.parseRanges(rest)
+		parameter = TDBParameter(parameterType, phaseName, constituents, order, ranges, reference, command)
+		key = (parameterType, phaseName, constituents, order)
+		# parameters of a phase and an element (e.g. MQ(FCC_A1&AL,...)) are listed with the phase
+		bareName = phaseName.partition('&')[0]
+		if key in self.parameters:
+			self.parametersByPhase[bareName].remove(self.parameters[key])
+		self.parameters[key] = parameter
+		self.parametersByPhase.setdefault(bareName, []).append(parameter)
+
+	def _parseTypeDefinition(self, command):
+		tokens = command.split()
+		code = tokens[1]
+		phaseName = None
+		kind = None
+		arguments = []
+		if len(tokens) > 4 and tokens[3].upper() in ('A_P_D', 'AMEND_PHASE_DESCRIPTION'):
+			phaseName = tokens[4].upper()
+			kind = tokens[5].upper() if len(tokens) > 5 else None
+			arguments = [argument.strip(',').upper() for argument in tokens[6:]]
+		self.typeDefinitions[code] = TDBTypeDefinition(code, phaseName, kind, arguments, command)
+
+	def parseFormula(self, formula):
+		"""
+		parse the formula of a species with the known element names, e.g. V1C1 -> {'V': 1.0, 'C': 1.0}
+
+		Parameters
+		----------
+		param1
+			formula
+
+		Returns
+		-------
+		dict
+			{element: stoichiometry}
+		"""
+		formula = formula.partition('/')[0]
+		elements = {}
+		i = 0
+		while i < len(formula):
+			if formula[i:i+2] in self.elements:
+				name = formula[i:i+2]
+			elif formula[i:i+1] in self.elements:
+				name = formula[i:i+1]
+			else:
+				raise ValueError('unknown element in species formula %s' % formula)
+			i += len(name)
+			j = i
+			while j < len(formula) and (formula[j].isdigit() or formula[j] == '.'):
+				j += 1
+			elements[name] = elements.get(name, 0.0)+(float(formula[i:j]) if j > i else 1.0)
+			i = j
+		return elements
+
+	def getConstituentElements(self, constituent):
+		"""
+		get the elements of a constituent (element or species)
+
+		Parameters
+		----------
+		param1
+			constituent
+
+		Returns
+		-------
+		set
+			element names
+		"""
+		if constituent in self.species:
+			return set(self.species[constituent].elements)
+		return {constituent}
+
+	def getParameters(self, phaseName, parameterType=None):
+		"""
+		get the parameters of a phase, including the parameters of the phase and an element (e.g. MQ(FCC_A1&AL,...))
+
+		Parameters
+		----------
+		param1
+			phaseName: phase name, or phase and element (e.g. FCC_A1&AL) for the parameters of the element only
+		param2
+			parameterType: e.g. 'G', 'L' or 'TC', all types if None
+
+		Returns
+		-------
+		list
+			parameters
+		"""
+		phaseName = phaseName.upper()
+		parameters = self.parametersByPhase.get(phaseName.partition('&')[0], [])
+		if '&' in phaseName:
+			parameters = [parameter for parameter in parameters if parameter.phaseName == phaseName]
+		if parameterType is None:
+			return list(parameters)
+		return [parameter for parameter in parameters if parameter.parameterType == parameterType.upper()]
+
+	def getReferencedFunctions(self, ranges):
+		"""
+		get the functions referenced by an expression, directly or through other functions
+
+		Parameters
+		----------
+		param1
+			ranges: ranges of a function or parameter
+
+		Returns
+		-------
+		set
+			function symbols
+		"""
+		referenced = set()
+		pending = [ranges]
+		while pending:
+			for _, expression, _ in pending.pop():
+				for symbol in TDBDatabase._symbolPattern.findall(expression.upper()):
+					if symbol in self.functions and not symbol in referenced:
+						referenced.add(symbol)
+						pending.append(self.functions[symbol].ranges)
+		return referenced
+
+	def prune(self, elements):
+		"""
+		reduce the database to a set of elements
+
+		Parameters
+		----------
+		param1
+			elements
+
+		Returns
+		-------
+		TDBDatabase
+			database with the elements (and VA, /-), the species, phases and parameters of these elements and
+			the functions referenced by the parameters
+		"""
+		elements = {element.upper() for element in elements}
+		for element in elements:
+			if not element in self.elements:
+				raise ValueError('element %s is not in the database' % element)
+		elements.update(element for element in ('VA', '/-') if element in self.elements)
+
+		pruned = TDBDatabase()
+		pruned.filePath = self.filePath
+		pruned.elements = {name: element for name, element in self.elements.items() if name in elements}
+		pruned.species = {name: species for name, species in self.species.items() if set(species.elements) <= elements}
+		allowed = set(pruned.elements) | set(pruned.species) | {'*'}
+
+		for name, phase in self.phases.items():
+			constituents = [[constituent for constituent in sublattice if constituent in allowed] for sublattice in phase.constituents]
+			if not constituents or not all(constituents):
+				continue
+			prunedPhase = TDBPhase(name, phase.stateDesignator, phase.typeCodes, phase.sites, phase.text)
+			prunedPhase.constituents = constituents
+			prunedPhase.majorConstituents = [major & set(sublattice) for major, sublattice in zip(phase.majorConstituents, constituents)]
+			if constituents == phase.constituents:
+				prunedPhase.constituentText = phase.constituentText
+			else:
+				prunedPhase.constituentText = 'CONSTITUENT %s%s :%s :' % (name, ':'+phase.stateDesignator if phase.stateDesignator else '',
+					' : '.join(','.join(constituent+('%' if constituent in major else '') for constituent in sublattice)
+						for major, sublattice in zip(prunedPhase.majorConstituents, constituents)))
+			pruned.phases[name] = prunedPhase
+
+		# an ordered phase cannot be used without its disordered part
+		for typeDefinition in self.typeDefinitions.values():
+			if typeDefinition.kind == 'DIS_PART' and typeDefinition.phaseName in pruned.phases and typeDefinition.code in pruned.phases[typeDefinition.phaseName].typeCodes:
+				if not typeDefinition.arguments or not typeDefinition.arguments[0] in pruned.phases:
+					del pruned.phases[typeDefinition.phaseName]
+		# a type definition is used through the type codes of the phases, whichever phase it amends (e.g. the magnetic
+		# model of BCC_A2 used by BCC_B2)
+		typeCodes = {code for phase in pruned.phases.values() for code in phase.typeCodes}
+		pruned.typeDefinitions = {code: typeDefinition for code, typeDefinition in self.typeDefinitions.items() if code in typeCodes}
+
+		for phaseName in pruned.phases:
+			for parameter in self.parametersByPhase.get(phaseName, []):
+				element = parameter.phaseName.partition('&')[2]
+				if (not element or element in allowed) and all(constituent in allowed for sublattice in parameter.constituents for constituent in sublattice):
+					pruned.parameters[(parameter.parameterType, parameter.phaseName, parameter.constituents, parameter.order)] = parameter
+					pruned.parametersByPhase.setdefault(phaseName, []).append(parameter)
+
+		referenced = set()
+		for parameter in pruned.parameters.values():
+			referenced.update(self.getReferencedFunctions(parameter.ranges))
+		pruned.functions = {symbol: function for symbol, function in self.functions.items() if symbol in referenced}
+		pruned.otherCommands = list(self.otherCommands)
+		return pruned
+
+	def write(self, filePath):
+		"""
+		write the database to a tdb file
+
+		Parameters
+		----------
+		param1
+			filePath
+		"""
+		# the reference list is written at the end, the other commands (e.g. DEFINE_SYSTEM_DEFAULT) after the elements
+		references = [command for command in self.otherCommands if command.upper().startswith('LIST')]
+		commands = [element.text for element in self.elements.values()]
+		commands += [command for command in self.otherCommands if not command.upper().startswith('LIST')]
+		commands += [species.text for species in self.species.values()]
+		commands += [function.text for function in self.functions.values()]
+		commands += [typeDefinition.text for typeDefinition in self.typeDefinitions.values()]
+		for phase in self.phases.values():
+			commands += [phase.text, phase.constituentText]
+		commands += [parameter.text for parameter in self.parameters.values()]
+		commands += references
+		with open(filePath, 'w') as f:
+			for command in commands:
+				f.write(' %s !\n' % command)
+
+def getPrunedTDB(tdbFilePath, elements, cacheDirectory=None):
+	"""
+	get a tdb file reduced to a set of elements, the file is written once and cached by (file hash, element set)
+
+	Parameters
+	----------
+	param1
+		tdbFilePath
+	param2
+		elements
+	param3
+		cacheDirectory: directory of the pruned files, ocpython_tdb in the temporary directory if None
+
+	Returns
+	-------
+	str
+		path of the pruned tdb file
+	"""
+	if cacheDirectory is None:
+		cacheDirectory = os.path.join(tempfile.gettempdir(), 'ocpython_tdb')
+	with open(tdbFilePath, 'rb') as f:
+		content = f.read()
+	key = hashlib.sha256(content+('\n'+','.join(sorted({element.upper() for element in elements}))).encode()).hexdigest()
+	prunedFilePath = os.path.join(cacheDirectory, key[0:32]+'.TDB')
+	if os.path.exists(prunedFilePath):
+		return prunedFilePath
+
+	database = TDBDatabase()
+	database.filePath = tdbFilePath
+	database.parse(content.decode(errors='replace'))
+	os.makedirs(cacheDirectory, exist_ok=True)
+	# written under a temporary name first: several processes may prune the same database at once
+	temporaryFilePath = '%s.%d' % (prunedFilePath, os.getpid())
+	database.prune(elements).write(temporaryFilePath)
+	os.replace(temporaryFilePath, prunedFilePath)
+	return prunedFilePath
@@ -458,4 +458,55 @@ class OCPython_utility(object):
 		except KeyError:
 			pass
 
-		return values_dict, T_K,C_comp_in_FCC_A1
\ No newline at end of file
+		return values_dict, T_K,C_comp_in_FCC_A1
+
+	@staticmethod
+	def calc_phasefrac_temploop_adaptive(oc,T_start,T_end,stateVar,T_step=50.0,T_tolerance=0.5,DGM_window=0.0):
+		"""
+		Calculate phase fraction with adaptive temperature loop
+
+		Large temperature steps are taken where the set of stable phases is constant,
+		phase boundaries are bisected until they are located within T_tolerance.
+		A phase stable in a range narrower than T_step is missed unless DGM_window is set
+		(see StepCalculator.calculateAdaptive).
+
+		Parameters
+		----------
+		param1
+			oc
+		param2
+			T_start
+		param3
+			T_end
+		param4
+			stateVar
+		param5
+			T_step: temperature step where the set of stable phases is constant
+		param6
+			T_tolerance: accuracy of the phase boundary temperatures
+		param7
+			DGM_window: intervals where an entered phase has a driving force above -DGM_window are bisected as well (0: not used)
+
+		Returns
+		-------
+		dict
+			values_dict
+		list
+			T_K
+		list
+			boundaries: (temperature, appearing phases, disappearing phases)
+		"""
+		try:
+			from ocpython.OCPython_step import StepCalculator
+		except:
+			from OCPython_step import StepCalculator
+
+		step = StepCalculator(oc, 'T', scalarProperties=(), phaseProperties=(stateVar,))
+		results, boundaries = step.calculateAdaptive(T_start, T_end, T_step, T_tolerance, drivingForceWindow=DGM_window)
+		print('total loops for setting temperature and preforming calculate equilibrium are:', len(results['T']))
+
+		n = len(stateVar)+1
+		values_dict = {key[n:-1]:np.nan_to_num(value) for key,value in results.items() if key.startswith(stateVar+'(')}
+		T_K = results['T'].tolist()
+
+		return values_dict, T_K, boundaries
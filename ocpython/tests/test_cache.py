@@ -0,0 +1,86 @@
+"""
+Tests of the result cache part of OC-Python, no liboctq needed
+"""
+
+import time
+
+from ocpython.OCPython_cache import EquilibriumCache, EquilibriumStore
+
+def test_quantize():
+	cache = EquilibriumCache(significantDigits=6)
+	assert cache.quantize(1000.0000001) == cache.quantize(1000.0)
+	assert not cache.quantize(1000.01) == cache.quantize(1000.0)
+	assert cache.quantize([1.0, (2.0000000001, 'A')]) == (1.0, (2.0, 'A'))
+	assert cache.quantize({'B': 1.0, 'A': 2.0}) == cache.quantize({'A': 2.0, 'B': 1.0})
+
+def test_key():
+	cache = EquilibriumCache()
+	conditions = {'T': 1000.0, 'P': 1E5, 'X(0)': 0.1, 'phases': {'FCC_A1': (0, 0.0), 'LIQUID': (-2, 0.0)}}
+	reordered = {'phases': {'LIQUID': (-2, 0.0), 'FCC_A1': (0, 0.0)}, 'X(0)': 0.1, 'P': 1E5, 'T': 1000.0}
+	assert cache.makeKey(conditions, 0) == cache.makeKey(reordered, 0)
+	assert not cache.makeKey(conditions, 0) == cache.makeKey(conditions, -1)
+	hash(cache.makeKey(conditions, 0))
+
+def test_lru():
+	cache = EquilibriumCache(maxSize=2)
+	cache.put('a', {'G': 1.0})
+	cache.put('b')['G'] = 2.0
+	assert cache.get('a') == {'G': 1.0}
+	# b is the least recently used one
+	cache.put('c')
+	assert cache.get('b') is None
+	assert cache.get('a') is not None and cache.get('c') == {}
+	statistics = cache.getStatistics()
+	assert (statistics['size'], statistics['hits'], statistics['misses'], statistics['evictions']) == (2, 3, 1, 1)
+	cache.clear()
+	assert len(cache) == 0 and cache.getStatistics()['hits'] == 0
+
+def test_store_keys(tmp_path):
+	tdbFilePath = tmp_path / 'A.TDB'
+	tdbFilePath.write_text(' ELEMENT A FCC_A1 1 0 0 !\n')
+	copyFilePath = tmp_path / 'B.TDB'
+	copyFilePath.write_text(' ELEMENT A FCC_A1 1 0 0 !\n')
+	store = EquilibriumStore(str(tmp_path / 'store.db'))
+	conditions = {'database': (str(tdbFilePath), ('A',)), 'T': 1000.0, 'phases': {'A': (0, 0.0), 'B': (2, 1.0)}}
+	key = store.makeKey(conditions, 'batch', 'G')
+	# keyed by the content of the database, not its path
+	assert store.makeKey(dict(conditions, database=(str(copyFilePath), ('A',))), 'batch', 'G') == key
+	assert store.makeKey(dict(conditions, phases={'B': (2, 1.0), 'A': (0, 0.0)}), 'batch', 'G') == key
+	assert not store.makeKey(conditions, 'batch', 'H') == key
+	assert not store.makeKey(dict(conditions, T=1000.5), 'batch', 'G') == key
+	tdbFilePath.write_text(' ELEMENT A FCC_A1 2 0 0 !\n')
+	time.sleep(0.01)
+	store.databaseHashes.clear()
+	assert not store.makeKey(conditions, 'batch', 'G') == key
+	store.close()
+
+def test_store(tmp_path):
+	filePath = str(tmp_path / 'store.db')
+	store = EquilibriumStore(filePath)
+	store.putMany([('a', 1.0), ('b', {'NP': [0.5, 0.5]})])
+	assert store.getMany(['a', 'x', 'b']) == [1.0, None, {'NP': [0.5, 0.5]}]
+	assert store.getStatistics()['hits'] == 2 and store.getStatistics()['misses'] == 1
+	store.close()
+
+	# persistent across runs
+	store = EquilibriumStore(filePath)
+	assert store.get('a') == 1.0 and len(store) == 2
+	store.close()
+
+def test_store_eviction(tmp_path):
+	store = EquilibriumStore(str(tmp_path / 'store.db'), maxEntries=2)
+	store.put('a', 1.0)
+	time.sleep(0.01)
+	store.put('b', 2.0)
+	time.sleep(0.01)
+	store.get('a')
+	time.sleep(0.01)
+	store.put('c', 3.0)
+	# b is the least recently used one
+	assert len(store) == 2 and store.get('b') is None and store.get('a') == 1.0
+
+	store.maxAge = 0.0
+	time.sleep(0.01)
+	store.evict()
+	assert len(store) == 0
+	store.close()
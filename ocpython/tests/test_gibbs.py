@@ -0,0 +1,88 @@
+"""
+Tests of the Gibbs energy part of OC-Python, no liboctq needed
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from ocpython.OCPython_gibbs import GibbsEnergyCompiler, _EvaluationContext
+from ocpython.OCPython_tdb import TDBDatabase
+
+examplesDirectory = os.path.join(os.path.dirname(__file__), '..', '..', 'examples')
+
+@pytest.fixture(scope='module')
+def steel():
+	return GibbsEnergyCompiler(os.path.join(examplesDirectory, 'steel1.TDB'))
+
+def evaluateExpression(compiler, expression, T, P=1E5):
+	T = np.asarray(T, dtype=np.float64)
+	context = _EvaluationContext(T, np.full(T.shape, P))
+	return [np.broadcast_to(v, T.shape) for v in compiler.compileExpression(expression)(T, context.P, context, None)]
+
+def checkDerivatives(evaluate, T, h=1E-3, rtol=1E-5):
+	"""
+	compare the first and second derivatives with central differences
+	"""
+	G, dG, d2G = evaluate(T)
+	Gp, dGp, _ = evaluate(T+h)
+	Gm, dGm, _ = evaluate(T-h)
+	np.testing.assert_allclose(dG, (Gp-Gm)/(2.0*h), rtol=rtol, atol=1E-6)
+	np.testing.assert_allclose(d2G, (dGp-dGm)/(2.0*h), rtol=rtol, atol=1E-6)
+
+def test_expression_derivatives():
+	database = TDBDatabase()
+	database.parse(' FUNCTION F1 298.15 +2*T**2+3; 6000 N !\n')
+	compiler = GibbsEnergyCompiler(database)
+	T = np.array([300.0, 800.0, 1500.0])
+	for expression in ('-7976.15+137.093038*T-24.3671976*T*LN(T)-.001884662*T**2-8.77664E-07*T**3+74092*T**(-1)',
+		'+2.29603E+31*T**(-9)', 'F1#*EXP(-T/1000)', 'SQRT(T)/F1', '2**(T/500)', '-R*T*LN(1.71E-4)'):
+		checkDerivatives(lambda T: evaluateExpression(compiler, expression, T), T)
+	G, dG, d2G = evaluateExpression(compiler, 'F1#*T', T)
+	np.testing.assert_allclose(G, (2*T**2+3)*T)
+	np.testing.assert_allclose(dG, 6*T**2+3)
+	np.testing.assert_allclose(d2G, 12*T)
+	with pytest.raises(ValueError):
+		compiler.compileExpression('UNKNOWN#*T')
+
+def test_piecewise(steel):
+	# GHSERFE has two ranges, split at 1811 K
+	function = steel.compileFunction('GHSERFE')
+	T = np.array([1000.0, 1811.0, 1811.0+1E-6, 3000.0])
+	G, _, _ = function.evaluate(_EvaluationContext(T, np.full(T.shape, 1E5)))
+	assert abs(G[1]-G[2]) < 0.01
+	np.testing.assert_allclose(G[3], -25383.581+299.31255*3000.0-46*3000.0*np.log(3000.0)+2.29603E+31*3000.0**-9)
+
+def test_magnetic_element(steel):
+	assert steel.getMagneticModel('BCC_A2') == (-1.0, 0.4)
+	assert steel.getMagneticModel('LIQUID') is None
+	result = steel.calculateElements(['FE'], [298.15])['FE']
+	# SGTE: H(298.15) = 0 in the reference state, S(298.15) = 27.28 J/mol/K, G(298.15) = -T*S
+	assert abs(result['H'][0]) < 1.0
+	assert abs(result['S'][0]-27.28) < 0.01
+	assert abs(result['G'][0]+8132.7) < 1.0
+	# the magnetic peak of Cp near the Curie temperature (1043 K)
+	cp = steel.calculateElements(['FE'], [800.0, 1000.0, 1043.0, 1100.0])['FE']['CP']
+	assert 50.0 < cp[1] < 60.0 and cp[2] > cp[1] > cp[0] and cp[2] > cp[3]
+
+def test_magnetic_derivatives(steel):
+	endmember = steel.compileEndmember('BCC_A2', ('FE', 'VA'))
+	assert endmember.magnetic is not None
+	# below and above the Curie temperature
+	T = np.array([300.0, 700.0, 1000.0, 1100.0, 1500.0])
+	checkDerivatives(lambda T: endmember.evaluate(_EvaluationContext(T, np.full(T.shape, 1E5))), T)
+	magnetic = endmember.magnetic.evaluate(_EvaluationContext(T, np.full(T.shape, 1E5)))[0]
+	assert (magnetic < 0.0).all()
+
+def test_endmembers(steel):
+	nonMagnetic = steel.compileEndmember('LIQUID', ('FE',))
+	assert nonMagnetic.magnetic is None
+	T = np.array([1000.0, 2000.0])
+	results = steel.calculateEndmembers([('LIQUID', ('FE',)), ('BCC_A2', ('FE', 'VA'))], T)
+	parameter = steel.evaluate([steel.compileParameter(steel.getEndmemberParameter('LIQUID', ('FE',)))], T)[0]
+	np.testing.assert_allclose(results[0]['G'], parameter['G'])
+	np.testing.assert_allclose(results[1]['G'], steel.calculateElements(['FE'], T)['FE']['G'])
+	np.testing.assert_allclose(results[1]['H'], results[1]['G']+T*results[1]['S'])
+	with pytest.raises(ValueError):
+		steel.getEndmemberParameter('LIQUID', ('XX',))
@@ -0,0 +1,178 @@
+"""
+Tests of the phase part of OC-Python with a fake liboctq: one phase (AL,NI,PT)1(VA)1, regular solution of AL, NI and PT
+"""
+
+import importlib, sys, types
+
+import numpy as np
+import pytest
+
+R = 8.31451
+L = 2.0
+K = -1.5
+
+class FakeLiboctq(types.ModuleType):
+	"""
+	the liboctq calls of OCPython_phase, G/RT = sum(y*ln(y))+L*y(AL)*y(NI)+K*y(AL)*y(PT) on the first sublattice
+	"""
+	names = ['AL', 'NI', 'PT', 'VA']
+
+	def __init__(self):
+		super().__init__('ocpython.liboctq_f90wrap')
+		self.y = np.array([0.1, 0.2, 0.7, 1.0])
+		self.G = None
+
+	def f90wrap_pytqgphc1(self, phaseTuple, nConstituentsInSublattices, speciesIndices, siteFractions, sites, extra, eq):
+		nConstituentsInSublattices[0:2] = (3, 1)
+		sites[0:2] = (1.0, 1.0)
+		siteFractions[0:4] = self.y
+		extra[0] = 1.0
+		return 2
+
+	def f90wrap_pytqgpcn2(self, iph, k):
+		return FakeLiboctq.names[k-1].encode()
+
+	def f90wrap_pytqsphc1(self, phaseTuple, siteFractions, extra, eq):
+		self.y = siteFractions[0:4].copy()
+
+	def f90wrap_pytqcph1(self, phaseTuple, order, nConstituents, gtp, dgdy, d2gdydt, d2gdydp, d2gdy2, eq):
+		y = self.y[0:3]
+		gtp[0] = self.G = (y*np.log(y)).sum()+L*y[0]*y[1]+K*y[0]*y[2]
+		dgdy[0:3] = np.log(y)+1.0+L*np.array([y[1], y[0], 0.0])+K*np.array([y[2], 0.0, y[0]])
+		dgdy[3] = 0.0
+		H = np.zeros((4, 4))
+		H[0:3,0:3] = np.diag(1.0/y)
+		H[0,1] = H[1,0] = L
+		H[0,2] = H[2,0] = K
+		# packed as in OC: (1,1),(1,2),(2,2),(1,3),(2,3),(3,3)...
+		lower = np.tril_indices(4)
+		d2gdy2[:] = H[lower[1], lower[0]]
+
+class FakeCalculation(object):
+	"""
+	the SingleEquilibriumCalculation calls of OCPython_phase
+	"""
+	_maxNSublattice = 10
+	_maxNConstituent = 50
+
+	def __init__(self, database):
+		self.eq = None
+		self.eqName = 'E'
+		self.conditions = {'E': {'database': (database, ('AL', 'NI', 'PT')), 'T': 800.0, 'P': 1E5}}
+
+	def getPhaseTable(self):
+		return types.SimpleNamespace(names=['FCC_A1'], phaseIndices=[1])
+
+	def setTemperature(self, temperature):
+		self.conditions[self.eqName]['T'] = temperature
+
+	def setPressure(self, pressure):
+		self.conditions[self.eqName]['P'] = pressure
+
+	def getErrorCode(self):
+		return 0
+
+	def resetErrorCode(self):
+		pass
+
+mobilityTDB = """
+ ELEMENT AL FCC_A1 26.98 0 0 !
+ ELEMENT NI FCC_A1 58.69 0 0 !
+ ELEMENT PT FCC_A1 195.08 0 0 !
+ PHASE FCC_A1 % 2 1 1 !
+ CONSTITUENT FCC_A1 :AL,NI,PT : VA : !
+ PARAMETER MQ(FCC_A1&AL,AL:VA;0) 298.15 -142000-R*T*10; 6000 N !
+ PARAMETER MQ(FCC_A1&AL,NI:VA;0) 298.15 -284000-R*T*9; 6000 N !
+ PARAMETER MQ(FCC_A1&AL,AL,NI:VA;0) 298.15 -41300; 6000 N !
+ PARAMETER MQ(FCC_A1&AL,AL,NI:VA;1) 298.15 1000; 6000 N !
+ PARAMETER MQ(FCC_A1&NI,NI:VA;0) 298.15 -287000-R*T*LN(1.9E-4); 6000 N !
+"""
+
+@pytest.fixture
+def oc(monkeypatch):
+	fake = FakeLiboctq()
+	monkeypatch.setitem(sys.modules, 'ocpython.liboctq_f90wrap', fake)
+	monkeypatch.setitem(sys.modules, 'ocpython.OCPython', types.SimpleNamespace(SingleEquilibriumCalculation=FakeCalculation))
+	yield fake
+	sys.modules.pop('ocpython.OCPython_phase', None)
+
+@pytest.fixture
+def phase(oc):
+	sys.modules.pop('ocpython.OCPython_phase', None)
+	return importlib.import_module('ocpython.OCPython_phase')
+
+@pytest.fixture
+def calc(tmp_path):
+	filePath = tmp_path / 'mobility.TDB'
+	filePath.write_text(mobilityTDB)
+	return FakeCalculation(str(filePath))
+
+def test_evaluator(phase, calc):
+	evaluator = phase.PhaseEvaluator(calc, 'fcc_a1')
+	assert evaluator.constituents == ['AL', 'NI', 'PT', 'VA']
+	assert evaluator.nConstituentsInSublattices == [3, 1]
+	y = np.array([[0.2, 0.3, 0.5, 1.0], [0.6, 0.1, 0.3, 1.0]])
+	out = evaluator.allocate(5)
+	results = evaluator.evaluate(y, 1000.0, out=out)
+	RT = R*1000.0
+	G = RT*((y[:,0:3]*np.log(y[:,0:3])).sum(axis=1)+L*y[:,0]*y[:,1]+K*y[:,0]*y[:,2])
+	np.testing.assert_allclose(results['G'], G)
+	np.testing.assert_allclose(out['G'][0:2], G)
+	np.testing.assert_allclose(results['dGdy'][:,2], RT*(np.log(y[:,2])+1.0+K*y[:,0]))
+	np.testing.assert_allclose(results['d2Gdy2'], np.transpose(results['d2Gdy2'], (0, 2, 1)))
+	np.testing.assert_allclose(results['d2Gdy2'][:,0,1], RT*L)
+	np.testing.assert_allclose(results['d2Gdy2'][:,0,2], RT*K)
+	np.testing.assert_allclose(results['d2Gdy2'][:,1,2], 0.0)
+	np.testing.assert_allclose(results['d2Gdy2'][:,3,3], 0.0)
+	assert sorted(evaluator.evaluate(y, 1000.0, order=0)) == ['G', 'atoms']
+	with pytest.raises(ValueError):
+		phase.PhaseEvaluator(calc, 'LIQUID')
+
+def test_evaluator_restores_the_record(phase, calc, oc):
+	evaluator = phase.PhaseEvaluator(calc, 'FCC_A1')
+	constitution = oc.y.copy()
+	evaluator.evaluate([[0.2, 0.3, 0.5, 1.0]], 1000.0, pressure=2E5)
+	np.testing.assert_allclose(oc.y, constitution)
+	# the Gibbs energy of the restored constitution is calculated again
+	np.testing.assert_allclose(oc.G, (constitution[0:3]*np.log(constitution[0:3])).sum()+L*constitution[0]*constitution[1]+K*constitution[0]*constitution[2])
+	assert calc.conditions['E']['T'] == 800.0 and calc.conditions['E']['P'] == 1E5
+
+def chemicalPotentials(x, T):
+	"""
+	MU(i) of the regular solution per mole of atoms, x of AL, NI and PT
+	"""
+	RT = R*T
+	excess = L*x[0]*x[1]+K*x[0]*x[2]
+	dExcess = np.array([L*x[1]+K*x[2], L*x[0], K*x[0]])
+	return RT*(np.log(x)+dExcess-excess)
+
+def test_darken_matrix(phase, calc):
+	calculator = phase.DarkenMatrixCalculator(calc, 'FCC_A1')
+	assert calculator.elements == ['AL', 'NI', 'PT'] and calculator.sublattice == 0
+	x = np.array([[0.2, 0.3, 0.5], [0.6, 0.1, 0.3]])
+	mu, mugrad = calculator.calculateDarkenMatrices(x, 1000.0)
+	h = 1E-7
+	for p in range(len(x)):
+		np.testing.assert_allclose(mu[p], chemicalPotentials(x[p], 1000.0), rtol=1E-10)
+		# dMU(i)/dN(j) for one mole of atoms
+		numerical = np.empty((3, 3))
+		for j in range(3):
+			N = x[p].copy()
+			N[j] += h
+			numerical[:,j] = (chemicalPotentials(N/N.sum(), 1000.0)-chemicalPotentials(x[p], 1000.0))/h
+		np.testing.assert_allclose(mugrad[p], numerical, rtol=1E-5, atol=1E-2)
+		# Gibbs-Duhem
+		np.testing.assert_allclose(x[p]@mugrad[p], 0.0, atol=1E-8)
+		np.testing.assert_allclose(mugrad[p]@x[p], 0.0, atol=1E-8)
+
+def test_mobilities(phase, calc):
+	calculator = phase.DarkenMatrixCalculator(calc, 'FCC_A1')
+	x = np.array([[0.2, 0.3, 0.5], [0.6, 0.1, 0.3]])
+	T = 1000.0
+	RT = R*T
+	results = calculator.calculate(x, T)
+	MQ = x[:,0]*(-142000.0-RT*10.0)+x[:,1]*(-284000.0-RT*9.0)+x[:,0]*x[:,1]*(-41300.0+(x[:,0]-x[:,1])*1000.0)
+	np.testing.assert_allclose(results['mobility'][:,0], np.exp(MQ/RT)/RT)
+	np.testing.assert_allclose(results['mobility'][:,1], np.exp(x[:,1]*(-287000.0-RT*np.log(1.9E-4))/RT)/RT)
+	# no MQ parameters for PT
+	assert np.isnan(results['mobility'][:,2]).all()
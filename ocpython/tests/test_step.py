@@ -0,0 +1,116 @@
+"""
+Tests of the step calculation part of OC-Python with a fake equilibrium calculation: A is always stable,
+B is stable between 505 K and 515 K and C is dormant with a positive driving force
+"""
+
+import enum, importlib, sys, types
+
+import numpy as np
+import pytest
+
+class GridMinimizerStatus(enum.IntEnum):
+	On = 0
+	Off = -1
+
+class PhaseStatus(enum.IntEnum):
+	Suspended = -3
+	Dormant = -2
+	Entered = 0
+	Fixed = 2
+
+class FakeCalculation(object):
+	"""
+	the SingleEquilibriumCalculation calls of OCPython_step
+	"""
+	names = ['A', 'B', 'C']
+
+	def __init__(self):
+		self.T = None
+		self.eqName = 'E'
+		self.conditions = {'E': {}}
+		self.gridMinimizer = []
+
+	def getConditionSetter(self, name):
+		def setTemperature(value):
+			self.T = value
+			self.conditions['E']['T'] = value
+		return setTemperature
+
+	def calculateEquilibrium(self, gridMinimizerStatus):
+		self.gridMinimizer.append(gridMinimizerStatus == GridMinimizerStatus.On)
+
+	def getErrorCode(self):
+		return 0
+
+	def resetErrorCode(self):
+		pass
+
+	def getPhaseTable(self):
+		return types.SimpleNamespace(names=FakeCalculation.names)
+
+	def getPhaseValues(self, symbol):
+		drivingForce = 0.05-abs(self.T-510.0)/100.0
+		if symbol == 'NP':
+			return np.array([1.0, 0.5 if drivingForce > 0.0 else 0.0, 0.0])
+		return np.array([0.0, min(drivingForce, 0.0), 1.0])
+
+	def getPhasesStatus(self, nPhase):
+		return FakeCalculation.names, np.array([PhaseStatus.Entered, PhaseStatus.Entered, PhaseStatus.Dormant]), np.zeros(nPhase)
+
+	def getDrivingForces(self):
+		amounts = self.getPhaseValues('NP')
+		drivingForces = self.getPhaseValues('DGM')
+		_, status, _ = self.getPhasesStatus(len(amounts))
+		return {phaseName: drivingForce for phaseName, amount, drivingForce, phaseStatus in zip(FakeCalculation.names, amounts, drivingForces, status)
+			if amount <= 0.0 and PhaseStatus.Dormant < phaseStatus < PhaseStatus.Fixed}
+
+	def isPhaseSetChanged(self, drivingForceTolerance):
+		return any(drivingForce > drivingForceTolerance for drivingForce in self.getDrivingForces().values())
+
+	def getScalarResult(self, symbol):
+		return self.T
+
+@pytest.fixture
+def step(monkeypatch):
+	monkeypatch.setitem(sys.modules, 'ocpython.OCPython', types.SimpleNamespace(GridMinimizerStatus=GridMinimizerStatus, PhaseStatus=PhaseStatus))
+	sys.modules.pop('ocpython.OCPython_step', None)
+	yield importlib.import_module('ocpython.OCPython_step')
+	sys.modules.pop('ocpython.OCPython_step', None)
+
+def test_dormant_phases(step):
+	calc = FakeCalculation()
+	calculator = step.StepCalculator(calc, 'T', scalarProperties=('T',))
+	results = calculator.calculate(np.linspace(300.0, 400.0, 11))
+	np.testing.assert_allclose(results['T'], np.linspace(300.0, 400.0, 11))
+	# only the first step: the dormant phase C does not force the grid minimizer
+	assert calculator.nGridMinimizer == 1
+	assert set(calculator.getDrivingForces()) == {'B'}
+
+def test_adaptive(step):
+	calc = FakeCalculation()
+	calculator = step.StepCalculator(calc, 'T', scalarProperties=(), phaseProperties=('NP',))
+	# the field of B is narrower than the step
+	results, boundaries = calculator.calculateAdaptive(300.0, 900.0, 50.0, 0.5)
+	assert boundaries == [] and len(results['T']) == 13
+	results, boundaries = calculator.calculateAdaptive(300.0, 900.0, 50.0, 0.5, drivingForceWindow=0.2)
+	assert [(appearing, disappearing) for _, appearing, disappearing in boundaries] == [(['B'], []), ([], ['B'])]
+	assert abs(boundaries[0][0]-505.0) <= 0.5 and abs(boundaries[1][0]-515.0) <= 0.5
+	assert (np.diff(results['T']) > 0.0).all()
+	# only the half next to the nearly stable end is bisected
+	assert not ((results['T'] > 475.0) & (results['T'] < 487.5)).any()
+	assert not ((results['T'] > 525.0) & (results['T'] < 550.0)).any()
+	assert np.nanmax(results['NP(B)']) == 0.5
+
+def test_store(step, tmp_path):
+	from ocpython.OCPython_cache import EquilibriumStore
+	store = EquilibriumStore(str(tmp_path / 'store.db'))
+	calc = FakeCalculation()
+	calculator = step.StepCalculator(calc, 'T', scalarProperties=('T',), store=store)
+	calculator.calculate([300.0, 310.0])
+	calc.gridMinimizer = []
+	second = calculator.calculate([300.0, 310.0, 320.0])
+	np.testing.assert_allclose(second['T'], [300.0, 310.0, 320.0])
+	assert calculator.nStored == 2
+	# the step after the stored ones does not start from the stale solution
+	assert calc.gridMinimizer == [True]
+	store.close()
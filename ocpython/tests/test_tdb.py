@@ -0,0 +1,104 @@
+"""
+Tests of the database (tdb) part of OC-Python, no liboctq needed
+"""
+
+import os
+
+import pytest
+
+from ocpython.OCPython_tdb import TDBDatabase, getPrunedTDB
+
+examplesDirectory = os.path.join(os.path.dirname(__file__), '..', '..', 'examples')
+alniptFilePath = os.path.join(examplesDirectory, 'ALNIPT2005.TDB')
+
+mobilityTDB = """
+ ELEMENT /-   ELECTRON_GAS              0.0000E+00  0.0000E+00  0.0000E+00!
+ ELEMENT VA   VACUUM                    0.0000E+00  0.0000E+00  0.0000E+00!
+ ELEMENT AL   FCC_A1                    2.6982E+01  4.5773E+03  2.8322E+01!
+ ELEMENT NI   FCC_A1                    5.8690E+01  4.7870E+03  2.9796E+01!
+ FUNCTION GHSERAL 298.15 -7976.15+137.093038*T-24.3671976*T*LN(T); 6000 N !
+ FUNCTION GHSERNI 298.15 -5179.159+117.854*T-22.096*T*LN(T); 6000 N !
+ FUNCTION UNUSED 298.15 +1; 6000 N !
+ TYPE_DEFINITION % SEQ *!
+ PHASE FCC_A1 % 2 1 1 !
+ CONSTITUENT FCC_A1 :AL,NI : VA : !
+ PARAMETER G(FCC_A1,AL:VA;0) 298.15 +GHSERAL; 6000 N !
+ PARAMETER G(FCC_A1,NI:VA;0) 298.15 +GHSERNI; 6000 N !
+ PARAMETER MQ(FCC_A1&AL,AL:VA;0) 298.15 -142000-R*T*LN(1.71E-4); 6000 N !
+ PARAMETER MQ(FCC_A1&AL,NI:VA;0) 298.15 -284000-R*T*LN(7.5E-4); 6000 N !
+ PARAMETER MQ(FCC_A1&NI,AL:VA;0) 298.15 -145900-R*T*LN(4.4E-4); 6000 N !
+ PARAMETER MQ(FCC_A1&NI,NI:VA;0) 298.15 -287000-R*T*LN(1.9E-4); 6000 N !
+"""
+
+def parse(text):
+	database = TDBDatabase()
+	database.parse(text)
+	return database
+
+def test_read():
+	database = TDBDatabase.read(alniptFilePath)
+	assert {'AL', 'NI', 'PT', 'VA'} <= set(database.elements)
+	assert {'LIQUID', 'FCC_A1', 'FCC_4SL', 'BCC_B2'} <= set(database.phases)
+	assert database.phases['FCC_A1'].constituents == [['AL', 'NI', 'PT'], ['VA']]
+	assert database.phases['BCC_B2'].typeCodes == '%W'
+	assert database.typeDefinitions['W'].phaseName == 'BCC_A2'
+	assert database.typeDefinitions['W'].kind == 'MAGNETIC'
+	assert len(database.getParameters('LIQUID', 'G')) == 5
+
+def test_prune_keeps_type_definitions_of_the_phases():
+	database = TDBDatabase.read(alniptFilePath)
+	for elements in (('AL', 'NI', 'PT'), ('NI', 'PT')):
+		pruned = database.prune(elements)
+		assert 'BCC_B2' in pruned.phases
+		# TYPE_DEFINITION W amends BCC_A2 (not in the database) but is used by BCC_B2
+		assert 'W' in pruned.typeDefinitions
+		for phase in pruned.phases.values():
+			for code in phase.typeCodes:
+				assert code in pruned.typeDefinitions
+
+def test_prune_elements():
+	database = TDBDatabase.read(alniptFilePath)
+	pruned = database.prune(['ni', 'pt'])
+	assert set(pruned.elements) == {'NI', 'PT', 'VA'} | ({'/-'} & set(database.elements))
+	for parameter in pruned.parameters.values():
+		assert not 'AL' in {constituent for sublattice in parameter.constituents for constituent in sublattice}
+	for symbol in set().union(*(database.getReferencedFunctions(parameter.ranges) for parameter in pruned.parameters.values())):
+		assert symbol in pruned.functions
+	with pytest.raises(ValueError):
+		database.prune(['NI', 'XX'])
+
+def test_write_round_trip(tmp_path):
+	database = TDBDatabase.read(alniptFilePath)
+	pruned = database.prune(['NI', 'PT'])
+	filePath = str(tmp_path / 'NIPT.TDB')
+	pruned.write(filePath)
+	written = TDBDatabase.read(filePath)
+	assert set(written.elements) == set(pruned.elements)
+	assert set(written.functions) == set(pruned.functions)
+	assert set(written.phases) == set(pruned.phases)
+	assert set(written.parameters) == set(pruned.parameters)
+	assert set(written.typeDefinitions) == set(pruned.typeDefinitions)
+	for name, phase in pruned.phases.items():
+		assert written.phases[name].constituents == phase.constituents
+
+def test_mobility_parameters():
+	database = parse(mobilityTDB)
+	assert len(database.getParameters('FCC_A1')) == 6
+	assert len(database.getParameters('FCC_A1', 'MQ')) == 4
+	assert {parameter.constituents for parameter in database.getParameters('FCC_A1&AL', 'MQ')} == {(('AL',), ('VA',)), (('NI',), ('VA',))}
+
+	pruned = database.prune(['AL', 'NI'])
+	assert len(pruned.getParameters('FCC_A1', 'MQ')) == 4
+	assert not 'UNUSED' in pruned.functions
+	pruned = database.prune(['NI'])
+	assert [parameter.phaseName for parameter in pruned.getParameters('FCC_A1', 'MQ')] == ['FCC_A1&NI']
+
+def test_unknown_phase():
+	with pytest.raises(ValueError):
+		parse(mobilityTDB+' CONSTITUENT BCC_A2 :AL,NI : VA : !\n')
+
+def test_pruned_tdb_cache(tmp_path):
+	prunedFilePath = getPrunedTDB(alniptFilePath, ['NI', 'PT'], str(tmp_path))
+	assert getPrunedTDB(alniptFilePath, ['pt', 'ni'], str(tmp_path)) == prunedFilePath
+	assert not getPrunedTDB(alniptFilePath, ['AL', 'PT'], str(tmp_path)) == prunedFilePath
+	assert 'W' in TDBDatabase.read(prunedFilePath).typeDefinitions